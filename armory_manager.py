@@ -1,46 +1,119 @@
+import argparse
 import json
 import os
 
+import numpy as np
+
+from tracing import TRACE_KILL, tracer
+
+LOADOUTS_FILE = "loadouts.json"
+
+# Function to get how much an item's bonuses are multiplied by at a level and rarity
+def bonus_scale(item_level, rarity):
+    return (item_level + 1) * (1.25 if rarity == "excellent" else 1)
+
+# armory.json loaded once into arrays: every bonus key gets an integer id (its column in the
+# bonus vectors), and every item holds dense per-level vectors of its main bonuses and of each
+# optional bonus, rows of main_matrix and optional_matrix. A loadout's totals are then one
+# scaled vector sum, done for many loadouts at once as two matrix products
+class ArmoryModel:
+    def __init__(self, items_data):
+        self.bonus_keys = []
+        self.bonus_ids = {}
+        for items in items_data.values():
+            for item in items.values():
+                for bonus in item.get("Main Bonuses", []) + item.get("Optional Bonuses", []):
+                    if bonus["Bonus Key"] not in self.bonus_ids:
+                        self.bonus_ids[bonus["Bonus Key"]] = len(self.bonus_keys)
+                        self.bonus_keys.append(bonus["Bonus Key"])
+
+        self.items = {}
+        main_rows = []
+        optional_rows = []
+        for slot_type, items in items_data.items():
+            self.items[slot_type] = {}
+            for item_name, item in items.items():
+                optional_ids = {}
+                for bonus in item.get("Optional Bonuses", []):
+                    if bonus["Bonus Key"] not in optional_ids:
+                        optional_ids[bonus["Bonus Key"]] = len(optional_rows)
+                        optional_rows.append(np.zeros(len(self.bonus_keys)))
+                    optional_rows[optional_ids[bonus["Bonus Key"]]][self.bonus_ids[bonus["Bonus Key"]]] += bonus["Bonus per Level"]
+                main_rows.append(np.zeros(len(self.bonus_keys)))
+                for bonus in item.get("Main Bonuses", []):
+                    main_rows[-1][self.bonus_ids[bonus["Bonus Key"]]] += bonus["Bonus per Level"]
+                self.items[slot_type][item_name] = {
+                    "main_id": len(main_rows) - 1,
+                    "main_bonus_ids": [self.bonus_ids[bonus["Bonus Key"]] for bonus in item.get("Main Bonuses", [])],
+                    "optional_ids": optional_ids,
+                    "optional_per_level": {bonus["Bonus Key"]: bonus["Bonus per Level"]
+                                           for bonus in item.get("Optional Bonuses", [])},
+                }
+        self.main_matrix = np.array(main_rows).reshape(len(main_rows), len(self.bonus_keys))
+        self.optional_matrix = np.array(optional_rows).reshape(len(optional_rows), len(self.bonus_keys))
+
+    # Per-level bonus vector of an item with some optional bonuses enabled
+    def unit_vector(self, slot_type, item_name, enabled_optional_bonuses=()):
+        item = self.items[slot_type][item_name]
+        vector = self.main_matrix[item["main_id"]].copy()
+        for bonus_key in enabled_optional_bonuses:
+            vector += self.optional_matrix[item["optional_ids"][bonus_key]]
+        return vector
+
+    # Bonus vectors of many loadouts at once (loadouts x bonus keys): the scale of every item
+    # and enabled optional bonus is gathered into two weight matrices, then multiplied through
+    def loadout_matrix(self, loadouts):
+        main_cells = []
+        optional_cells = []
+        scales = []
+        optional_scales = []
+        for i, loadout in enumerate(loadouts):
+            main_row = i * len(self.main_matrix)
+            optional_row = i * len(self.optional_matrix)
+            for item_info in loadout.values():
+                item = self.items[item_info['type']][item_info['name']]
+                scale = bonus_scale(item_info['level'], item_info['rarity'])
+                main_cells.append(main_row + item["main_id"])
+                scales.append(scale)
+                for bonus_key in item_info.get('enabled_optional_bonuses', []):
+                    optional_cells.append(optional_row + item["optional_ids"][bonus_key])
+                    optional_scales.append(scale)
+        main_weights = np.bincount(main_cells, scales, len(loadouts) * len(self.main_matrix))
+        optional_weights = np.bincount(optional_cells, optional_scales, len(loadouts) * len(self.optional_matrix))
+        return (main_weights.reshape(len(loadouts), len(self.main_matrix)) @ self.main_matrix
+                + optional_weights.reshape(len(loadouts), len(self.optional_matrix)) @ self.optional_matrix)
+
+    def loadout_vector(self, loadout):
+        return self.loadout_matrix([loadout])[0]
+
+    # The bonus totals of a loadout as a dict, in the order its items list their bonuses
+    def loadout_totals(self, loadout):
+        vector = self.loadout_vector(loadout)
+        ids = []
+        for item_info in loadout.values():
+            ids += self.items[item_info['type']][item_info['name']]["main_bonus_ids"]
+            ids += [self.bonus_ids[bonus_key] for bonus_key in item_info.get('enabled_optional_bonuses', [])]
+        return {self.bonus_keys[i]: float(vector[i]) for i in dict.fromkeys(ids)}
+
 class LoadoutManager:
-    def __init__(self, items_data, bonuses_data):
+    def __init__(self, items_data, bonuses_data, loadouts_file=LOADOUTS_FILE):
         self.items_data = items_data
         self.bonuses_data = bonuses_data
+        self.model = ArmoryModel(items_data)
+        self.loadouts_file = loadouts_file
         self.loadouts = {}
 
     def print_colored(self, text, color_code):
         print(f"\033[{color_code}m{text}\033[0m")
 
     def calculate_total_bonuses(self, loadout):
-        total_bonuses = {}
-        for slot, item_info in loadout.items():
-            item = self.items_data[item_info['type']][item_info['name']]
-            level = item_info['level']
-            rarity = item_info['rarity']
-
-            # Add main bonuses
-            for bonus in item.get("Main Bonuses", []):
-                bonus_key = bonus["Bonus Key"]
-                bonus_value = bonus["Bonus per Level"] * (level + 1) * 1.25 if rarity == "excellent" else 1
-                
-                if bonus_key in total_bonuses:
-                    total_bonuses[bonus_key] += bonus_value
-                else:
-                    total_bonuses[bonus_key] = bonus_value
-
-            # Add selected optional bonuses
-            for selected_bonus in item_info.get('enabled_optional_bonuses', []):
-                print(f"Adding optional bonus {selected_bonus}")
-                print(item["Optional Bonuses"])
-                bonus = next(b for b in item["Optional Bonuses"] if b["Bonus Key"] == selected_bonus)
-                bonus_key = bonus["Bonus Key"]
-                bonus_value = bonus["Bonus per Level"] * (level + 1) * 1.25 if rarity == "excellent" else 1
-                self.print_colored(f"Adding optional bonus {bonus_key} with value {bonus_value} level {level}", '94')  # Light blue for optional bonuses
-                if bonus_key in total_bonuses:
-                    total_bonuses[bonus_key] += bonus_value
-                else:
-                    total_bonuses[bonus_key] = bonus_value
-
-        return total_bonuses
+        if tracer.level >= TRACE_KILL:
+            for item_info in loadout.values():
+                item = self.model.items[item_info['type']][item_info['name']]
+                for bonus_key in item_info.get('enabled_optional_bonuses', []):
+                    bonus_value = self.resolve_bonus_value(item["optional_per_level"][bonus_key], item_info['level'], item_info['rarity'])
+                    tracer.emit(f"\033[94mAdding optional bonus {bonus_key} with value {bonus_value} level {item_info['level']}\033[0m")  # Light blue for optional bonuses
+        return self.model.loadout_totals(loadout)
 
     def create_loadout(self):
         loadout = {}
@@ -116,14 +189,26 @@ class LoadoutManager:
         print("Loadout created successfully.")
 
     def save_loadouts(self):
-        with open("loadouts.json", "w") as f:
+        with open(self.loadouts_file, "w") as f:
             json.dump(self.loadouts, f)
 
     def load_loadouts(self):
-        if os.path.exists("loadouts.json"):
-            with open("loadouts.json", "r") as f:
+        if os.path.exists(self.loadouts_file):
+            with open(self.loadouts_file, "r") as f:
                 self.loadouts = json.load(f)
 
+    # Adds a loadout without prompting, after checking its items and optional bonuses exist
+    def add_loadout(self, loadout_name, loadout):
+        for slot, item_info in loadout.items():
+            if item_info['name'] not in self.items_data.get(item_info['type'], {}):
+                raise ValueError(f"{slot}: unknown item {item_info['name']!r} in {item_info['type']!r}")
+            optional = self.model.items[item_info['type']][item_info['name']]["optional_ids"]
+            for bonus_key in item_info.get('enabled_optional_bonuses', []):
+                if bonus_key not in optional:
+                    raise ValueError(f"{slot}: {item_info['name']} has no optional bonus {bonus_key!r}")
+        self.loadouts[loadout_name] = loadout
+        self.save_loadouts()
+
     def display_loadouts(self):
         if not self.loadouts:
             print("No loadouts available.")
@@ -151,13 +236,13 @@ class LoadoutManager:
             return None
     
     def resolve_bonus_value(self, base_value, item_level, rarity):
-        return base_value * (item_level + 1) * (1.25 if rarity == "excellent" else 1)
+        return base_value * bonus_scale(item_level, rarity)
     
     def resolve_bonus_name(self, bonus_key):
         return self.bonuses_data.get(bonus_key, bonus_key)
     
-    def resolve_bonus_base_value(self, item, bonus_key):
-        return next(bonus["Bonus per Level"] for bonus in item.get("Optional Bonuses", []) if bonus["Bonus Key"] == bonus_key)
+    def resolve_bonus_base_value(self, item_info, bonus_key):
+        return self.model.items[item_info['type']][item_info['name']]["optional_per_level"][bonus_key]
 
     def calculate_bonuses_for_loadout(self, loadout_name):
         loadout = self.load_loadout(loadout_name)
@@ -173,8 +258,8 @@ class LoadoutManager:
                 item_name = item_info['name']
                 item_level = item_info['level']
 
-                main_bonuses = ', '.join([f"{self.resolve_bonus_name(bonus['Bonus Key'])} \033[92m+{self.resolve_bonus_value(self. bonus['Bonus per Level'], item_level, item_info['rarity'])}\033[0m" for bonus in item.get('Main Bonuses', [])])
-                optional_bonuses = ', '.join([f"{self.resolve_bonus_name(bonus_key)} \033[92m+{self.resolve_bonus_value(item, bonus_key)}\033[0m" for bonus_key in item_info.get('enabled_optional_bonuses', [])])
+                main_bonuses = ', '.join([f"{self.resolve_bonus_name(bonus['Bonus Key'])} \033[92m+{self.resolve_bonus_value(bonus['Bonus per Level'], item_level, item_info['rarity'])}\033[0m" for bonus in item.get('Main Bonuses', [])])
+                optional_bonuses = ', '.join([f"{self.resolve_bonus_name(bonus_key)} \033[92m+{self.resolve_bonus_value(self.resolve_bonus_base_value(item_info, bonus_key), item_level, item_info['rarity'])}\033[0m" for bonus_key in item_info.get('enabled_optional_bonuses', [])])
 
                 # Determine color for item name
                 if item_info.get('rarity') == 'excellent':
@@ -265,5 +350,44 @@ def main():
         else:
             print("Invalid choice. Please try again.")
 
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Manage armory loadouts (interactive menu without a command)")
+    parser.add_argument("--loadouts", default=LOADOUTS_FILE, help="loadouts file")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("list", help="list the saved loadouts")
+    totals_parser = commands.add_parser("totals", help="bonus totals of loadouts")
+    totals_parser.add_argument("names", nargs="*", help="loadout names (all by default)")
+    add_parser = commands.add_parser("add", help="add a loadout from a JSON file of slot -> item")
+    add_parser.add_argument("name", help="loadout name")
+    add_parser.add_argument("file", help="JSON file with the loadout")
+    return parser.parse_args(args)
+
+def run_command(args):
+    manager = LoadoutManager(load_items_data(), load_bonuses_data(), args.loadouts)
+    manager.load_loadouts()
+    if args.command == "add":
+        with open(args.file, "r") as f:
+            manager.add_loadout(args.name, json.load(f))
+        print(f"Loadout {args.name} saved to {args.loadouts}")
+    elif args.command == "list":
+        if args.format == "json":
+            print(json.dumps(list(manager.loadouts)))
+        else:
+            manager.display_loadouts()
+    else:
+        totals = {name: manager.calculate_total_bonuses(manager.loadouts[name]) for name in args.names or manager.loadouts}
+        if args.format == "json":
+            print(json.dumps(totals, indent=4))
+        else:
+            for name, bonuses in totals.items():
+                print(f"\n{name}:")
+                for bonus, value in bonuses.items():
+                    print(f"  {manager.resolve_bonus_name(bonus)}: {value:g}")
+
 if __name__ == "__main__":
-    main()
+    args = parse_arguments()
+    if args.command:
+        run_command(args)
+    else:
+        main()
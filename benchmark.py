@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import main
+from armory_manager import LoadoutManager, load_bonuses_data, load_items_data
+from chest_hunt_batch import simulate_games
+from chest_hunt_simlator import compile_strategy, run_shard, strategies
+from soul_session import SessionSimulator
+
+BASELINE_FILE = "benchmark_baseline.json"
+REGRESSION_THRESHOLD = 0.15  # Fail when throughput drops more than 15% below the baseline
+MIN_TIME = 0.5  # Seconds of each timed stretch
+REPEATS = 3  # Timed stretches per benchmark
+SCALAR_GAMES = 2000  # Games per call of a scalar chest hunt benchmark
+BATCH_GAMES = 65536  # Games per call of a batch chest hunt benchmark
+ARMORY_LOADOUTS = 1000  # Loadouts per call of the armory benchmark
+STARTUP_MODULES = ("main", "chest_hunt_simlator", "armory_manager")  # Modules whose import time is measured
+IMPORT_TIME_BUDGET = 0.1  # Seconds importing main may take, whatever the baseline says
+SESSION_HOURS = 24  # Simulated hours per call of the session benchmark, a day must take under a second
+
+
+# Function to build a chest hunt benchmark: simulate games of one strategy, return the games
+def chest_hunt_benchmark(strategy_func):
+    compile_strategy(strategy_func)
+
+    def run():
+        run_shard(strategy_func, SCALAR_GAMES, "benchmark")
+        return SCALAR_GAMES
+    return run
+
+
+# Function to build a batch chest hunt benchmark, the same games through the NumPy engine
+def chest_hunt_batch_benchmark(strategy_func):
+    rng = np.random.default_rng(0)
+    simulate_games(strategy_func, 1, rng)
+
+    def run():
+        simulate_games(strategy_func, BATCH_GAMES, rng)
+        return BATCH_GAMES
+    return run
+
+
+# Function to build a soul simulator benchmark: one simulated run, returns the patterns played.
+# Traces, when TRACE_LEVEL turns them on, go to devnull
+def soul_benchmark(simulation_func):
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            stats = simulation_func()
+        return stats["total_patterns"]
+    return run
+
+
+# Function to build the armory benchmark: bonus totals of many loadouts in one call, returns
+# the loadouts evaluated
+def armory_benchmark():
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    manager.load_loadouts()
+    loadouts = list(manager.loadouts.values()) * (ARMORY_LOADOUTS // max(len(manager.loadouts), 1))
+
+    def run():
+        manager.model.loadout_matrix(loadouts)
+        return len(loadouts)
+    return run
+
+
+# Function to build the session benchmark: a day of play through the event queue, returns the
+# simulated hours
+def session_benchmark():
+    simulator = SessionSimulator(seed=0)
+
+    def run():
+        simulator.run(SESSION_HOURS)
+        return SESSION_HOURS
+    return run
+
+
+# Function to list every benchmark: name -> (run function, unit)
+def build_benchmarks():
+    benchmarks = {}
+    for strategy_name, strategy_func in strategies.items():
+        benchmarks[f"chest_hunt/{strategy_name}"] = (chest_hunt_benchmark(strategy_func), "games/s")
+        benchmarks[f"chest_hunt_batch/{strategy_name}"] = (chest_hunt_batch_benchmark(strategy_func), "games/s")
+    benchmarks["soul/active_bow"] = (soul_benchmark(main.simulate_active_bow), "patterns/s")
+    benchmarks["soul/active_rage"] = (soul_benchmark(main.simulate_active_rage), "patterns/s")
+    benchmarks["soul/idle_play"] = (soul_benchmark(main.simulate_idle_play), "patterns/s")
+    benchmarks["armory/loadout_totals"] = (armory_benchmark(), "loadouts/s")
+    benchmarks["session/day"] = (session_benchmark(), "simulated hours/s")
+    return benchmarks
+
+
+# Function to measure one benchmark: the best throughput of a few timed stretches of at
+# least min_time seconds each (the best is the least disturbed by the rest of the machine),
+# then the peak memory of a single call under tracemalloc, which slows calls down
+def measure(run, min_time=MIN_TIME, repeats=REPEATS):
+    run()  # Warm up
+    throughput = 0
+    calls = 0
+    for _ in range(repeats):
+        units = 0
+        start = time.perf_counter()
+        while True:
+            units += run()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        throughput = max(throughput, units / elapsed)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"throughput": throughput, "calls": calls, "peak_memory_kb": peak / 1024}
+
+
+# Function to measure how long importing a module takes, in a fresh interpreter each time so
+# nothing is cached (the interpreter's own startup isn't counted): the best of a few imports
+# after a first one that writes the bytecode. The interpreter runs in this file's directory,
+# so the module is found wherever the benchmark is started from
+def measure_import(module, repeats=REPEATS):
+    best = None
+    for _ in range(repeats + 1):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 capture_output=True, text=True, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+        line = next(line for line in reversed(process.stderr.splitlines()) if line.endswith(f"| {module}"))
+        seconds = int(line.split("|")[1]) / 1e6
+        best = seconds if best is None else min(best, seconds)
+    return {"throughput": 1 / best, "calls": repeats + 1, "import_time": best}
+
+
+# Function to run the benchmarks whose name contains one of the filters (all of them by default)
+def run_benchmarks(filters=None, min_time=MIN_TIME):
+    results = {}
+    for name, (run, unit) in build_benchmarks().items():
+        if filters and not any(text in name for text in filters):
+            continue
+        results[name] = dict(measure(run, min_time), unit=unit)
+    for module in STARTUP_MODULES:
+        name = f"startup/{module}"
+        if filters and not any(text in name for text in filters):
+            continue
+        results[name] = dict(measure_import(module), unit="imports/s")
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+
+
+# Function to compare results with a baseline. Returns one row per benchmark present in both,
+# with the throughput ratio and whether it regressed past the threshold
+def compare_with_baseline(results, baseline, threshold=REGRESSION_THRESHOLD):
+    rows = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        ratio = result["throughput"] / baseline["benchmarks"][name]["throughput"]
+        rows.append({"name": name, "ratio": ratio, "regressed": ratio < 1 - threshold})
+    return rows
+
+
+# Function to save benchmark results as a JSON baseline
+def save_baseline(results, filename=BASELINE_FILE):
+    with open(filename, "w") as file:
+        json.dump(results, file, indent=4)
+
+
+# Function to load a JSON baseline, or None if there is none yet
+def load_baseline(filename=BASELINE_FILE):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "r") as file:
+        return json.load(file)
+
+
+# Function to display benchmark results, with the change against the baseline when there is one
+def display_benchmarks(results, comparison=None):
+    ratios = {row["name"]: row for row in comparison or []}
+    print(f"Benchmarks (Python {results['python']}, {results['platform']}):")
+    for name, result in results["benchmarks"].items():
+        if "import_time" in result:
+            line = f"  {name}: {result['import_time'] * 1000:.1f} ms to import"
+        else:
+            line = f"  {name}: {result['throughput']:,.0f} {result['unit']}, peak memory {result['peak_memory_kb']:,.0f} KB"
+        if name in ratios:
+            line += f", {ratios[name]['ratio'] - 1:+.1%} vs baseline"
+            if ratios[name]["regressed"]:
+                line += " REGRESSED"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure simulator throughput and check it against a baseline")
+    parser.add_argument("filters", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed throughput drop before failing (fraction)")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds per timed stretch")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_TIME_BUDGET,
+                        help="seconds importing main may take")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filters, args.min_time)
+    baseline = load_baseline(args.baseline)
+    comparison = compare_with_baseline(results, baseline, args.threshold) if baseline else None
+    display_benchmarks(results, comparison)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+    elif comparison and any(row["regressed"] for row in comparison):
+        print(f"Throughput regressed more than {args.threshold:.0%} against {args.baseline}")
+        sys.exit(1)
+    startup = results["benchmarks"].get("startup/main")
+    if startup and startup["import_time"] > args.import_budget:
+        print(f"Importing main took {startup['import_time'] * 1000:.1f} ms, over the {args.import_budget * 1000:.0f} ms budget")
+        sys.exit(1)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from chest_hunt_batch import BATCH_SIZE, add_batch_results, simulate_games
+from chest_hunt_simlator import DEFAULT_RULES, NUM_SIMULATIONS, check_rules, initialize_results, strategies
+from confidence import CONFIDENCE, mean_interval, wilson_interval
+
+WIN_RATE_PRECISION = 0.001  # Target half-width of the win rate interval
+BOXES_PRECISION = 0.02  # Target half-width of the average boxes opened interval
+
+
+# Function to work out the intervals of a strategy's running results
+def update_intervals(data, confidence=CONFIDENCE):
+    data["win_rate_interval"] = wilson_interval(data["wins"], data["games"], confidence)
+    data["boxes_interval"] = mean_interval(data["total_boxes_opened"], data["total_boxes_opened_sq"],
+                                           data["games"], confidence)
+
+
+def _half_width(interval):
+    return (interval[1] - interval[0]) / 2
+
+
+# Function to simulate each strategy in batches under the rules until its win rate and
+# average boxes opened are known to the target precision, its place in the win rate ranking
+# is settled (its interval overlaps no other strategy's), or max_games is reached. Returns the usual results
+# per strategy plus the games used, both intervals and why it stopped. The intervals are
+# checked after every batch, and stopping on the first one that looks settled makes the real
+# confidence lower than the nominal one: treat the intervals as optimistic
+def run_adaptive_simulations(win_rate_precision=WIN_RATE_PRECISION, boxes_precision=BOXES_PRECISION,
+                             confidence=CONFIDENCE, max_games=NUM_SIMULATIONS, seed=None, batch_size=BATCH_SIZE,
+                             rules=DEFAULT_RULES):
+    if max_games < 1:
+        raise ValueError(f"max_games must be at least 1, not {max_games}")
+    check_rules(rules)
+    rng = np.random.default_rng(seed)
+    results = {}
+    for strategy_name in strategies:
+        data = initialize_results(rules)
+        data.update(games=0, total_boxes_opened_sq=0, stop_reason=None)
+        update_intervals(data, confidence)
+        results[strategy_name] = data
+
+    running = list(strategies)
+    while running:
+        for strategy_name in running:
+            data = results[strategy_name]
+            num_games = min(batch_size, max_games - data["games"])
+            outcomes = simulate_games(strategies[strategy_name], num_games, rng, rules)
+            boxes_opened = outcomes[1].astype(np.int64)
+            data["games"] += num_games
+            data["total_boxes_opened_sq"] += int((boxes_opened * boxes_opened).sum())
+            add_batch_results(data, *outcomes)
+            update_intervals(data, confidence)
+
+        for strategy_name in list(running):
+            data = results[strategy_name]
+            low, high = data["win_rate_interval"]
+            separated = len(results) > 1 and all(
+                high < other["win_rate_interval"][0] or low > other["win_rate_interval"][1]
+                for other_name, other in results.items() if other_name != strategy_name
+            )
+            if (_half_width(data["win_rate_interval"]) <= win_rate_precision
+                    and _half_width(data["boxes_interval"]) <= boxes_precision):
+                data["stop_reason"] = "precision reached"
+            elif separated:
+                data["stop_reason"] = "ranking settled"
+            elif data["games"] >= max_games:
+                data["stop_reason"] = "max games"
+            else:
+                continue
+            running.remove(strategy_name)
+
+    return results
+
+
+# Function to display adaptive results, ranked by win rate
+def display_adaptive_results(results, confidence=CONFIDENCE):
+    print(f"Adaptive simulation results ({confidence:.0%} intervals):")
+    print("  The stop rule re-checks the intervals after every batch, so their real confidence is below "
+          f"{confidence:.0%}")
+    ranked = sorted(results.items(), key=lambda item: item[1]["wins"] / max(item[1]["games"], 1), reverse=True)
+    for strategy, data in ranked:
+        if not data["games"]:
+            print(f"{strategy}: no games run")
+            continue
+        win_low, win_high = data["win_rate_interval"]
+        boxes_low, boxes_high = data["boxes_interval"]
+        print(f"{strategy}: {data['wins'] / data['games']:.2%} win rate [{win_low:.2%}, {win_high:.2%}], "
+              f"width {win_high - win_low:.3%}")
+        print(f"  Average: {data['total_boxes_opened'] / data['games']:.2f} boxes opened "
+              f"[{boxes_low:.2f}, {boxes_high:.2f}], width {boxes_high - boxes_low:.3f}")
+        print(f"  Games used: {data['games']} ({data['stop_reason']})")
+
+
+if __name__ == "__main__":
+    display_adaptive_results(run_adaptive_simulations())
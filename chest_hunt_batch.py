@@ -0,0 +1,352 @@
+import functools
+
+import numpy as np
+
+from chest_hunt_simlator import (
+    DEFAULT_RULES,
+    NUM_BOXES,
+    NUM_SIMULATIONS,
+    add_histograms,
+    check_rules,
+    compile_strategy,
+    display_results,
+    dynamic_random_strategy,
+    game_rules,
+    initialize_results,
+    rules_strategy,
+    static_random_strategy,
+    strategies,
+)
+
+# Box contents. A reveal event is encoded as step * 4 + content so that sorting the
+# event keys of a game sorts its reveals by pick order
+EMPTY = 0
+SAVER = 1
+MULTIPLIER = 2
+MIMIC = 3
+CONTENT_BITS = 2
+
+BATCH_SIZE = 65536  # Games per batch, keeps the working set small
+
+# Function to draw num_draws distinct values in [0, num_values) for every game, as a list of
+# columns. Clashes are redrawn, which keeps every ordered draw equally likely
+def _distinct_draws(rng, num_games, num_draws, num_values):
+    columns = []
+    for _ in range(num_draws):
+        column = rng.integers(0, num_values, num_games, dtype=np.int8)
+        redraw = np.zeros(num_games, dtype=bool)
+        for previous in columns:
+            redraw |= column == previous
+        redraw = np.flatnonzero(redraw)
+        while redraw.size:
+            values = rng.integers(0, num_values, redraw.size, dtype=np.int8)
+            clash = np.zeros(redraw.size, dtype=bool)
+            for previous in columns:
+                clash |= values == previous[redraw]
+            column[redraw] = values
+            redraw = redraw[clash]
+        columns.append(column)
+    return columns
+
+
+# Function to draw N layouts at once, with the same distribution as the
+# random.randint/choice/sample calls in simulate_game: the saver, the multiplier, the
+# (N x mimics) mimics and the (N x savers - 1) savers strategies don't see
+def generate_layouts(rng, num_games, rules=DEFAULT_RULES):
+    rules = game_rules(rules)
+    drawn = _distinct_draws(rng, num_games, 1 + rules.num_mimics + rules.num_savers, rules.num_boxes)
+    hidden = np.column_stack(drawn[2:])
+    return drawn[0], drawn[1], hidden[:, :rules.num_mimics], hidden[:, rules.num_mimics:]
+
+
+# Function to lay out the boxes of N games as (N x num_boxes) content codes
+def layout_boards(saver_position, multiplier_position, mimic_positions, extra_savers, num_boxes=NUM_BOXES):
+    rows = np.arange(len(saver_position))
+    board = np.zeros((len(saver_position), num_boxes), dtype=np.int8)
+    board[rows, saver_position] = SAVER
+    board[rows, multiplier_position] = MULTIPLIER
+    board[rows[:, None], mimic_positions] = MIMIC
+    board[rows[:, None], extra_savers] = SAVER
+    return board
+
+
+# Array form of a compiled strategy: its pick orders for every (saver, multiplier, early
+# mimic), -1 padded since a strategy may pick a box twice
+class PickOrderTable:
+    def __init__(self, compiled):
+        num_boxes = self.num_boxes = compiled.num_boxes
+        num_picks = max(map(len, compiled.orders))
+        # Whether some order picks a box other than the saver twice. Events only reveal a box
+        # at its first pick, which misses the savers strategies don't see being picked again
+        self.repeats = False
+        self.orders = np.full((num_boxes, num_boxes, 2, num_picks), -1, dtype=np.int8)
+        self.num_picks = np.zeros((num_boxes, num_boxes, 2), dtype=np.int8)
+        self.early = np.zeros((num_boxes, num_boxes, num_boxes), dtype=bool)
+        # First step each box is picked at, and the saver/multiplier reveals of every order
+        self.steps = np.full((num_boxes, num_boxes, 2, num_boxes), num_picks, dtype=np.int16)
+        fixed_events = {}
+        for saver_position in range(num_boxes):
+            for multiplier_position in range(num_boxes):
+                if multiplier_position == saver_position:
+                    continue
+                clean, early, flagged = compiled.lookup(saver_position, multiplier_position)
+                self.early[saver_position, multiplier_position] = np.frombuffer(early, dtype=np.uint8)
+                for key, picks in (((saver_position, multiplier_position, 0), clean),
+                                   ((saver_position, multiplier_position, 1), flagged)):
+                    self.orders[key][:len(picks)] = np.frombuffer(picks, dtype=np.uint8)
+                    self.num_picks[key] = len(picks)
+                    self.repeats |= len(set(picks) - {saver_position}) < len(picks) - picks.count(saver_position)
+                    for step in range(len(picks) - 1, -1, -1):
+                        self.steps[key][picks[step]] = step
+                    fixed_events[key] = [(step << CONTENT_BITS) | (SAVER if pick == saver_position else MULTIPLIER)
+                                         for step, pick in enumerate(picks)
+                                         if pick in (saver_position, multiplier_position)]
+        width = max(map(len, fixed_events.values()))
+        self.fixed_events = np.full((num_boxes, num_boxes, 2, width), num_picks << CONTENT_BITS, dtype=np.int16)
+        for key, events in fixed_events.items():
+            self.fixed_events[key][:len(events)] = events
+
+    # Function to look up the flat (saver, multiplier, early mimic) index of N games
+    def keys(self, saver_position, multiplier_position, mimic_positions):
+        pair = (saver_position.astype(np.intp) * self.num_boxes + multiplier_position) * self.num_boxes
+        early = self.early.reshape(-1)
+        early_mimic = early[pair + mimic_positions[:, 0]]
+        for i in range(1, mimic_positions.shape[1]):
+            early_mimic |= early[pair + mimic_positions[:, i]]
+        return pair // self.num_boxes * 2 + early_mimic
+
+    def pick_orders(self, saver_position, multiplier_position, mimic_positions):
+        key = self.keys(saver_position, multiplier_position, mimic_positions)
+        return self.orders.reshape(-1, self.orders.shape[-1])[key]
+
+    def events(self, saver_position, multiplier_position, mimic_positions, extra_savers):
+        key = self.keys(saver_position, multiplier_position, mimic_positions)
+        steps = self.steps.reshape(-1)
+        fixed_events = self.fixed_events.reshape(-1, self.fixed_events.shape[-1])[key]
+        columns = [fixed_events[:, i] for i in range(fixed_events.shape[1])]
+        offset = key * self.num_boxes
+        columns += [(steps[offset + mimic_positions[:, i]] << CONTENT_BITS) | MIMIC for i in range(mimic_positions.shape[1])]
+        columns += [(steps[offset + extra_savers[:, i]] << CONTENT_BITS) | SAVER for i in range(extra_savers.shape[1])]
+        return columns, self.num_picks.reshape(-1)[key]
+
+
+# Function to get the pick order table of a strategy, or None when it doesn't compile
+@functools.lru_cache(maxsize=None)
+def pick_order_table(strategy, num_boxes=NUM_BOXES):
+    compiled = compile_strategy(strategy, num_boxes)
+    return PickOrderTable(compiled) if compiled else None
+
+
+# A uniformly shuffled pick order only matters through the steps at which the special boxes
+# come up, and those are a uniformly random set of distinct steps. The random strategies
+# therefore draw these steps directly instead of shuffling all the boxes
+def _static_random_events(rng, saver_position, rules):
+    num_steps = 1 + rules.num_mimics + rules.num_savers
+    steps = [step.astype(np.int16) for step in _distinct_draws(rng, len(saver_position), num_steps, rules.num_boxes)]
+    columns = [(steps[0] << CONTENT_BITS) | SAVER, (steps[1] << CONTENT_BITS) | MULTIPLIER]
+    columns += [(step << CONTENT_BITS) | MIMIC for step in steps[2:2 + rules.num_mimics]]
+    columns += [(step << CONTENT_BITS) | SAVER for step in steps[2 + rules.num_mimics:]]
+    return columns, np.full(len(saver_position), rules.num_boxes, dtype=np.int8)
+
+
+def _dynamic_random_events(rng, saver_position, rules):
+    # Steps among the other boxes, before the saver is slotted in
+    num_steps = rules.num_mimics + rules.num_savers
+    drawn = _distinct_draws(rng, len(saver_position), num_steps, rules.num_boxes - 1)
+    steps = [step.astype(np.int16) for step in drawn]
+    mimics_found = np.zeros(len(saver_position), dtype=bool)
+    for step in steps[1:1 + rules.num_mimics]:
+        mimics_found |= step < rules.safe_picks
+    saver_step = np.where(mimics_found, steps[0] + 1, rules.safe_picks).astype(np.int16)
+    steps = [step + (step >= saver_step) for step in steps]
+
+    columns = [(saver_step << CONTENT_BITS) | SAVER, (steps[0] << CONTENT_BITS) | MULTIPLIER]
+    columns += [(step << CONTENT_BITS) | MIMIC for step in steps[1:1 + rules.num_mimics]]
+    columns += [(step << CONTENT_BITS) | SAVER for step in steps[1 + rules.num_mimics:]]
+    return columns, np.full(len(saver_position), rules.num_boxes, dtype=np.int8)
+
+
+RANDOM_EVENT_BUILDERS = {
+    static_random_strategy: _static_random_events,
+    dynamic_random_strategy: _dynamic_random_events,
+}
+
+
+# Function to build the (N x picks) pick order matrix of any strategy, -1 padded. Strategies
+# that don't compile are called row by row
+def build_pick_orders(strategy, saver_position, multiplier_position, mimic_positions, num_boxes=NUM_BOXES):
+    table = pick_order_table(strategy, num_boxes)
+    if table:
+        return table.pick_orders(saver_position, multiplier_position, mimic_positions)
+
+    picks = [strategy(num_boxes, int(saver_position[row]), int(multiplier_position[row]), mimic_positions[row].tolist())
+             for row in range(len(saver_position))]
+    orders = np.full((len(picks), max(map(len, picks))), -1, dtype=np.int8)
+    for row, row_picks in enumerate(picks):
+        orders[row, :len(row_picks)] = row_picks
+    return orders
+
+
+# Function to extract the reveal events of any pick order matrix
+def order_events(orders, board, num_mimics=DEFAULT_RULES.num_mimics):
+    num_games, num_picks = orders.shape
+    rows = np.arange(num_games)
+    contents = board[rows[:, None], orders]
+    contents[orders < 0] = EMPTY
+
+    # A killed mimic leaves an empty box behind, so only a mimic's first pick counts
+    for row in np.flatnonzero((contents == MIMIC).sum(axis=1) > num_mimics):
+        seen = set()
+        for step in range(num_picks):
+            if contents[row, step] == MIMIC:
+                if orders[row, step] in seen:
+                    contents[row, step] = EMPTY
+                seen.add(orders[row, step])
+
+    revealed = contents != EMPTY
+    counts = revealed.sum(axis=1)
+    event_rows, event_steps = np.nonzero(revealed)
+    event_index = np.arange(event_rows.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    events = np.full((num_games, int(counts.max()) if num_games else 0), num_picks << CONTENT_BITS, dtype=np.int16)
+    events[event_rows, event_index] = (event_steps << CONTENT_BITS) | contents[event_rows, event_steps]
+    return [events[:, i] for i in range(events.shape[1])], (orders >= 0).sum(axis=1).astype(np.int8)
+
+
+# Function to get the reveal events of N games for a strategy played under the rules
+def strategy_events(strategy, rng, saver_position, multiplier_position, mimic_positions, extra_savers,
+                    rules=DEFAULT_RULES):
+    if strategy in RANDOM_EVENT_BUILDERS:
+        return RANDOM_EVENT_BUILDERS[strategy](rng, saver_position, rules)
+    strategy = rules_strategy(strategy, rules)
+    table = pick_order_table(strategy, rules.num_boxes)
+    if table and not (table.repeats and extra_savers.shape[1]):
+        return table.events(saver_position, multiplier_position, mimic_positions, extra_savers)
+    orders = build_pick_orders(strategy, saver_position, multiplier_position, mimic_positions, rules.num_boxes)
+    board = layout_boards(saver_position, multiplier_position, mimic_positions, extra_savers, rules.num_boxes)
+    return order_events(orders, board, rules.num_mimics)
+
+
+# Function to sort event columns element-wise (odd-even transposition network), which is much
+# cheaper than a row-wise sort for a handful of columns
+def _sort_columns(columns):
+    columns = list(columns)
+    for sweep in range(len(columns)):
+        for i in range(sweep % 2, len(columns) - 1, 2):
+            columns[i], columns[i + 1] = np.minimum(columns[i], columns[i + 1]), np.maximum(columns[i], columns[i + 1])
+    return columns
+
+
+# Function to play N games at once under the rules. Nothing changes between two reveals, so
+# the games are advanced reveal by reveal instead of pick by pick. rolls holds one sucker
+# punch roll per mimic encounter (N x mimics), used only when a mimic is met without a saver
+def play_games(events, num_picks, rolls, rules=DEFAULT_RULES):
+    rules = game_rules(rules)
+    num_boxes = rules.num_boxes
+    events = _sort_columns(events)
+    num_games = len(num_picks)
+    # Bit i is set when the sucker punch on the i-th mimic encounter would land
+    sucker_punches = np.zeros(num_games, dtype=np.int64)
+    for i in range(rules.num_mimics):
+        sucker_punches |= (rolls[:, i] < rules.sucker_punch_chance).astype(np.int64) << i
+
+    savers = np.zeros(num_games, dtype=np.int16)
+    multiplier = np.ones(num_games, dtype=np.int16)
+    mimics_remaining = np.full(num_games, rules.num_mimics, dtype=np.int8)
+    mimics_encountered = np.zeros(num_games, dtype=np.int8)
+    sucker_punch_kills = np.zeros(num_games, dtype=np.int8)
+    boxes_opened = np.zeros(num_games, dtype=np.int8)
+    win = np.zeros(num_games, dtype=bool)
+    active = np.ones(num_games, dtype=bool)
+
+    for column in range(len(events) + 1):
+        if column < len(events):
+            step = events[column] >> CONTENT_BITS
+            content = events[column] & ((1 << CONTENT_BITS) - 1)
+        else:
+            step = num_picks
+
+        # The game ends once every box that isn't a mimic has been opened (picks are counted,
+        # so a repeated pick counts too); that happens before the next reveal or not at all
+        last_step = num_boxes - mimics_remaining - 1
+        finished = active & ((mimics_remaining == 0) | (last_step < np.minimum(step, num_picks)))
+        np.copyto(boxes_opened, num_boxes, where=finished)
+        mimics_encountered += finished * mimics_remaining
+        win |= finished
+        active &= ~finished
+
+        # Out of picks: the game is lost with every pick opened
+        exhausted = active & (step >= num_picks)
+        np.copyto(boxes_opened, num_picks, where=exhausted)
+        active &= ~exhausted
+        if column == len(events) or not active.any():
+            break
+
+        # Safe picks kill the mimic outright, later ones need a saver or a sucker punch
+        is_mimic = active & (content == MIMIC)
+        late_mimic = is_mimic & (step >= rules.safe_picks)
+        saved = late_mimic & (savers > 0)
+        unsaved = late_mimic & ~saved
+        punched = unsaved & ((sucker_punches >> mimics_encountered) & 1).astype(bool)
+        lost = unsaved & ~punched
+        savers -= saved
+        mimics_remaining -= is_mimic & ~lost
+        mimics_encountered += is_mimic
+        sucker_punch_kills += punched
+        np.copyto(boxes_opened, step + 1, where=lost, casting="unsafe")
+        active &= ~lost
+
+        found_saver = active & (content == SAVER)
+        savers += found_saver * multiplier
+        np.copyto(multiplier, 1, where=found_saver)
+        np.copyto(multiplier, rules.multiplier, where=active & (content == MULTIPLIER))
+
+    return win, boxes_opened, mimics_encountered, sucker_punch_kills
+
+
+# Function to simulate N games of one strategy, the batched counterpart of simulate_game.
+# rules may also be a board size, for the default rules on that board
+def simulate_games(strategy, num_games, rng, rules=DEFAULT_RULES):
+    rules = game_rules(rules)
+    saver_position, multiplier_position, mimic_positions, extra_savers = generate_layouts(rng, num_games, rules)
+    events, num_picks = strategy_events(strategy, rng, saver_position, multiplier_position, mimic_positions,
+                                        extra_savers, rules)
+    rolls = rng.random((num_games, rules.num_mimics), dtype=np.float32)
+    return play_games(events, num_picks, rolls, rules)
+
+
+# Function to add the outcomes of a batch of games to the results of one strategy
+def add_batch_results(data, win, boxes_opened, mimics_encountered, sucker_punch_kills):
+    data["wins"] += int(win.sum())
+    data["total_boxes_opened"] += int(boxes_opened.sum(dtype=np.int64))
+    data["total_mimics_encountered"] += int(mimics_encountered.sum(dtype=np.int64))
+    data["sucker_punch_kills"] += int(sucker_punch_kills.sum(dtype=np.int64))
+    num_bins = len(data["boxes_histogram"])
+    win_boxes = np.bincount(win * num_bins + boxes_opened, minlength=2 * num_bins).reshape(2, num_bins)
+    data["win_boxes_histogram"] = [add_histograms(counts, more.tolist())
+                                   for counts, more in zip(data["win_boxes_histogram"], win_boxes)]
+    data["boxes_histogram"] = add_histograms(data["boxes_histogram"], win_boxes.sum(axis=0).tolist())
+    data["mimics_histogram"] = add_histograms(data["mimics_histogram"],
+                                              np.bincount(mimics_encountered, minlength=len(data["mimics_histogram"])).tolist())
+
+
+# Function to run simulations for each strategy (or only the named ones) in batches under
+# the given rules, returns the same results dict as run_simulations
+def run_batch_simulations(num_simulations=NUM_SIMULATIONS, seed=None, batch_size=BATCH_SIZE, strategy_names=None,
+                          rules=DEFAULT_RULES):
+    check_rules(rules)
+    rng = np.random.default_rng(seed)
+    results = {}
+    for strategy_name in strategy_names or strategies:
+        strategy_func = strategies[strategy_name]
+        data = initialize_results(rules)
+        remaining = num_simulations
+        while remaining > 0:
+            num_games = min(batch_size, remaining)
+            remaining -= num_games
+            add_batch_results(data, *simulate_games(strategy_func, num_games, rng, rules))
+        results[strategy_name] = data
+    return results
+
+
+if __name__ == "__main__":
+    display_results(run_batch_simulations(), NUM_SIMULATIONS)
@@ -0,0 +1,206 @@
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from chest_hunt_simlator import (
+    DEFAULT_RULES,
+    NUM_SIMULATIONS,
+    SHARD_SIZE,
+    ChestHuntRules,
+    check_rules,
+    display_results,
+    initialize_results,
+    merge_results,
+    plan_shards,
+    run_shard,
+)
+
+CHECKPOINT_FILE = "chest_hunt_checkpoint.jsonl"
+CHECKPOINT_EVERY = 20  # Shards simulated between two checkpoints
+
+
+# Function to cut a checkpoint file back to its last complete line. A run stopped mid-write
+# leaves a last line without its newline, which the next record would be glued onto
+def trim_torn_line(filename):
+    if not os.path.exists(filename):
+        return
+    with open(filename, "rb+") as file:
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b"\n":
+            return
+        while end > 0:
+            start = max(0, end - 4096)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                file.truncate(start + newline + 1)
+                return
+            end = start
+        file.truncate(0)
+
+
+# Function to append checkpoint records to a file, one JSON line per record. Each record
+# holds the aggregated results of some shards of one strategy, so the file only grows and a
+# run stopped mid-write loses at most its last, unfinished line, which is cut off before
+# anything else is appended
+def append_checkpoint(records, filename=CHECKPOINT_FILE):
+    trim_torn_line(filename)
+    with open(filename, "a") as file:
+        for record in records:
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+# Function to read the checkpoint records of one or more files, skipping a truncated last line
+def read_checkpoints(*filenames):
+    records = []
+    for filename in filenames:
+        if not os.path.exists(filename):
+            continue
+        with open(filename, "r") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+# Function to get the games of every shard of a record. Records written before the games
+# were stored per shard only ever hold full shards, but for the last one of a run
+def shard_games(record):
+    if "shard_games" in record:
+        return record["shard_games"]
+    shard_size = record.get("shard_size", SHARD_SIZE)
+    full = len(record["shards"]) - 1
+    return [shard_size] * full + [record["num_games"] - shard_size * full]
+
+
+# Function to get the rules a record was played under. Records written before the rules were
+# stored were all played under the default rules
+def record_rules(record):
+    return ChestHuntRules(*record["rules"]) if "rules" in record else DEFAULT_RULES
+
+
+# Function to merge checkpoint records into results per strategy. A shard is identified by
+# its seed, shard size, strategy and index, so the same shard met twice (a file merged twice,
+# or copied between machines) is only counted once. The last shard of a run may be short; a
+# longer run plays it again in full (its first games are the same), and the longest one
+# played replaces the others. The shards of one seed cut at two sizes overlap (their first
+# games share a seed), so mixing sizes is refused, and so is mixing rules, whose games
+# don't add up. Returns the results, the games per strategy and the games of every shard done
+def merge_checkpoints(records):
+    records = list(records)
+    shard_sizes = {}
+    longest = {}
+    for record in records:
+        if record_rules(record) != record_rules(records[0]):
+            raise ValueError(f"checkpoints played under {record_rules(records[0])} and {record_rules(record)} "
+                             "can't be merged")
+        shard_size = record.get("shard_size", SHARD_SIZE)
+        if shard_sizes.setdefault(record["seed"], shard_size) != shard_size:
+            raise ValueError(f"seed {record['seed']} was checkpointed with shards of {shard_sizes[record['seed']]} "
+                             f"and {shard_size} games, which overlap")
+        for index, num_games in zip(record["shards"], shard_games(record)):
+            key = (record["seed"], shard_size, record["strategy"], index)
+            longest[key] = max(longest.get(key, 0), num_games)
+
+    results = {}
+    games = {}
+    done = {}
+    for record in records:
+        shard_size = record.get("shard_size", SHARD_SIZE)
+        shards = {(record["seed"], shard_size, record["strategy"], index): num_games
+                  for index, num_games in zip(record["shards"], shard_games(record))}
+        if shards.keys() & done.keys() or any(longest[key] > num_games for key, num_games in shards.items()):
+            continue
+        done.update(shards)
+        merge_results(results.setdefault(record["strategy"], initialize_results(record_rules(record))),
+                      record["results"])
+        games[record["strategy"]] = games.get(record["strategy"], 0) + record["num_games"]
+    return results, games, done
+
+
+# Function to number the shards of a run per strategy, the index plan_shards seeds them with
+def enumerate_shards(num_simulations, seed, shard_size=SHARD_SIZE):
+    indices = {}
+    for shard in plan_shards(num_simulations, seed, shard_size):
+        index = indices.get(shard[0], 0)
+        indices[shard[0]] = index + 1
+        yield index, shard
+
+
+# Function to run simulations like run_simulations, streaming the results to a checkpoint
+# file every checkpoint_every shards. Run again with the same file to resume: the seed, shard
+# size and rules of the file are reused and the shards already in it are skipped (asking for
+# another shard size or other rules than the file's raises ValueError). A short shard is checkpointed on
+# its own, so a resumed run asking for more games can play it again in full in its place.
+# Returns the results of every shard of that seed in the file
+def run_checkpointed_simulations(num_simulations=NUM_SIMULATIONS, seed=None, workers=1, filename=CHECKPOINT_FILE,
+                                 checkpoint_every=CHECKPOINT_EVERY, shard_size=None, rules=None):
+    records = read_checkpoints(filename)
+    if seed is None:
+        seed = records[-1]["seed"] if records else random.SystemRandom().getrandbits(64)
+    seed_records = [record for record in records if record["seed"] == str(seed)]
+    file_shard_size = seed_records[0].get("shard_size", SHARD_SIZE) if seed_records else None
+    if shard_size is None:
+        shard_size = file_shard_size or SHARD_SIZE
+    elif file_shard_size and shard_size != file_shard_size:
+        raise ValueError(f"{filename} holds seed {seed} in shards of {file_shard_size} games, not {shard_size}")
+    file_rules = record_rules(seed_records[0]) if seed_records else None
+    if rules is None:
+        rules = file_rules or DEFAULT_RULES
+    elif file_rules and rules != file_rules:
+        raise ValueError(f"{filename} holds seed {seed} played under {file_rules}, not {rules}")
+    check_rules(rules)
+    _, _, done = merge_checkpoints(seed_records)
+
+    shards = [(index, shard) for index, shard in enumerate_shards(num_simulations, seed, shard_size)
+              if done.get((str(seed), shard_size, shard[0], index), 0) < shard[2]]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        for start in range(0, len(shards), checkpoint_every):
+            chunk = shards[start:start + checkpoint_every]
+            arguments = list(zip(*(shard[1:] for _, shard in chunk))) + [[rules] * len(chunk)]
+            partials = list(executor.map(run_shard, *arguments) if executor else map(run_shard, *arguments))
+
+            chunk_records = {}
+            for (index, (strategy_name, _, num_games, _)), data in zip(chunk, partials):
+                record_key = strategy_name if num_games == shard_size else (strategy_name, index)
+                record = chunk_records.setdefault(record_key, {
+                    "seed": str(seed),
+                    "shard_size": shard_size,
+                    "rules": list(rules),
+                    "strategy": strategy_name,
+                    "shards": [],
+                    "shard_games": [],
+                    "num_games": 0,
+                    "results": initialize_results(rules),
+                })
+                record["shards"].append(index)
+                record["shard_games"].append(num_games)
+                record["num_games"] += num_games
+                merge_results(record["results"], data)
+            append_checkpoint(chunk_records.values(), filename)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    results, games, _ = merge_checkpoints(record for record in read_checkpoints(filename)
+                                          if record["seed"] == str(seed))
+    return results, games
+
+
+# Function to display the results of checkpoint files, merged across runs and machines
+def display_checkpoints(*filenames):
+    results, games, _ = merge_checkpoints(read_checkpoints(*filenames))
+    display_results(results, games)
+
+
+if __name__ == "__main__":
+    display_results(*run_checkpointed_simulations(workers=os.cpu_count()))
@@ -0,0 +1,253 @@
+import math
+
+import numpy as np
+
+from chest_hunt_batch import MULTIPLIER, SAVER, pick_order_table, run_batch_simulations
+from chest_hunt_simlator import (
+    DEFAULT_RULES,
+    NUM_SIMULATIONS,
+    check_rules,
+    game_rules,
+    rules_strategy,
+    strategies,
+)
+
+OUTCOME_KEYS = ("win_rate", "avg_boxes_opened", "avg_mimics_encountered", "avg_sucker_punch_kills")
+
+
+# Kinds of pick along a fixed pick order: a box known to be empty (or already opened), the
+# saver, the multiplier, or a box that hides a mimic or nothing, and the end of the picks
+KNOWN_EMPTY = 0
+UNKNOWN = 3
+END = 4
+
+
+# Function to read the rules of an exact solution, given as rules or as a board size. The
+# chains below track the one saver strategies see; savers found by chance would add a kind of
+# unknown box the chains don't model, so rules with more than one saver are refused
+def exact_rules(rules):
+    rules = check_rules(game_rules(rules))
+    if rules.num_savers != 1:
+        raise ValueError(f"the exact solver only handles one saver, not {rules.num_savers}; "
+                         "simulate these rules instead")
+    return rules
+
+
+# Function to describe a pick order as pick kinds, plus how many unknown boxes are still
+# unopened before each pick
+def pick_kinds(order, saver_position, multiplier_position, known_empty, num_boxes):
+    kinds = []
+    unknown_left = []
+    opened = set(known_empty)
+    left = num_boxes - 2 - len(known_empty)
+    for pick in order:
+        unknown_left.append(left)
+        if pick < 0:
+            kinds.append(END)
+        elif pick == saver_position:
+            kinds.append(SAVER)
+        elif pick == multiplier_position:
+            kinds.append(MULTIPLIER)
+        elif pick in opened:
+            kinds.append(KNOWN_EMPTY)
+        else:
+            kinds.append(UNKNOWN)
+            opened.add(pick)
+            left -= 1
+    return kinds, unknown_left
+
+
+# Function to compute the expected outcome of fixed pick orders under the rules, when the
+# mimics are spread uniformly over the unknown boxes. Every unknown box is a mimic with
+# probability (mimics not met yet) / (unknown boxes left), so each order is a small Markov
+# chain over (mimics met, savers, multiplier found). A mimic met without a saver ends the
+# game unless the sucker punch kills it, and then the chain goes on. rules may also be a
+# board size. Returns per-order expected win, boxes opened, mimics encountered (with second
+# moments) and sucker punch kills
+def expected_outcomes(kinds, unknown_left, num_picks, rules=DEFAULT_RULES):
+    rules = exact_rules(rules)
+    num_boxes, num_mimics, sucker_punch_chance = rules.num_boxes, rules.num_mimics, rules.sucker_punch_chance
+    num_orders, num_steps = kinds.shape
+    max_savers = max(rules.multiplier, 1) * int((kinds == SAVER).sum(axis=1).max())
+    mimics_met = np.arange(num_mimics + 1)
+
+    # Probability of each (mimics met, savers, multiplier found or not) state of the running
+    # game, and the same weighted by sucker punch kills so far
+    probability = np.zeros((num_orders, num_mimics + 1, max_savers + 1, 2))
+    probability[:, 0, 0, 0] = 1
+    kills = np.zeros_like(probability)
+    outcomes = {key: np.zeros(num_orders) for key in ("win", "boxes", "boxes_sq", "mimics", "mimics_sq", "kills")}
+
+    def settle(rows, mass, kill_mass, won, boxes_opened, mimics):
+        outcomes["win"][rows] += mass.sum(axis=1) * won
+        outcomes["boxes"][rows] += mass.sum(axis=1) * boxes_opened
+        outcomes["boxes_sq"][rows] += mass.sum(axis=1) * np.square(boxes_opened, dtype=np.float64)
+        outcomes["mimics"][rows] += (mass * mimics).sum(axis=1)
+        outcomes["mimics_sq"][rows] += (mass * np.square(mimics, dtype=np.float64)).sum(axis=1)
+        outcomes["kills"][rows] += kill_mass.sum(axis=1)
+
+    for step in range(num_steps):
+        kind = kinds[:, step]
+
+        rows = np.flatnonzero(kind == SAVER)
+        if rows.size:
+            mass, kill_mass = probability[rows], kills[rows]
+            probability[rows] = 0
+            kills[rows] = 0
+            for savers in range(max_savers + 1):
+                for multiplier in (0, 1):
+                    found = min(savers + (rules.multiplier if multiplier else 1), max_savers)
+                    probability[rows, :, found, 0] += mass[:, :, savers, multiplier]
+                    kills[rows, :, found, 0] += kill_mass[:, :, savers, multiplier]
+
+        rows = np.flatnonzero(kind == MULTIPLIER)
+        if rows.size:
+            for state in (probability, kills):
+                state[rows, :, :, 1] += state[rows, :, :, 0]
+                state[rows, :, :, 0] = 0
+
+        rows = np.flatnonzero(kind == UNKNOWN)
+        if rows.size:
+            chance = (num_mimics - mimics_met)[None, :] / unknown_left[rows, step][:, None]
+            mass, kill_mass = probability[rows], kills[rows]
+            mimic, kill_mimic = mass * chance[:, :, None, None], kill_mass * chance[:, :, None, None]
+            mass, kill_mass = mass - mimic, kill_mass - kill_mimic
+            if step < rules.safe_picks:
+                # Safe picks kill the mimic outright
+                mass[:, 1:] += mimic[:, :-1]
+                kill_mass[:, 1:] += kill_mimic[:, :-1]
+            else:
+                # A saver takes the hit...
+                mass[:, 1:, :-1] += mimic[:, :-1, 1:]
+                kill_mass[:, 1:, :-1] += kill_mimic[:, :-1, 1:]
+                # ...otherwise it's a sucker punch or the end of the game
+                unsaved, kill_unsaved = mimic[:, :-1, 0], kill_mimic[:, :-1, 0]
+                lost = (1 - sucker_punch_chance) * unsaved.sum(axis=2)
+                settle(rows, lost, (1 - sucker_punch_chance) * kill_unsaved.sum(axis=2),
+                       False, step + 1, mimics_met[None, 1:])
+                mass[:, 1:, 0] += sucker_punch_chance * unsaved
+                kill_mass[:, 1:, 0] += sucker_punch_chance * (kill_unsaved + unsaved)
+            probability[rows], kills[rows] = mass, kill_mass
+
+        # Won once every box that isn't a mimic is opened, or every mimic is dead
+        rows = np.flatnonzero(kind != END)
+        done = (mimics_met == num_mimics) | (step + 1 == num_boxes - (num_mimics - mimics_met))
+        if rows.size and done.any():
+            mass = probability[rows][:, done].sum(axis=(2, 3))
+            kill_mass = kills[rows][:, done].sum(axis=(2, 3))
+            settle(rows, mass, kill_mass, True, num_boxes, num_mimics)
+            probability[rows[:, None], np.flatnonzero(done)[None, :]] = 0
+            kills[rows[:, None], np.flatnonzero(done)[None, :]] = 0
+
+    # Whatever is left ran out of picks
+    settle(np.arange(num_orders), probability.sum(axis=(2, 3)), kills.sum(axis=(2, 3)),
+           False, num_picks, mimics_met[None, :])
+    return outcomes
+
+
+# Function to compute the exact outcome of a deterministic strategy under the rules (or on a
+# board size) over every layout: 30 savers x 29 multipliers x C(28, 4) mimic sets by default,
+# all equally likely. For each (saver, multiplier) the clean order is played with the early
+# boxes known to be empty, and the order taken after an early mimic is played over all
+# mimic sets minus those same layouts
+def solve_strategy(strategy, rules=DEFAULT_RULES):
+    rules = exact_rules(rules)
+    num_boxes = rules.num_boxes
+    table = pick_order_table(rules_strategy(strategy, rules), num_boxes)
+    if table is None:
+        raise ValueError(f"{strategy.__name__} is not deterministic, it can't be solved exactly")
+    all_mimic_sets = math.comb(num_boxes - 2, rules.num_mimics)
+
+    kinds, unknown_left, num_picks, layouts = [], [], [], []
+    for saver_position in range(num_boxes):
+        for multiplier_position in range(num_boxes):
+            if multiplier_position == saver_position:
+                continue
+            early = set(np.flatnonzero(table.early[saver_position, multiplier_position]).tolist())
+            clean_mimic_sets = math.comb(num_boxes - 2 - len(early), rules.num_mimics)
+            plays = [(0, early, clean_mimic_sets)]
+            if early:
+                plays += [(1, set(), all_mimic_sets), (1, early, -clean_mimic_sets)]
+            for flagged, known_empty, count in plays:
+                order = table.orders[saver_position, multiplier_position, flagged].tolist()
+                order_kinds, order_unknown_left = pick_kinds(order, saver_position, multiplier_position,
+                                                             known_empty, num_boxes)
+                kinds.append(order_kinds)
+                unknown_left.append(order_unknown_left)
+                num_picks.append(int(table.num_picks[saver_position, multiplier_position, flagged]))
+                layouts.append(count)
+
+    outcomes = expected_outcomes(np.array(kinds, dtype=np.int8), np.array(unknown_left),
+                                 np.array(num_picks), rules)
+    layouts = np.array(layouts, dtype=np.float64)
+    num_layouts = num_boxes * (num_boxes - 1) * all_mimic_sets
+    totals = {key: math.fsum(values * layouts) / num_layouts for key, values in outcomes.items()}
+
+    return {
+        "win_rate": totals["win"],
+        "avg_boxes_opened": totals["boxes"],
+        "var_boxes_opened": totals["boxes_sq"] - totals["boxes"] ** 2,
+        "avg_mimics_encountered": totals["mimics"],
+        "var_mimics_encountered": totals["mimics_sq"] - totals["mimics"] ** 2,
+        "avg_sucker_punch_kills": totals["kills"],
+        "layouts": num_layouts,
+    }
+
+
+# Function to solve every deterministic strategy of the strategies dict under the rules
+def solve_strategies(rules=DEFAULT_RULES):
+    rules = exact_rules(rules)
+    return {
+        strategy_name: solve_strategy(strategy_func, rules)
+        for strategy_name, strategy_func in strategies.items()
+        if pick_order_table(rules_strategy(strategy_func, rules), rules.num_boxes)
+    }
+
+
+# Function to put a Monte Carlo results dict (from run_simulations or run_batch_simulations)
+# next to the exact values: error, standard error of the estimate and z-score
+def monte_carlo_errors(exact, results, num_simulations):
+    errors = {}
+    for strategy_name, solution in exact.items():
+        data = results[strategy_name]
+        estimates = {
+            "win_rate": data["wins"] / num_simulations,
+            "avg_boxes_opened": data["total_boxes_opened"] / num_simulations,
+            "avg_mimics_encountered": data["total_mimics_encountered"] / num_simulations,
+            "avg_sucker_punch_kills": data["sucker_punch_kills"] / num_simulations,
+        }
+        variances = {
+            "win_rate": solution["win_rate"] * (1 - solution["win_rate"]),
+            "avg_boxes_opened": solution["var_boxes_opened"],
+            "avg_mimics_encountered": solution["var_mimics_encountered"],
+        }
+        errors[strategy_name] = {}
+        for key in OUTCOME_KEYS:
+            error = estimates[key] - solution[key]
+            standard_error = math.sqrt(variances[key] / num_simulations) if key in variances else None
+            errors[strategy_name][key] = {
+                "exact": solution[key],
+                "monte_carlo": estimates[key],
+                "error": error,
+                "standard_error": standard_error,
+                "z": error / standard_error if standard_error else None,
+            }
+    return errors
+
+
+# Function to display exact values and the Monte Carlo error of a run
+def display_exact_results(errors, num_simulations):
+    print(f"Exact results vs Monte Carlo ({num_simulations} games per strategy):")
+    for strategy_name, rows in errors.items():
+        print(f"{strategy_name}:")
+        for key, row in rows.items():
+            line = f"  {key}: exact {row['exact']:.6f}, monte carlo {row['monte_carlo']:.6f}, error {row['error']:+.6f}"
+            if row["standard_error"] is not None:
+                line += f" (standard error {row['standard_error']:.6f}, z {row['z']:+.2f})"
+            print(line)
+
+
+if __name__ == "__main__":
+    exact = solve_strategies()
+    results = run_batch_simulations(NUM_SIMULATIONS)
+    display_exact_results(monte_carlo_errors(exact, results, NUM_SIMULATIONS), NUM_SIMULATIONS)
@@ -0,0 +1,262 @@
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from chest_hunt_batch import run_batch_simulations
+from chest_hunt_exact import exact_rules, expected_outcomes, pick_kinds, solve_strategies, solve_strategy
+from chest_hunt_simlator import (
+    DEFAULT_RULES,
+    NUM_BOXES,
+    NUM_SIMULATIONS,
+    compile_strategy,
+    display_results,
+    rules_strategy,
+    seed_policy,
+    strategies,
+)
+
+OBJECTIVES = ("win_rate", "avg_boxes_opened")
+ITERATIONS = 60  # Local search rounds per saver position
+NEIGHBORS = 16  # Candidate policies scored per round
+POLICY_FILE = "policy.json"
+
+
+# A pick policy, usable anywhere a strategy is. For each saver position it holds an order
+# of the other boxes, the pick at which the saver is taken and whether the saver is picked
+# again once the multiplier is revealed. The saver box keeps paying out, so re-picking it
+# right after the multiplier doubles it, which is what refined_dynamic_strategy wins with.
+# The saver is taken right after the multiplier is revealed if that comes first, and held
+# back until then when a mimic is revealed by the safe picks. It only ever reacts to what
+# has been revealed
+class PolicyStrategy:
+    def __init__(self, orders, open_at, repick, num_boxes=NUM_BOXES):
+        self.__name__ = "policy_strategy"
+        self.num_boxes = num_boxes
+        self.orders = orders  # Per saver position: the other boxes, in pick order
+        self.open_at = open_at  # Per saver position: pick index where the saver is taken
+        self.repick = repick  # Per saver position: whether the saver is picked again after the multiplier
+
+    def __call__(self, num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
+        if num_boxes != self.num_boxes:
+            raise ValueError(f"policy was built for {self.num_boxes} boxes, not {num_boxes}")
+        order = self.orders[saver_position]
+        open_at = self.open_at[saver_position]
+        held = open_at >= rules.safe_picks and any(pick in mimic_positions for pick in order[:rules.safe_picks])
+        return policy_picks(order, open_at, self.repick[saver_position], saver_position, multiplier_position, held)
+
+
+# Function to turn a policy order into picks, given whether the safe picks revealed a mimic
+def policy_picks(order, open_at, repick, saver_position, multiplier_position, held):
+    picks = []
+    saver_taken = False
+    for pick in order:
+        if not saver_taken and not held and len(picks) == open_at:
+            picks.append(saver_position)
+            saver_taken = True
+        picks.append(pick)
+        if pick == multiplier_position and (repick or not saver_taken):
+            picks.append(saver_position)
+            saver_taken = True
+    return picks
+
+
+# Function to describe the layouts a policy plays for one saver position under the rules,
+# the way solve_strategy does for a compiled strategy: (multiplier, picks, boxes known empty,
+# signed number of mimic sets)
+def policy_plays(order, open_at, repick, saver_position, rules=DEFAULT_RULES):
+    num_boxes, num_mimics, safe_picks = rules.num_boxes, rules.num_mimics, rules.safe_picks
+    all_mimic_sets = math.comb(num_boxes - 2, num_mimics)
+    plays = []
+    for multiplier_position in order:
+        clean = policy_picks(order, open_at, repick, saver_position, multiplier_position, False)
+        flagged = policy_picks(order, open_at, repick, saver_position, multiplier_position, True)
+        if open_at < safe_picks or clean == flagged:
+            plays.append((multiplier_position, clean, set(), all_mimic_sets))
+            continue
+        early = set(order[:safe_picks])
+        clean_mimic_sets = math.comb(num_boxes - 2 - len(early), num_mimics)
+        plays += [(multiplier_position, clean, early, clean_mimic_sets),
+                  (multiplier_position, flagged, set(), all_mimic_sets),
+                  (multiplier_position, flagged, early, -clean_mimic_sets)]
+    return plays
+
+
+# Function to score candidate (order, open_at, repick) policies of one saver position exactly
+# under the rules (or on a board size), all of them in one batch. Returns (win rate, average
+# boxes opened) per candidate
+def evaluate_candidates(saver_position, candidates, rules=DEFAULT_RULES):
+    rules = exact_rules(rules)
+    num_boxes = rules.num_boxes
+    kinds, unknown_left, num_picks, owners, layouts = [], [], [], [], []
+    for index, (order, open_at, repick) in enumerate(candidates):
+        for multiplier_position, picks, known_empty, count in policy_plays(order, open_at, repick, saver_position,
+                                                                           rules):
+            # A re-picked saver makes one pick more, the other orders end early
+            padded = picks + [-1] * (num_boxes + 1 - len(picks))
+            order_kinds, order_unknown_left = pick_kinds(padded, saver_position, multiplier_position,
+                                                         known_empty, num_boxes)
+            kinds.append(order_kinds)
+            unknown_left.append(order_unknown_left)
+            num_picks.append(len(picks))
+            owners.append(index)
+            layouts.append(count)
+
+    outcomes = expected_outcomes(np.array(kinds, dtype=np.int8), np.array(unknown_left),
+                                 np.array(num_picks), rules)
+    weights = np.array(layouts, dtype=np.float64) / ((num_boxes - 1) * math.comb(num_boxes - 2, rules.num_mimics))
+    wins = np.bincount(owners, weights=outcomes["win"] * weights, minlength=len(candidates))
+    boxes = np.bincount(owners, weights=outcomes["boxes"] * weights, minlength=len(candidates))
+    return list(zip(wins.tolist(), boxes.tolist()))
+
+
+# Function to make a neighbor of a policy: swap two boxes, move one box, move the saver, or
+# switch re-picking the saver after the multiplier
+def mutate_policy(policy, rng):
+    order, open_at, repick = list(policy[0]), policy[1], policy[2]
+    move = rng.random()
+    if move < 0.4:
+        i, j = rng.sample(range(len(order)), 2)
+        order[i], order[j] = order[j], order[i]
+    elif move < 0.8:
+        order.insert(rng.randrange(len(order)), order.pop(rng.randrange(len(order))))
+    elif move < 0.95:
+        open_at = min(len(order), max(0, open_at + rng.choice((-2, -1, 1, 2))))
+    else:
+        repick = not repick
+    return tuple(order), open_at, repick
+
+
+# Function to search the best policy of one saver position. The objective decomposes over
+# saver positions, so each one is searched on its own: hill climbing from the policies of
+# the existing strategies, scoring a round of neighbors in one batch. Every scored policy
+# is cached, so neighbors met again cost nothing
+def optimize_saver(saver_position, objective="win_rate", iterations=ITERATIONS, neighbors=NEIGHBORS,
+                   seed=None, rules=DEFAULT_RULES):
+    rules = exact_rules(rules)
+    rng = random.Random(f"{seed}:{saver_position}")
+    key = OBJECTIVES.index(objective)
+    cache = {}
+
+    def score(candidates):
+        missing = list(dict.fromkeys(candidate for candidate in candidates if candidate not in cache))
+        if missing:
+            cache.update(zip(missing, evaluate_candidates(saver_position, missing, rules)))
+        # Ties on the objective go to the other outcome
+        return [(cache[candidate][key], cache[candidate][1 - key]) for candidate in candidates]
+
+    seeds = []
+    for strategy_func in strategies.values():
+        strategy_func = rules_strategy(strategy_func, rules)
+        # Stochastic strategies have no single policy to start from
+        if compile_strategy(strategy_func, rules.num_boxes) is None:
+            continue
+        policy = seed_policy(strategy_func, saver_position, rules.num_boxes)
+        if policy:
+            seeds += [(tuple(policy[0]), policy[1], repick) for repick in (False, True)]
+    best_score, best = max(zip(score(seeds), seeds))
+
+    for _ in range(iterations):
+        candidates = [mutate_policy(best, rng) for _ in range(neighbors)]
+        round_score, candidate = max(zip(score(candidates), candidates))
+        if round_score > best_score:
+            best_score, best = round_score, candidate
+
+    return {
+        "saver_position": saver_position,
+        "order": list(best[0]),
+        "open_at": best[1],
+        "repick": best[2],
+        "win_rate": cache[best][0],
+        "avg_boxes_opened": cache[best][1],
+        "evaluated": len(cache),
+    }
+
+
+# Function to search a policy for every saver position under the rules (or on a board size),
+# in worker processes (workers=1 searches in this process). With the same seed the policy is
+# the same whatever the workers
+def optimize_policy(objective="win_rate", iterations=ITERATIONS, neighbors=NEIGHBORS, seed=None, workers=1,
+                    rules=DEFAULT_RULES):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"unknown objective {objective!r}, expected one of {OBJECTIVES}")
+    rules = exact_rules(rules)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    arguments = [(saver_position, objective, iterations, neighbors, seed, rules)
+                 for saver_position in range(rules.num_boxes)]
+    if workers == 1:
+        searches = [optimize_saver(*argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            searches = list(executor.map(optimize_saver, *zip(*arguments)))
+
+    policy = PolicyStrategy([search["order"] for search in searches], [search["open_at"] for search in searches],
+                            [search["repick"] for search in searches], rules.num_boxes)
+    return policy, searches
+
+
+# Function to find the deterministic strategy of the strategies dict that the exact solver
+# scores best on the objective under the rules (ties going to the other outcome). Returns
+# (name, exact results), or None when no strategy compiles
+def best_seed_strategy(objective="win_rate", rules=DEFAULT_RULES):
+    exact = solve_strategies(rules)
+    if not exact:
+        return None
+    other = OBJECTIVES[1 - OBJECTIVES.index(objective)]
+    strategy_name = max(exact, key=lambda name: (exact[name][objective], exact[name][other]))
+    return strategy_name, exact[strategy_name]
+
+
+# Function to tell whether a policy's exact results beat a strategy's on the objective, ties
+# going to the other outcome
+def policy_beats(policy_exact, strategy_exact, objective="win_rate"):
+    other = OBJECTIVES[1 - OBJECTIVES.index(objective)]
+    return ((policy_exact[objective], policy_exact[other])
+            > (strategy_exact[objective], strategy_exact[other]))
+
+
+# Function to save a policy to a file
+def save_policy(policy, filename=POLICY_FILE):
+    with open(filename, "w") as file:
+        json.dump({"num_boxes": policy.num_boxes, "orders": policy.orders, "open_at": policy.open_at,
+                   "repick": policy.repick}, file, indent=4)
+
+
+# Function to load a policy from a file
+def load_policy(filename=POLICY_FILE):
+    with open(filename, "r") as file:
+        data = json.load(file)
+    # Policies saved before re-picking existed never re-pick
+    return PolicyStrategy(data["orders"], data["open_at"], data.get("repick", [False] * len(data["orders"])),
+                          data["num_boxes"])
+
+
+# Function to display the search of every saver position
+def display_searches(searches):
+    print("Policy search results:")
+    for search in searches:
+        print(f"  Saver at {search['saver_position']:2d}: {search['win_rate']:.2%} win rate, "
+              f"{search['avg_boxes_opened']:.2f} boxes opened, saver taken at pick {search['open_at']}"
+              f"{' and again after the multiplier' if search['repick'] else ''} "
+              f"({search['evaluated']} policies scored)")
+
+
+if __name__ == "__main__":
+    policy, searches = optimize_policy(workers=os.cpu_count())
+    display_searches(searches)
+
+    exact = solve_strategy(policy)
+    print(f"Best policy: {exact['win_rate']:.4%} win rate, {exact['avg_boxes_opened']:.3f} boxes opened (exact)")
+    # Only a policy that beats every existing strategy is worth saving
+    best = best_seed_strategy()
+    if best and not policy_beats(exact, best[1]):
+        print(f"{best[0]} does better: {best[1]['win_rate']:.4%} win rate, "
+              f"{best[1]['avg_boxes_opened']:.3f} boxes opened (exact), the policy isn't saved")
+    else:
+        save_policy(policy)
+        strategies["optimized_policy"] = policy
+    display_results(run_batch_simulations(NUM_SIMULATIONS), NUM_SIMULATIONS)
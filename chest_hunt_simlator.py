@@ -1,8 +1,32 @@
+import argparse
+import collections
+import functools
+import json
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 
 # Define constants
 NUM_BOXES = 30
 NUM_SIMULATIONS = 1000000  # Adjust as needed for accuracy
+SHARD_SIZE = 50000  # Games per seeded shard in run_simulations
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)  # Boxes opened percentiles to display
+# A model of what a chest hunt pays, for the expected souls figure. Both values are
+# assumptions, not read from the game: every box opened pays one box's loot, and a won
+# hunt (every box opened) pays its boxes twice
+SOULS_PER_BOX = 1  # Souls per box opened, in units of one box's loot
+WIN_SOULS_MULTIPLIER = 2  # What a won chest hunt multiplies its boxes' loot by (assumed)
+
+# The rules of a chest hunt, which perks change: the board size, how many mimics and savers
+# are hidden, what the multiplier multiplies the next saver by, how many opening picks are
+# safe and the chance a sucker punch kills a mimic met without a saver. Strategies only see
+# the first saver; any other saver is found by chance, like the multiplier
+ChestHuntRules = collections.namedtuple(
+    "ChestHuntRules",
+    ("num_boxes", "num_mimics", "num_savers", "multiplier", "safe_picks", "sucker_punch_chance"),
+    defaults=(NUM_BOXES, 4, 1, 2, 2, 0.02),
+)
+DEFAULT_RULES = ChestHuntRules()
 
 def print_game(index, picks, mimic_positions, saver_position, multiplier_position):
     for i in range(len(picks)):
@@ -29,22 +53,51 @@ def print_game_row(index, picks, mimic_positions, saver_position, multiplier_pos
             line += " 📦 "
     print(line)
 
-# Function to simulate one game with any given strategy
-def simulate_game(strategy, num_boxes):
+# Function to check that rules describe a playable chest hunt
+def check_rules(rules):
+    if rules.num_boxes < rules.num_mimics + rules.num_savers + 1:
+        raise ValueError(f"{rules.num_boxes} boxes can't hold {rules.num_mimics} mimics, "
+                         f"{rules.num_savers} savers and the multiplier")
+    if rules.num_mimics < 1 or rules.num_savers < 1 or rules.safe_picks < 0:
+        raise ValueError(f"a chest hunt needs a mimic, a saver and no negative safe picks: {rules}")
+    if rules.safe_picks > rules.num_boxes - 2:
+        # The opening picks come before the saver, which needs a pick of its own after them
+        raise ValueError(f"{rules.safe_picks} safe picks leave no room for the saver and a late pick "
+                         f"on {rules.num_boxes} boxes")
+    if not 0 <= rules.sucker_punch_chance <= 1:
+        raise ValueError(f"the sucker punch chance {rules.sucker_punch_chance} isn't a probability")
+    return rules
+
+# Function to read rules given as rules or as a board size, for the default rules on that board
+def game_rules(rules):
+    if not isinstance(rules, ChestHuntRules):
+        return DEFAULT_RULES._replace(num_boxes=rules)
+    return rules
+
+# Function to simulate one game with any given strategy. rules may also be a board size, for
+# the default rules on that board
+def simulate_game(strategy, rules=DEFAULT_RULES):
+    rules = game_rules(rules)
+    num_boxes, num_mimics, num_savers, multiplier_value, safe_picks, sucker_punch_chance = rules
+
     # Initialize the game setup
     boxes = ["empty"] * num_boxes
     saver_position = random.randint(0, num_boxes - 1)
     multiplier_position = random.choice([i for i in range(num_boxes) if i != saver_position])
-    mimic_positions = random.sample([i for i in range(num_boxes) if i != saver_position and i != multiplier_position], 4)
+    hidden = random.sample([i for i in range(num_boxes) if i != saver_position and i != multiplier_position],
+                           num_mimics + num_savers - 1)
+    mimic_positions = hidden[:num_mimics]
 
     boxes[saver_position] = "saver"
     boxes[multiplier_position] = "multiplier"
     for mimic_position in mimic_positions:
         boxes[mimic_position] = "mimic"
+    for extra_saver in hidden[num_mimics:]:
+        boxes[extra_saver] = "saver"
 
     # Initialize the game state
     savers = 0
-    mimics_remaining = 4
+    mimics_remaining = num_mimics
     mimics_encountered = 0
     sucker_punch_kills = 0
     picks = strategy(num_boxes, saver_position, multiplier_position, mimic_positions)
@@ -58,8 +111,8 @@ def simulate_game(strategy, num_boxes):
         content = boxes[pick]
 
         # print_game(i, picks[:i + 1], mimic_positions, saver_position, multiplier_position)
-        if i < 2:
-            # First two picks are safe: kill mimics or reveal the saver/multiplier
+        if i < safe_picks:
+            # Opening picks are safe: kill mimics or reveal the saver/multiplier
             if content == "mimic":
                 boxes[pick] = "empty"  # Safe pick eliminates mimic
                 mimics_encountered += 1
@@ -68,7 +121,7 @@ def simulate_game(strategy, num_boxes):
                 savers += 1 * multiplier
                 multiplier = 1
             elif content == "multiplier":
-                multiplier = 2  # If multiplier is found, saver is automatically granted
+                multiplier = multiplier_value  # If multiplier is found, saver is automatically granted
                 #return True, boxes_opened, mimics_encountered, sucker_punch_kills
         else:
             if content == "mimic":
@@ -77,7 +130,7 @@ def simulate_game(strategy, num_boxes):
                     savers -= 1  # Mimic consumes the saver
                     boxes[pick] = "empty"  # 2% chance to kill the mimic
                     mimics_remaining -= 1
-                elif random.random() < 0.02:
+                elif random.random() < sucker_punch_chance:
                     boxes[pick] = "empty"  # 2% chance to kill the mimic
                     sucker_punch_kills += 1
                     mimics_remaining -= 1
@@ -87,7 +140,7 @@ def simulate_game(strategy, num_boxes):
                 savers += 1 * multiplier
                 multiplier = 1
             elif content == "multiplier":
-                multiplier = 2
+                multiplier = multiplier_value
 
         # Check if the game should end
         if mimics_remaining == 0 or boxes_opened == num_boxes - mimics_remaining:
@@ -100,15 +153,15 @@ def simulate_game(strategy, num_boxes):
     return False, boxes_opened, mimics_encountered, sucker_punch_kills
 
 # Dynamic random strategy implementation
-def dynamic_random_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def dynamic_random_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     picks = random.sample(range(num_boxes), num_boxes)
     picks.remove(saver_position)
 
-    first_two_picks = picks[:2]
-    mimics_found = any(pick in mimic_positions for pick in first_two_picks)
+    opening_picks = picks[:rules.safe_picks]
+    mimics_found = any(pick in mimic_positions for pick in opening_picks)
 
     if not mimics_found:
-        picks.insert(2, saver_position)
+        picks.insert(rules.safe_picks, saver_position)
     else:
         picks.insert(picks.index(multiplier_position) + 1, saver_position)
     
@@ -116,15 +169,15 @@ def dynamic_random_strategy(num_boxes, saver_position, multiplier_position, mimi
     return picks
 
 # Dynamic sequential strategy implementation
-def dynamic_sequential_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def dynamic_sequential_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     picks = list(range(num_boxes))
     picks.remove(saver_position)
 
-    first_two_picks = picks[:2]
-    mimics_found = any(pick in mimic_positions for pick in first_two_picks)
+    opening_picks = picks[:rules.safe_picks]
+    mimics_found = any(pick in mimic_positions for pick in opening_picks)
 
     if not mimics_found:
-        picks.insert(2, saver_position)
+        picks.insert(rules.safe_picks, saver_position)
     else:
         multiplier_index = picks.index(multiplier_position)
         picks.insert(multiplier_index + 1, saver_position)
@@ -132,15 +185,15 @@ def dynamic_sequential_strategy(num_boxes, saver_position, multiplier_position,
     return picks
 
 # Dynamic reverse sequential strategy implementation
-def dynamic_sequential_reverse_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def dynamic_sequential_reverse_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     picks = list(range(num_boxes - 1, -1, -1))
     picks.remove(saver_position)
 
-    first_two_picks = picks[:2]
-    mimics_found = any(pick in mimic_positions for pick in first_two_picks)
+    opening_picks = picks[:rules.safe_picks]
+    mimics_found = any(pick in mimic_positions for pick in opening_picks)
 
     if not mimics_found:
-        picks.insert(2, saver_position)
+        picks.insert(rules.safe_picks, saver_position)
     else:
         multiplier_index = picks.index(multiplier_position)
         picks.insert(multiplier_index + 1, saver_position)
@@ -148,19 +201,19 @@ def dynamic_sequential_reverse_strategy(num_boxes, saver_position, multiplier_po
     return picks
 
 # Static random strategy implementation
-def static_random_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def static_random_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     return random.sample(range(num_boxes), num_boxes)
 
 # Static sequential strategy implementation
-def static_sequential_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def static_sequential_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     return list(range(num_boxes))
 
 # Static reverse sequential strategy implementation
-def static_sequential_reverse_strategy(num_boxes, saver_position, multiplier_position, mimic_positions):
+def static_sequential_reverse_strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     return list(range(num_boxes - 1, -1, -1))
 
 # Your refined strategy implementation
-def refined_strategy_picks(num_boxes, saver_position, multiplier_position, mimic_positions):
+def refined_strategy_picks(num_boxes, saver_position, multiplier_position, mimic_positions, rules=DEFAULT_RULES):
     picks = []
     picked_boxes = set()
     
@@ -177,11 +230,15 @@ def refined_strategy_picks(num_boxes, saver_position, multiplier_position, mimic
             return True
         return False
     
-    # 1. First two picks based on the saver's position
-    if not make_pick(saver_position + 2):
-        make_pick(saver_position - 4)
-    if not make_pick(saver_position - 2):
-        make_pick(saver_position + 4)
+    # 1. One opening pick per safe pick based on the saver's position: saver + 2, saver - 2,
+    # saver + 4, saver - 4 and so on, each falling back to the far side, one step further out
+    # (saver - 4 for saver + 2), when it is off the board or taken. A pick with neither left is skipped
+    for opening in range(rules.safe_picks):
+        side = 1 if opening % 2 == 0 else -1
+        distance = 2 * (opening // 2 + 1)
+        for position in (saver_position + side * distance, saver_position - side * (distance + 2)):
+            if position not in picked_boxes and make_pick(position):
+                break
 
     no_special_pick = True
     if multiplier_position in picked_boxes:
@@ -222,7 +279,8 @@ def refined_strategy_picks(num_boxes, saver_position, multiplier_position, mimic
 
     return picks
 
-# Define strategies to test
+# Define strategies to test. Every strategy takes the rules as a keyword: the dynamic ones
+# hold the saver back until their safe opening picks are done
 strategies = {
     # "static_random": static_random_strategy,
     # "static_sequential": static_sequential_strategy,
@@ -233,49 +291,307 @@ strategies = {
     "refined_dynamic_strategy": refined_strategy_picks,
 }
 
-# Function to run simulations for each strategy
-def run_simulations():
-    results = {
-        strategy_name: {
-            "wins": 0,
-            "total_boxes_opened": 0,
-            "min_boxes": float('inf'),
-            "max_boxes": 0,
-            "total_mimics_encountered": 0,
-            "min_mimics": float('inf'),
-            "max_mimics": 0,
-            "sucker_punch_kills": 0
-        }
-        for strategy_name in strategies
+# Function to bind a strategy to rules. Strategies only look at the board size and the safe
+# picks, so they're bound to those alone: every rule set sharing them shares one bound
+# strategy, and one compiled table. The default rules give the strategy itself. The bound
+# strategy keeps its rules, so a compiled table knows which rules it was built for
+@functools.lru_cache(maxsize=None)
+def rules_strategy(strategy, rules=DEFAULT_RULES):
+    strategy_rules = DEFAULT_RULES._replace(num_boxes=rules.num_boxes, safe_picks=rules.safe_picks)
+    if strategy_rules == DEFAULT_RULES:
+        return strategy
+    bound = functools.update_wrapper(functools.partial(strategy, rules=strategy_rules), strategy)
+    bound.rules = strategy_rules
+    return bound
+
+# A strategy compiled into a lookup table of pick orders. Deterministic strategies only
+# react to the saver, the multiplier and whether a mimic sits among their opening picks,
+# so every (saver, multiplier, early mimic) order is built once, stored as bytes (uint8)
+# and served as-is: a call allocates nothing. The table holds the orders of the rules it was
+# compiled for; called with other rules, the strategy itself plays them
+class CompiledStrategy:
+    def __init__(self, strategy, num_boxes, orders, early):
+        self.strategy = strategy
+        self.__name__ = strategy.__name__
+        self.num_boxes = num_boxes
+        self.rules = getattr(strategy, "rules", DEFAULT_RULES)._replace(num_boxes=num_boxes)
+        self.orders = orders  # Indexed by (saver * num_boxes + multiplier) * 2 + early mimic
+        self.early = early  # Per (saver, multiplier): one byte per box, 1 for an opening pick
+
+    def __call__(self, num_boxes, saver_position, multiplier_position, mimic_positions, rules=None):
+        if rules is not None and rules.safe_picks != self.rules.safe_picks:
+            return self.strategy(num_boxes, saver_position, multiplier_position, mimic_positions, rules=rules)
+        if num_boxes != self.num_boxes:
+            return self.strategy(num_boxes, saver_position, multiplier_position, mimic_positions)
+        pair = saver_position * num_boxes + multiplier_position
+        early = self.early[pair]
+        for position in mimic_positions:
+            if early[position]:
+                return self.orders[2 * pair + 1]
+        return self.orders[2 * pair]
+
+    # Function to get the order, the opening picks and the order after an early mimic of a
+    # (saver, multiplier) pair
+    def lookup(self, saver_position, multiplier_position):
+        pair = saver_position * self.num_boxes + multiplier_position
+        return self.orders[2 * pair], self.early[pair], self.orders[2 * pair + 1]
+
+# Function to find which mimic positions switch a strategy away from its clean order, by
+# splitting the candidates in halves: a group without any of them leaves the order unchanged.
+# Returns the early positions and every order they led to
+def probe_early_picks(strategy, num_boxes, saver_position, multiplier_position, clean, candidates):
+    if not candidates:
+        return [], []
+    picks = strategy(num_boxes, saver_position, multiplier_position, candidates)
+    if picks == clean:
+        return [], []
+    if len(candidates) == 1:
+        return candidates, [picks]
+    middle = len(candidates) // 2
+    early, flagged = probe_early_picks(strategy, num_boxes, saver_position, multiplier_position, clean, candidates[:middle])
+    more, more_flagged = probe_early_picks(strategy, num_boxes, saver_position, multiplier_position, clean, candidates[middle:])
+    return early + more, flagged + more_flagged + [picks]
+
+# Function to compile a strategy, or None when it can't be: stochastic strategies (two
+# identical calls disagree) and strategies that react to mimics in some other way
+@functools.lru_cache(maxsize=None)
+def compile_strategy(strategy, num_boxes=NUM_BOXES):
+    if isinstance(strategy, CompiledStrategy):
+        return strategy
+    orders = [b""] * (2 * num_boxes * num_boxes)
+    early_picks = [bytes(num_boxes)] * (num_boxes * num_boxes)
+    for saver_position in range(num_boxes):
+        for multiplier_position in range(num_boxes):
+            if multiplier_position == saver_position:
+                continue
+            clean = list(strategy(num_boxes, saver_position, multiplier_position, []))
+            if clean != list(strategy(num_boxes, saver_position, multiplier_position, [])):
+                return None
+            if any(not 0 <= pick < num_boxes for pick in clean):
+                return None
+            candidates = [i for i in range(num_boxes) if i not in (saver_position, multiplier_position)]
+            early, flagged = probe_early_picks(strategy, num_boxes, saver_position, multiplier_position,
+                                               clean, candidates)
+            if any(list(picks) != list(flagged[0]) for picks in flagged[1:]):
+                return None
+            pair = saver_position * num_boxes + multiplier_position
+            orders[2 * pair] = bytes(clean)
+            orders[2 * pair + 1] = bytes(flagged[0]) if flagged else orders[2 * pair]
+            early_picks[pair] = bytes(1 if i in early else 0 for i in range(num_boxes))
+    return CompiledStrategy(strategy, num_boxes, orders, early_picks)
+
+# Function to read the policy a strategy plays for one saver position: its picks with no
+# multiplier and no mimic in sight, minus the saver, and where the saver was taken
+def seed_policy(strategy, saver_position, num_boxes=NUM_BOXES):
+    picks = list(strategy(num_boxes, saver_position, -1, []))
+    open_at = picks.index(saver_position) if saver_position in picks else num_boxes - 1
+    order = [pick for pick in dict.fromkeys(picks) if pick != saver_position]
+    if sorted(order) != [i for i in range(num_boxes) if i != saver_position]:
+        return None
+    return order, open_at
+
+# Function to initialize the results of one strategy. Boxes opened and mimics encountered
+# are kept as histograms (games per value), which add up across shards and give the
+# percentiles, variance and expected souls of a run
+def initialize_results(rules=DEFAULT_RULES):
+    num_boxes = rules.num_boxes
+    return {
+        "wins": 0,
+        "total_boxes_opened": 0,
+        "total_mimics_encountered": 0,
+        "sucker_punch_kills": 0,
+        "boxes_histogram": [0] * (num_boxes + 1),  # Games per number of boxes opened
+        "mimics_histogram": [0] * (rules.num_mimics + 1),  # Games per number of mimics encountered
+        "win_boxes_histogram": [[0] * (num_boxes + 1), [0] * (num_boxes + 1)],  # Same, split by lost/won
     }
 
-    for strategy_name, strategy_func in strategies.items():
-        for _ in range(NUM_SIMULATIONS):
-            win, boxes_opened, mimics_encountered, sucker_punch_kills = simulate_game(strategy_func, NUM_BOXES)
-            results[strategy_name]["total_boxes_opened"] += boxes_opened
-            results[strategy_name]["min_boxes"] = min(results[strategy_name]["min_boxes"], boxes_opened)
-            results[strategy_name]["max_boxes"] = max(results[strategy_name]["max_boxes"], boxes_opened)
-            results[strategy_name]["total_mimics_encountered"] += mimics_encountered
-            results[strategy_name]["min_mimics"] = min(results[strategy_name]["min_mimics"], mimics_encountered)
-            results[strategy_name]["max_mimics"] = max(results[strategy_name]["max_mimics"], mimics_encountered)
-            results[strategy_name]["sucker_punch_kills"] += sucker_punch_kills
-            if win:
-                results[strategy_name]["wins"] += 1
+# Function to merge the results of one strategy into another; totals and histograms add up,
+# so merging shards in any grouping gives the same dict
+def merge_results(data, other):
+    data["wins"] += other["wins"]
+    data["total_boxes_opened"] += other["total_boxes_opened"]
+    data["total_mimics_encountered"] += other["total_mimics_encountered"]
+    data["sucker_punch_kills"] += other["sucker_punch_kills"]
+    data["boxes_histogram"] = add_histograms(data["boxes_histogram"], other["boxes_histogram"])
+    data["mimics_histogram"] = add_histograms(data["mimics_histogram"], other["mimics_histogram"])
+    data["win_boxes_histogram"] = [add_histograms(counts, more)
+                                   for counts, more in zip(data["win_boxes_histogram"], other["win_boxes_histogram"])]
+    return data
+
+# Function to add two histograms bin by bin
+def add_histograms(histogram, other):
+    return [count + more for count, more in zip(histogram, other)]
+
+# Function to simulate one shard of games with its own seed, under the given rules.
+# Strategies draw from the module-level random, so each shard reseeds it (inside a worker
+# process, or in turn here). The loop only bumps histogram bins; the totals are read off them
+# at the end
+def run_shard(strategy_func, num_games, shard_seed, rules=DEFAULT_RULES):
+    # Compiling may call the strategy, so it happens before the shard is seeded
+    strategy_func = rules_strategy(strategy_func, rules)
+    strategy = compile_strategy(strategy_func, rules.num_boxes) or strategy_func
+    random.seed(shard_seed)
+    data = initialize_results(rules)
+    win_boxes_histogram = data["win_boxes_histogram"]
+    mimics_histogram = data["mimics_histogram"]
+    sucker_punch_total = 0
+    for _ in range(num_games):
+        win, boxes_opened, mimics_encountered, sucker_punch_kills = simulate_game(strategy, rules)
+        win_boxes_histogram[win][boxes_opened] += 1
+        mimics_histogram[mimics_encountered] += 1
+        sucker_punch_total += sucker_punch_kills
+
+    data["wins"] = sum(win_boxes_histogram[True])
+    data["boxes_histogram"] = add_histograms(*win_boxes_histogram)
+    data["total_boxes_opened"] = sum(boxes * count for boxes, count in enumerate(data["boxes_histogram"]))
+    data["total_mimics_encountered"] = sum(mimics * count for mimics, count in enumerate(mimics_histogram))
+    data["sucker_punch_kills"] = sucker_punch_total
+    return data
+
+# Function to split the games of each strategy into fixed-size shards. The shards, and the
+# seed of each one, depend only on the master seed, never on the number of workers (nor on
+# which other strategies are run alongside)
+def plan_shards(num_simulations, seed, shard_size=SHARD_SIZE, strategy_names=None):
+    shards = []
+    for strategy_name in strategy_names or strategies:
+        strategy_func = strategies[strategy_name]
+        for index, start in enumerate(range(0, num_simulations, shard_size)):
+            num_games = min(shard_size, num_simulations - start)
+            shards.append((strategy_name, strategy_func, num_games, f"{seed}:{strategy_name}:{index}"))
+    return shards
+
+# Function to run simulations for each strategy (or only the named ones) under the given rules.
+# With the same seed the results are identical whatever the number of worker processes
+# (workers=1 runs in this process)
+def run_simulations(num_simulations=NUM_SIMULATIONS, seed=None, workers=1, shard_size=SHARD_SIZE, strategy_names=None,
+                    rules=DEFAULT_RULES):
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    shards = plan_shards(num_simulations, seed, shard_size, strategy_names)
+    results = {strategy_name: initialize_results(rules) for strategy_name in strategy_names or strategies}
+
+    arguments = list(zip(*(shard[1:] for shard in shards))) + [[check_rules(rules)] * len(shards)]
+    if workers == 1:
+        partials = list(map(run_shard, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(run_shard, *arguments))
 
+    # Partials come back in shard order, so the merge order is fixed too
+    for (strategy_name, *_), data in zip(shards, partials):
+        merge_results(results[strategy_name], data)
     return results
 
+# Function to find the smallest value with at least a fraction of the games at or below it
+def histogram_percentile(histogram, fraction):
+    target = fraction * sum(histogram)
+    running = 0
+    for value, count in enumerate(histogram):
+        running += count
+        if count and running >= target:
+            return value
+    return len(histogram) - 1
+
+# Function to compute the variance of the values counted in a histogram
+def histogram_variance(histogram):
+    games = sum(histogram)
+    mean = sum(value * count for value, count in enumerate(histogram)) / games
+    return sum(count * (value - mean) ** 2 for value, count in enumerate(histogram)) / games
+
+# Function to compute the souls a chest hunt yields on average under the payout model above
+# (SOULS_PER_BOX, WIN_SOULS_MULTIPLIER), from the joint won/boxes histogram: every box opened
+# pays souls_per_box, and a won hunt pays win_multiplier times. The figure is only as good as
+# that model, so nothing is ranked by it unless asked
+def expected_souls(data, games, souls_per_box=SOULS_PER_BOX, win_multiplier=WIN_SOULS_MULTIPLIER):
+    lost, won = data["win_boxes_histogram"]
+    souls = sum(boxes * count for boxes, count in enumerate(lost))
+    souls += win_multiplier * sum(boxes * count for boxes, count in enumerate(won))
+    return souls_per_box * souls / games
+
+# Function to summarize the results of a simulation run as plain numbers, one dict per
+# strategy; num_simulations is the games of every strategy, or a dict of games per strategy.
+# A strategy without games has None for every figure
+def summarize_results(results, num_simulations):
+    summary = {}
+    for strategy, data in results.items():
+        if isinstance(num_simulations, dict):
+            games = num_simulations.get(strategy, 0)
+        else:
+            games = num_simulations
+        if not games:
+            summary[strategy] = dict.fromkeys(("win_rate", "avg_boxes_opened", "boxes_std_dev", "boxes_percentiles",
+                                               "avg_mimics_encountered", "mimics_std_dev", "avg_sucker_punch_kills",
+                                               "expected_souls"))
+            summary[strategy].update(games=0, mimics_histogram=data["mimics_histogram"])
+            continue
+        summary[strategy] = {
+            "games": games,
+            "win_rate": data["wins"] / games,
+            "avg_boxes_opened": data["total_boxes_opened"] / games,
+            "boxes_std_dev": histogram_variance(data["boxes_histogram"]) ** 0.5,
+            "boxes_percentiles": {f"p{fraction * 100:g}": histogram_percentile(data["boxes_histogram"], fraction)
+                                  for fraction in PERCENTILES},
+            "avg_mimics_encountered": data["total_mimics_encountered"] / games,
+            "mimics_std_dev": histogram_variance(data["mimics_histogram"]) ** 0.5,
+            "mimics_histogram": data["mimics_histogram"],
+            "avg_sucker_punch_kills": data["sucker_punch_kills"] / games,
+            "expected_souls": expected_souls(data, games),
+        }
+    return summary
+
+# Function to display the results of a simulation run; num_simulations is the games of every
+# strategy, or a dict of games per strategy
+def display_results(results, num_simulations):
+    print("Simulation results:")
+    for strategy, summary in summarize_results(results, num_simulations).items():
+        if not summary["games"]:
+            print(f"{strategy}: no games run")
+            continue
+        print(f"{strategy}: {summary['win_rate']:.2%} win rate")
+        print(f"  Average: {summary['avg_boxes_opened']:.2f} boxes opened (std dev {summary['boxes_std_dev']:.2f})")
+        print("  Boxes opened percentiles: " + ", ".join(
+            f"{name} {boxes}" for name, boxes in summary["boxes_percentiles"].items()))
+        print(f"  Mimics Encountered - Average: {summary['avg_mimics_encountered']:.2f} "
+              f"(std dev {summary['mimics_std_dev']:.2f}), games per count: {summary['mimics_histogram']}")
+        print(f"  Average Sucker Punch Kills: {summary['avg_sucker_punch_kills']:.2f}")
+        print(f"  Expected souls: {summary['expected_souls']:.2f} per chest hunt "
+              f"(model: boxes pay {SOULS_PER_BOX}, a won hunt x{WIN_SOULS_MULTIPLIER}, assumed)")
+
+# Function to parse the command line of the chest hunt runner
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Simulate chest hunts with every strategy")
+    parser.add_argument("--simulations", type=int, default=NUM_SIMULATIONS, help="games per strategy")
+    parser.add_argument("--seed", help="master seed, for results that don't depend on --workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--strategies", nargs="+", choices=list(strategies), help="strategies to run (all by default)")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    add_rules_arguments(parser)
+    return parser.parse_args(args)
+
+# Function to add one option per rule to a parser, each defaulting to DEFAULT_RULES
+def add_rules_arguments(parser):
+    parser.add_argument("--boxes", type=int, default=DEFAULT_RULES.num_boxes, dest="num_boxes", help="board size")
+    parser.add_argument("--mimics", type=int, default=DEFAULT_RULES.num_mimics, dest="num_mimics",
+                        help="mimics per board")
+    parser.add_argument("--savers", type=int, default=DEFAULT_RULES.num_savers, dest="num_savers",
+                        help="savers per board")
+    parser.add_argument("--multiplier", type=int, default=DEFAULT_RULES.multiplier,
+                        help="what the multiplier multiplies the next saver by")
+    parser.add_argument("--safe-picks", type=int, default=DEFAULT_RULES.safe_picks, dest="safe_picks",
+                        help="safe opening picks")
+    parser.add_argument("--sucker-punch", type=float, default=DEFAULT_RULES.sucker_punch_chance,
+                        dest="sucker_punch_chance", help="chance a sucker punch kills a mimic")
+
+# Function to read the rules given on a command line parsed with add_rules_arguments
+def parsed_rules(args):
+    return check_rules(ChestHuntRules(*(getattr(args, field) for field in ChestHuntRules._fields)))
+
 # Run simulations and display results
 if __name__ == "__main__":
-    results = run_simulations()
-    print("Simulation results:")
-    for strategy, data in results.items():
-        avg_boxes_opened = data["total_boxes_opened"] / NUM_SIMULATIONS
-        avg_mimics_encountered = data["total_mimics_encountered"] / NUM_SIMULATIONS
-        avg_sucker_punch_kills = data['sucker_punch_kills'] / NUM_SIMULATIONS
-        win_rate = data["wins"] / NUM_SIMULATIONS
-        print(f"{strategy}: {win_rate:.2%} win rate")
-        print(f"  Worst: {data['min_boxes']} boxes opened")  # Worst scenario should be min_boxes
-        print(f"  Best: {data['max_boxes']} boxes opened")   # Best scenario should be max_boxes
-        print(f"  Average: {avg_boxes_opened:.2f} boxes opened")
-        print(f"  Mimics Encountered - Worst: {data['min_mimics']}, Best: {data['max_mimics']}, Average: {avg_mimics_encountered:.2f}")
-        print(f"  Average Sucker Punch Kills: {avg_sucker_punch_kills:.2f}")
+    args = parse_arguments()
+    results = run_simulations(args.simulations, args.seed, args.workers, strategy_names=args.strategies,
+                              rules=parsed_rules(args))
+    if args.format == "json":
+        print(json.dumps(summarize_results(results, args.simulations), indent=4))
+    else:
+        display_results(results, args.simulations)
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from chest_hunt_batch import BATCH_SIZE, pick_order_table, run_batch_simulations
+from chest_hunt_simlator import ChestHuntRules, check_rules, rules_strategy, strategies, summarize_results
+
+SWEEP_SIMULATIONS = 100000  # Games per strategy and rule set
+RANK_BY = "win_rate"  # Summary field strategies are ranked by, ties going to more boxes opened
+RANK_FIELDS = ("win_rate", "avg_boxes_opened", "expected_souls")
+
+# Values of each rule to sweep; every combination is a rule set
+SWEEP_GRID = {
+    "num_boxes": (30,),
+    "num_mimics": (4,),
+    "num_savers": (1, 2),
+    "multiplier": (2,),
+    "safe_picks": (2, 3, 4),
+    "sucker_punch_chance": (0.02, 0.05, 0.1),
+}
+
+# Columns of the sweep table: the rules, the strategy and its summary, and the strategy's rank
+# among all strategies under the same rules
+SUMMARY_FIELDS = ("games", "win_rate", "avg_boxes_opened", "boxes_std_dev", "avg_mimics_encountered",
+                  "avg_sucker_punch_kills", "expected_souls")
+SWEEP_FIELDS = ChestHuntRules._fields + ("strategy",) + SUMMARY_FIELDS + ("rank",)
+
+
+# Function to list every rule set of a grid (rule name -> values), the Cartesian product of
+# the values in the grid's order. Rules missing from the grid keep their default
+def rules_grid(grid=None):
+    grid = SWEEP_GRID if grid is None else grid
+    names = list(grid)
+    return [check_rules(ChestHuntRules(**dict(zip(names, values)))) for values in itertools.product(*grid.values())]
+
+
+# Function to list the runs of a sweep: every rule set and strategy, with the seed of its
+# batch engine stream. The seed names the rules and the strategy, so adding a rule set to the
+# grid doesn't change the others' games
+def plan_sweep(rules_list, num_simulations, seed, strategy_names=None):
+    runs = []
+    for rules in rules_list:
+        rules_key = ",".join(map(str, rules))
+        for strategy_name in strategy_names or strategies:
+            run_seed = random.Random(f"{seed}:{rules_key}:{strategy_name}").getrandbits(128)
+            runs.append((rules, strategy_name, run_seed))
+    return runs
+
+
+# Function to build the pick order table of every strategy once per board size and safe
+# picks, the only rules a strategy looks at. Done before the worker processes start, they
+# inherit the tables instead of each building their own
+def precompile(rules_list, strategy_names=None):
+    for rules in rules_list:
+        for strategy_name in strategy_names or strategies:
+            pick_order_table(rules_strategy(strategies[strategy_name], rules), rules.num_boxes)
+
+
+# Function to play one run of a sweep on the batch engine, returns the strategy's results
+def run_sweep_run(rules, strategy_name, run_seed, num_simulations, batch_size=BATCH_SIZE):
+    return run_batch_simulations(num_simulations, run_seed, batch_size, [strategy_name], rules)[strategy_name]
+
+
+# Function to run every strategy under every rule set of a grid, on the batch engine. Returns
+# the results dict of each (rules, strategy name). With the same seed the results are
+# identical whatever the number of worker processes (workers=1 runs in this process)
+def run_sweep(grid=None, num_simulations=SWEEP_SIMULATIONS, seed=None, workers=1, batch_size=BATCH_SIZE,
+              strategy_names=None):
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    rules_list = rules_grid(grid)
+    runs = plan_sweep(rules_list, num_simulations, seed, strategy_names)
+    precompile(rules_list, strategy_names)
+
+    arguments = list(zip(*runs)) + [[num_simulations] * len(runs), [batch_size] * len(runs)]
+    if workers == 1:
+        partials = list(map(run_sweep_run, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(run_sweep_run, *arguments))
+    return {(rules, strategy_name): data for (rules, strategy_name, _), data in zip(runs, partials)}
+
+
+# Function to turn sweep results into a tidy table: one row per rule set and strategy, stored
+# as columns (SWEEP_FIELDS -> list of values). Strategies are ranked by the rank_by field
+# (expected souls rests on an assumed payout model, see expected_souls); strategies without
+# games come last
+def sweep_table(results, num_simulations, rank_by=RANK_BY):
+    def rank_key(strategy_summary):
+        return tuple(-math.inf if strategy_summary[field] is None else strategy_summary[field]
+                     for field in (rank_by, "avg_boxes_opened"))
+
+    table = {field: [] for field in SWEEP_FIELDS}
+    by_rules = {}
+    for (rules, strategy_name), data in results.items():
+        by_rules.setdefault(rules, {})[strategy_name] = data
+    for rules, rules_results in by_rules.items():
+        summary = summarize_results(rules_results, num_simulations)
+        ranked = sorted(summary, key=lambda strategy_name: rank_key(summary[strategy_name]), reverse=True)
+        for strategy_name, strategy_summary in summary.items():
+            for field, value in zip(ChestHuntRules._fields, rules):
+                table[field].append(value)
+            table["strategy"].append(strategy_name)
+            for field in SUMMARY_FIELDS:
+                table[field].append(strategy_summary[field])
+            table["rank"].append(ranked.index(strategy_name) + 1)
+    return table
+
+
+# Function to write the sweep table as CSV, one row per rule set and strategy
+def save_sweep_csv(table, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SWEEP_FIELDS)
+        writer.writerows(zip(*(table[field] for field in SWEEP_FIELDS)))
+
+
+# Function to write the sweep table as columnar JSON: every column as one list
+def save_sweep_json(table, filename):
+    with open(filename, "w") as f:
+        f.write(json.dumps({"num_rows": len(table["strategy"]), "columns": table}))
+
+
+# Function to display the strategy ranking of every rule set in the sweep table
+def display_sweep(table):
+    rows = [dict(zip(SWEEP_FIELDS, values)) for values in zip(*(table[field] for field in SWEEP_FIELDS))]
+    for row in sorted(rows, key=lambda row: (tuple(row[field] for field in ChestHuntRules._fields), row["rank"])):
+        if row["rank"] == 1:
+            print("\n" + ", ".join(f"{field} {row[field]}" for field in ChestHuntRules._fields))
+        if not row["games"]:
+            print(f"  {row['rank']}. {row['strategy']}: no games run")
+            continue
+        print(f"  {row['rank']}. {row['strategy']}: {row['win_rate']:.2%} win rate, "
+              f"{row['avg_boxes_opened']:.2f} boxes opened, {row['expected_souls']:.2f} modeled souls")
+
+
+# Function to parse the command line of the sweep driver; every rule defaults to SWEEP_GRID
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Run every chest hunt strategy under a grid of rules")
+    parser.add_argument("--boxes", type=int, nargs="+", dest="num_boxes", help="board sizes")
+    parser.add_argument("--mimics", type=int, nargs="+", dest="num_mimics", help="mimics per board")
+    parser.add_argument("--savers", type=int, nargs="+", dest="num_savers", help="savers per board")
+    parser.add_argument("--multiplier", type=int, nargs="+", help="what the multiplier multiplies the next saver by")
+    parser.add_argument("--safe-picks", type=int, nargs="+", dest="safe_picks", help="safe opening picks")
+    parser.add_argument("--sucker-punch", type=float, nargs="+", dest="sucker_punch_chance",
+                        help="chances a sucker punch kills a mimic")
+    parser.add_argument("--simulations", type=int, default=SWEEP_SIMULATIONS, help="games per strategy and rule set")
+    parser.add_argument("--seed", help="master seed, for results that don't depend on --workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--strategies", nargs="+", choices=list(strategies), help="strategies to run (all by default)")
+    parser.add_argument("--rank-by", choices=RANK_FIELDS, default=RANK_BY,
+                        help="field to rank strategies by (expected_souls assumes a payout model)")
+    parser.add_argument("--csv", help="write the table to this CSV file")
+    parser.add_argument("--json", help="write the table to this columnar JSON file")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    grid = {field: getattr(args, field) or values for field, values in SWEEP_GRID.items()}
+    results = run_sweep(grid, args.simulations, args.seed, args.workers, strategy_names=args.strategies)
+    table = sweep_table(results, args.simulations, args.rank_by)
+    if args.csv:
+        save_sweep_csv(table, args.csv)
+    if args.json:
+        save_sweep_json(table, args.json)
+    if not args.csv and not args.json:
+        display_sweep(table)
@@ -0,0 +1,32 @@
+import math
+from statistics import NormalDist
+
+CONFIDENCE = 0.95
+
+
+# Function to get the two-sided normal quantile of a confidence level (1.96 for 95%)
+def z_score(confidence=CONFIDENCE):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+# Function to compute the Wilson score interval of a proportion
+def wilson_interval(successes, trials, confidence=CONFIDENCE):
+    if trials == 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+# Function to compute the normal interval of a mean from a running total and sum of squares
+def mean_interval(total, total_sq, count, confidence=CONFIDENCE):
+    if count < 2:
+        return -math.inf, math.inf
+    mean = total / count
+    variance = max(0.0, (total_sq - count * mean * mean) / (count - 1))
+    half_width = z_score(confidence) * math.sqrt(variance / count)
+    return mean - half_width, mean + half_width
+
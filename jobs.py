@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+from armory_manager import LOADOUTS_FILE, LoadoutManager, load_bonuses_data, load_items_data
+from chest_hunt_simlator import DEFAULT_RULES, NUM_SIMULATIONS, run_simulations, summarize_results
+
+RESULTS_FILE = "job_results.jsonl"
+
+
+# Function to run a chest hunt job: {"tool": "chest_hunt", "simulations", "seed", "workers", "strategies",
+# "rules"}, rules being the rules that differ from the defaults, e.g. {"safe_picks": 3}
+def run_chest_hunt_job(job):
+    num_simulations = job.get("simulations", NUM_SIMULATIONS)
+    rules = DEFAULT_RULES._replace(**job.get("rules", {}))
+    results = run_simulations(num_simulations, job.get("seed"), job.get("workers", 1),
+                              strategy_names=job.get("strategies"), rules=rules)
+    return summarize_results(results, num_simulations)
+
+
+# Function to run a soul simulator job: {"tool": "soul", "modes", "runs", "seed", "workers"}
+def run_soul_job(job):
+    results = main.run_soul_simulations(job.get("modes"), job.get("runs", 50), job.get("workers", 1), job.get("seed"))
+    return {mode: main.summarize_stats(*stats) for mode, stats in results.items()}
+
+
+# Function to run a loadout job: {"tool": "loadouts", "loadouts_file", "names"}, the bonus
+# totals of the named loadouts (all of them by default)
+def run_loadouts_job(job):
+    manager = LoadoutManager(load_items_data(), load_bonuses_data(), job.get("loadouts_file", LOADOUTS_FILE))
+    manager.load_loadouts()
+    return {name: manager.calculate_total_bonuses(manager.loadouts[name]) for name in job.get("names") or manager.loadouts}
+
+
+JOB_RUNNERS = {
+    "chest_hunt": run_chest_hunt_job,
+    "soul": run_soul_job,
+    "loadouts": run_loadouts_job,
+}
+
+
+# Function to run one job, with its worker count replaced by workers when given. A failing
+# job gives an error instead of stopping the whole file
+def run_job(job, workers=None):
+    try:
+        if job.get("tool") not in JOB_RUNNERS:
+            raise ValueError(f"unknown tool {job.get('tool')!r}, expected one of {', '.join(JOB_RUNNERS)}")
+        settings = job if workers is None else dict(job, workers=workers)
+        return {"job": job, "result": JOB_RUNNERS[job["tool"]](settings)}
+    except Exception as error:
+        return {"job": job, "error": f"{type(error).__name__}: {error}"}
+
+
+# Function to read a job file: one JSON job per line, blank lines and # comments skipped
+def read_jobs(filename):
+    jobs = []
+    with open(filename, "r") as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                jobs.append(json.loads(line))
+    return jobs
+
+
+# Function to run jobs, several at once in worker processes when workers > 1, writing one
+# JSON line per job to the output as it finishes, in job order. Jobs run in worker processes
+# don't start processes of their own, so their "workers" setting only applies with workers=1
+def run_jobs(jobs, output=RESULTS_FILE, workers=1):
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    failures = 0
+    try:
+        with open(output, "w") as f:
+            for outcome in executor.map(run_job, jobs, [1] * len(jobs)) if executor else map(run_job, jobs):
+                failures += "error" in outcome
+                f.write(json.dumps(outcome) + "\n")
+                f.flush()
+    finally:
+        if executor:
+            executor.shutdown()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a file of chest hunt, soul simulator and loadout jobs")
+    parser.add_argument("jobs", help="job file, one JSON job per line")
+    parser.add_argument("--output", default=RESULTS_FILE, help="results file, one JSON line per job")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="jobs run at once")
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.jobs)
+    failures = run_jobs(jobs, args.output, args.workers)
+    print(f"{len(jobs) - failures} of {len(jobs)} jobs done, results in {args.output}")
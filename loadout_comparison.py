@@ -0,0 +1,111 @@
+import argparse
+import csv
+import json
+
+import numpy as np
+
+from armory_manager import LoadoutManager, load_bonuses_data, load_items_data
+
+CSV_FIELDS = ("loadout", "other_loadout", "bonus", "value", "other_value", "difference", "percentage_difference")
+
+
+# Compares every saved loadout with every other one, on every bonus key. The totals of each
+# loadout are kept, keyed by its contents, so comparing again after an edit of loadouts.json
+# only works out the loadouts that changed
+class LoadoutComparer:
+    def __init__(self, manager):
+        self.manager = manager
+        self.cache = {}
+
+    def totals(self, loadouts):
+        keys = [json.dumps(loadout, sort_keys=True) for loadout in loadouts]
+        missing = {key: loadout for key, loadout in zip(keys, loadouts) if key not in self.cache}
+        if missing:
+            for key, vector in zip(missing, self.manager.model.loadout_matrix(list(missing.values()))):
+                self.cache[key] = vector
+        return np.array([self.cache[key] for key in keys]).reshape(len(keys), len(self.manager.model.bonus_keys))
+
+    # Compares every pair of loadouts: difference[i, j] is loadout j minus loadout
+    # i on every bonus key, and percentage[i, j] that difference as a percentage of loadout i,
+    # like compare_loadouts (100% when loadout i doesn't have the bonus, 0% when neither has it)
+    def compare(self, loadouts):
+        names = list(loadouts)
+        totals = self.totals([loadouts[name] for name in names])
+        difference = totals[None, :, :] - totals[:, None, :]
+        base = np.broadcast_to(totals[:, None, :], difference.shape)
+        percentage = np.divide(difference * 100, base, out=np.where(difference != 0, 100.0, 0.0), where=base != 0)
+        return {
+            "loadouts": names,
+            "bonus_keys": list(self.manager.model.bonus_keys),
+            "totals": totals,
+            "difference": difference,
+            "percentage": percentage,
+        }
+
+
+# Function to list the comparison as tuples of CSV_FIELDS, one per pair of loadouts and bonus
+# either has
+def comparison_tuples(comparison):
+    names = comparison["loadouts"]
+    totals = comparison["totals"]
+    shown = (totals[:, None, :] != 0) | (totals[None, :, :] != 0)
+    shown[np.arange(len(names)), np.arange(len(names))] = False
+    i, j, k = np.nonzero(shown)
+    return list(zip(
+        [names[index] for index in i.tolist()],
+        [names[index] for index in j.tolist()],
+        [comparison["bonus_keys"][index] for index in k.tolist()],
+        totals[i, k].tolist(),
+        totals[j, k].tolist(),
+        comparison["difference"][i, j, k].tolist(),
+        comparison["percentage"][i, j, k].tolist(),
+    ))
+
+
+# Function to list the comparison as rows, one per pair of loadouts and bonus either has
+def comparison_rows(comparison):
+    return [dict(zip(CSV_FIELDS, row)) for row in comparison_tuples(comparison)]
+
+
+# Function to write the comparison as CSV, one row per pair of loadouts and bonus
+def save_comparison_csv(comparison, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(comparison_tuples(comparison))
+
+
+# Function to write the comparison as JSON: the totals of every loadout, and for every pair the
+# percentage difference of each bonus either loadout has
+def save_comparison_json(comparison, filename):
+    names = comparison["loadouts"]
+    keys = comparison["bonus_keys"]
+    totals = comparison["totals"]
+    comparisons = {name: {} for name in names}
+    for name, other_name, bonus_key, _, _, _, percentage in comparison_tuples(comparison):
+        comparisons[name].setdefault(other_name, {})[bonus_key] = percentage
+    with open(filename, "w") as f:
+        f.write(json.dumps({
+            "totals": {name: {keys[k]: float(totals[i, k]) for k in np.flatnonzero(totals[i])}
+                       for i, name in enumerate(names)},
+            "percentage_differences": comparisons,
+        }, indent=4))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare every saved loadout with every other one")
+    parser.add_argument("--csv", help="write the comparison to this CSV file")
+    parser.add_argument("--json", help="write the comparison to this JSON file")
+    args = parser.parse_args()
+
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    manager.load_loadouts()
+    comparison = LoadoutComparer(manager).compare(manager.loadouts)
+    if args.csv:
+        save_comparison_csv(comparison, args.csv)
+    if args.json:
+        save_comparison_json(comparison, args.json)
+    if not args.csv and not args.json:
+        print(f"{len(comparison['loadouts'])} loadouts compared on {len(comparison['bonus_keys'])} bonuses")
+        for row in comparison_rows(comparison):
+            print(f"{row['loadout']} -> {row['other_loadout']}, {row['bonus']}: {row['percentage_difference']:.2f}%")
@@ -0,0 +1,271 @@
+import argparse
+import heapq
+import itertools
+import json
+
+import numpy as np
+
+import main
+from armory_manager import LoadoutManager, bonus_scale, load_bonuses_data, load_items_data
+from loadout_pipeline import ARMORY_BONUS_MAP, main_bonuses
+from soul_analytic import kill_moments
+from soul_batch import MODES
+from soul_sensitivity import reward_powers, rewards_at
+
+MAX_LEVEL = 20
+# Optional bonuses an item can have enabled at once. Assumed, not read from the game data:
+# armory.json lists the optional bonuses of each item but not how many can be on together.
+# Override it with max_optional / --max-optional if the game allows a different number
+MAX_OPTIONAL_BONUSES = 2
+RARITIES = ("normal", "excellent")
+TOP_K = 5
+
+
+# Function to list the (level, rarity) an item can be used at. owned maps item names to the
+# best level and rarity owned ({"level": 12, "rarity": "excellent"}); without it every item
+# can be used at any level and rarity. Key items are always level 1 and normal
+def item_grades(item_name, item, owned, max_level):
+    if item.get("Key Item", False):
+        return [(1, "normal")] if owned is None or item_name in owned else []
+    if owned is None:
+        return [(level, rarity) for level in range(1, max_level + 1) for rarity in RARITIES]
+    if item_name not in owned:
+        return []
+    top_level = min(owned[item_name]["level"], max_level)
+    return [(level, owned[item_name]["rarity"]) for level in range(1, top_level + 1)]
+
+
+# Weighted sum of bonus keys: weights maps armory bonus keys to their weight
+class WeightedObjective:
+    def __init__(self, weights, keys):
+        unknown = set(weights) - set(keys)
+        if unknown:
+            raise ValueError(f"unknown bonus keys {', '.join(sorted(unknown))}")
+        self.name = " + ".join(f"{weight} * {key}" for key, weight in weights.items())
+        self.weights = np.array([weights.get(key, 0) for key in keys], dtype=float)
+        self.directions = np.sign(self.weights)
+
+    def score(self, vectors):
+        return vectors @ self.weights
+
+
+# Expected souls per second of a mode. The armory totals are mapped onto the simulator's
+# bonuses like loadout_pipeline does, and the reward of every (enemy, crit) case is a product
+# of bonuses, so the power each bonus appears with is read once from main's reward table:
+# scoring thousands of loadouts is then a few matrix products. The expected kills come from
+# soul_analytic's closed form, the same for every loadout, so scores are deterministic
+class SoulsObjective:
+    def __init__(self, mode, keys, base_bonuses=None):
+        self.name = f"{MODES[mode][0]} souls per second"
+        base_bonuses = dict(main.bonuses if base_bonuses is None else base_bonuses)
+        self.bonus_names = [name for name in base_bonuses if name != "crit_rate_bonus"]
+        self.base_values = np.array([base_bonuses[name] for name in self.bonus_names])
+        self.rewards, self.crit_rate, self.powers, self.probe_values = reward_powers(mode, base_bonuses,
+                                                                                     self.bonus_names)
+
+        # Armory keys -> percent of a multiplier, addition to a multiplier, addition to the crit rate
+        self.percents = np.zeros((len(keys), len(self.bonus_names)))
+        self.additions = np.zeros((len(keys), len(self.bonus_names)))
+        self.crit_additions = np.zeros(len(keys))
+        for k, key in enumerate(keys):
+            if key not in ARMORY_BONUS_MAP:
+                continue
+            name, kind = ARMORY_BONUS_MAP[key]
+            if kind == "chance":
+                self.crit_additions[k] = 1 / 100
+            elif kind == "percent":
+                self.percents[k, self.bonus_names.index(name)] = 1 / 100
+            else:
+                self.additions[k, self.bonus_names.index(name)] = 1
+        # Only the bonuses this mode's rewards depend on matter
+        relevant = self.powers.reshape(len(self.bonus_names), -1).any(axis=1)
+        self.directions = (((self.percents != 0) | (self.additions != 0)) @ relevant
+                           | (self.crit_additions != 0)).astype(float)
+
+        with main_bonuses(base_bonuses):
+            kill_mean, _, _ = kill_moments(mode, main.simulation_duration)
+        self.kills_per_second = kill_mean / main.simulation_duration
+
+    def score(self, vectors):
+        values = (self.base_values + vectors @ self.additions) * (1 + vectors @ self.percents)
+        rewards = rewards_at(self.rewards, self.powers, self.probe_values, values)
+        crit_rate = np.clip(self.crit_rate + vectors @ self.crit_additions, 0, 1)[:, None]
+        return (rewards[:, :, 0] * (1 - crit_rate) + rewards[:, :, 1] * crit_rate) @ self.kills_per_second
+
+
+# Function to list the candidates of a slot: every item, optional bonus choice, level and
+# rarity, as (item name, level, rarity, optional bonus keys) plus their bonus vectors. Level
+# and rarity only scale an item's bonuses, so when an item's bonuses all point the way the
+# objective wants (or all against it) only its highest (or lowest) grade is kept
+def slot_candidates(manager, slot_type, directions, owned, max_level, max_optional):
+    candidates = []
+    vectors = []
+    for item_name, item in manager.items_data[slot_type].items():
+        grades = item_grades(item_name, item, owned, max_level)
+        if not grades:
+            continue
+        scales = [bonus_scale(level, rarity) for level, rarity in grades]
+        optional = list(manager.model.items[slot_type][item_name]["optional_ids"])
+        for size in range(min(max_optional, len(optional)) + 1):
+            for chosen in itertools.combinations(optional, size):
+                unit = manager.model.unit_vector(slot_type, item_name, chosen)
+                leaning = unit * directions
+                if (leaning >= 0).all():
+                    kept = [int(np.argmax(scales))]
+                elif (leaning <= 0).all():
+                    kept = [int(np.argmin(scales))]
+                else:
+                    kept = range(len(grades))
+                for g in kept:
+                    level, rarity = grades[g]
+                    candidates.append((item_name, level, rarity, list(chosen)))
+                    vectors.append(unit * scales[g])
+    return candidates, np.array(vectors).reshape(len(vectors), len(manager.model.bonus_keys))
+
+
+# Function to drop the candidates that can't be part of the top_k loadouts: those tied with
+# an earlier candidate on every bonus the objective cares about (they would only give copies
+# of the same loadouts), and those at least top_k others beat. Of tied candidates the first
+# listed (armory order, then fewer optional bonuses, then grade order) is kept, and the others
+# are returned as its ties, one list per kept candidate, so they can still be reported
+def prune_dominated(candidates, vectors, directions, top_k):
+    leaning = vectors[:, directions != 0] * directions[directions != 0]
+    at_least = (leaning[:, None, :] >= leaning[None, :, :]).all(axis=2)
+    tied = at_least & at_least.T
+    first = np.arange(len(vectors))[:, None] < np.arange(len(vectors))[None, :]
+    unique = ~(tied & first).any(axis=0)
+    beaten = (at_least & ~tied)[unique].sum(axis=0)
+    kept = np.flatnonzero(unique & (beaten < top_k))
+    ties = [[candidates[j] for j in np.flatnonzero(tied[i]) if j != i] for i in kept]
+    return [candidates[i] for i in kept], vectors[kept], ties
+
+
+# Function to find the top_k loadouts for an objective by branch and bound over the slots.
+# A partial loadout is bounded by adding, for every slot left, the best value of each bonus
+# among the slot's candidates, so whole subtrees are skipped as soon as their bound can't
+# beat the k-th loadout found. Loadouts scoring the same as the k-th are only kept if found
+# first, as the search never expands a subtree that can at best tie. Returns (score, loadout,
+# ties) triples, best first: ties maps a slot to the candidates that score the same as its
+# item on every bonus the objective cares about, so swapping one in gives the same score
+def optimize_loadouts(manager, objective, owned=None, top_k=TOP_K, max_level=MAX_LEVEL,
+                      max_optional=MAX_OPTIONAL_BONUSES):
+    keys = manager.model.bonus_keys
+    slots = []
+    for slot_type in manager.items_data:
+        candidates, vectors = slot_candidates(manager, slot_type, objective.directions, owned, max_level, max_optional)
+        if candidates:
+            candidates, vectors, ties = prune_dominated(candidates, vectors, objective.directions, top_k)
+            order = np.argsort(-objective.score(vectors), kind="stable")
+            slots.append((slot_type, [candidates[i] for i in order], vectors[order], [ties[i] for i in order]))
+
+    # Slots whose choice matters most go first, so bounds tighten early
+    def spread(slot):
+        scores = objective.score(slot[2])
+        return scores.max() - scores.min()
+    slots.sort(key=spread, reverse=True)
+
+    # optimistic[d]: the best value of every bonus over the slots from d on
+    optimistic = np.zeros((len(slots) + 1, len(keys)))
+    for d in range(len(slots) - 1, -1, -1):
+        best = np.where(objective.directions >= 0, slots[d][2].max(axis=0), slots[d][2].min(axis=0))
+        optimistic[d] = optimistic[d + 1] + np.where(objective.directions != 0, best, 0)
+
+    best_loadouts = []  # Min-heap of (score, order found, choices)
+    found = itertools.count()
+
+    def search(depth, totals, choices):
+        if depth == len(slots):
+            entry = (float(objective.score(totals[None, :])[0]), next(found), choices)
+            if len(best_loadouts) < top_k:
+                heapq.heappush(best_loadouts, entry)
+            elif entry[0] > best_loadouts[0][0]:
+                heapq.heapreplace(best_loadouts, entry)
+            return
+        children = totals + slots[depth][2]
+        bounds = objective.score(children + optimistic[depth + 1])
+        for i in np.argsort(-bounds, kind="stable"):
+            if len(best_loadouts) == top_k and bounds[i] <= best_loadouts[0][0]:
+                break
+            search(depth + 1, children[i], choices + [i])
+
+    search(0, np.zeros(len(keys)), [])
+
+    results = []
+    for score, _, choices in sorted(best_loadouts, key=lambda entry: (-entry[0], entry[1])):
+        loadout = {}
+        ties = {}
+        for (slot_type, candidates, _, slot_ties), i in zip(slots, choices):
+            item_name, level, rarity, optional = candidates[i]
+            if slot_ties[i]:
+                ties[slot_type] = slot_ties[i]
+            loadout[slot_type] = {
+                "name": item_name,
+                "level": level,
+                "rarity": rarity,
+                "type": slot_type,
+                "enabled_optional_bonuses": optional,
+                "enabled_skills": [],
+            }
+        # Slots in armory order, like loadouts made by hand
+        results.append((score, {slot_type: loadout[slot_type] for slot_type in manager.items_data
+                                if slot_type in loadout}, ties))
+    return results
+
+
+# Function to parse "key=weight,key=weight" into a weights dict
+def parse_weights(text):
+    weights = {}
+    for part in text.split(","):
+        key, weight = part.split("=")
+        weights[key.strip()] = float(weight)
+    return weights
+
+
+# Function to display the top loadouts
+def display_optimized_loadouts(objective, results):
+    print(f"\n--- Top {len(results)} loadouts for {objective.name} ---")
+    for position, (score, loadout, ties) in enumerate(results, 1):
+        print(f"\n{position}. {main.human_readable(score)}")
+        for slot_type, item_info in loadout.items():
+            optional = ", ".join(item_info["enabled_optional_bonuses"]) or "no optional bonuses"
+            print(f"  {slot_type}: {item_info['name']} +{item_info['level']} {item_info['rarity']} ({optional})")
+            if slot_type in ties:
+                tied_items = ", ".join(dict.fromkeys(candidate[0] for candidate in ties[slot_type]))
+                print(f"    {len(ties[slot_type])} other choices score the same ({tied_items})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the best loadouts of the armory for an objective")
+    objective_group = parser.add_mutually_exclusive_group(required=True)
+    objective_group.add_argument("--weights", help="weighted sum of bonus keys, as key=weight,key=weight")
+    objective_group.add_argument("--souls", choices=list(MODES), help="expected souls per second of a mode")
+    parser.add_argument("--owned", help="JSON file of owned items: name -> {\"level\": ..., \"rarity\": ...}")
+    parser.add_argument("--top", type=int, default=TOP_K, help="number of loadouts to keep")
+    parser.add_argument("--max-level", type=int, default=MAX_LEVEL, help="highest item level")
+    parser.add_argument("--max-optional", type=int, default=MAX_OPTIONAL_BONUSES,
+                        help="optional bonuses enabled per item (an assumed game rule)")
+    parser.add_argument("--output", help="write the loadouts to this file, in loadouts.json format")
+    parser.add_argument("--save", action="store_true", help="add the loadouts to loadouts.json")
+    args = parser.parse_args()
+
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    keys = manager.model.bonus_keys
+    if args.weights:
+        objective = WeightedObjective(parse_weights(args.weights), keys)
+    else:
+        objective = SoulsObjective(args.souls, keys)
+    owned = None
+    if args.owned:
+        with open(args.owned, "r") as f:
+            owned = json.load(f)
+
+    results = optimize_loadouts(manager, objective, owned, args.top, args.max_level, args.max_optional)
+    display_optimized_loadouts(objective, results)
+    optimized = {f"Optimized {position}": loadout for position, (_, loadout, _) in enumerate(results, 1)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(optimized, f, indent=4)
+    if args.save:
+        manager.load_loadouts()
+        manager.loadouts.update(optimized)
+        manager.save_loadouts()
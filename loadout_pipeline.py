@@ -0,0 +1,121 @@
+import contextlib
+import json
+
+import numpy as np
+
+import main
+from armory_manager import LoadoutManager, load_bonuses_data, load_items_data
+from confidence import CONFIDENCE, mean_interval
+from soul_batch import MODES, reward_arrays, simulate_runs
+
+PIPELINE_RUNS = 20000  # Simulated runs per loadout and mode
+
+# How the armory's bonus keys feed the simulator's bonuses. Percentage bonuses scale a
+# multiplier by (1 + value / 100), crit chance adds value / 100 to the crit rate, and the
+# rage mode "+x" multiplier adds value to it. Keys the simulator doesn't model are ignored
+ARMORY_BONUS_MAP = {
+    "souls_bonus": ("soul_bonus", "percent"),
+    "in_game_souls_bonus": ("soul_bonus", "percent"),
+    "bonus_in_game_souls": ("soul_bonus", "percent"),
+    "bonus_souls": ("soul_bonus", "percent"),
+    "electric_type_souls": ("electric_bonus", "percent"),
+    "dark_type_souls": ("dark_bonus", "percent"),
+    "giants_souls": ("giant_bonus", "percent"),
+    "souls_bonus_from_criticals": ("crit_soul_bonus", "percent"),
+    "critical_hit_chance": ("crit_rate_bonus", "chance"),
+    "bonus_critical_hit_chance": ("crit_rate_bonus", "chance"),
+    "souls_with_bow": ("souls_with_bow", "percent"),
+    "rage_mode_souls_multiplier": ("rage_mode_bonus", "additive"),
+}
+
+
+# Function to turn a loadout's armory bonus totals into simulator bonuses, on top of
+# base_bonuses (the bonuses from everything but the armory, main.bonuses by default)
+def simulator_bonuses(armory_totals, base_bonuses=None):
+    bonuses = dict(main.bonuses if base_bonuses is None else base_bonuses)
+    percents = {}
+    for bonus_key, value in armory_totals.items():
+        if bonus_key not in ARMORY_BONUS_MAP:
+            continue
+        simulator_key, kind = ARMORY_BONUS_MAP[bonus_key]
+        if kind == "percent":
+            percents[simulator_key] = percents.get(simulator_key, 0) + value
+        elif kind == "chance":
+            bonuses[simulator_key] += value / 100
+        else:
+            bonuses[simulator_key] += value
+    for simulator_key, percent in percents.items():
+        bonuses[simulator_key] *= 1 + percent / 100
+    return bonuses
+
+
+# Function to run code with main's bonuses swapped for others, so main's tables follow them
+@contextlib.contextmanager
+def main_bonuses(bonuses):
+    saved = main.bonuses
+    main.bonuses = main.VersionedDict(bonuses)
+    try:
+        yield
+    finally:
+        main.bonuses = saved
+
+
+# Ranks loadouts by simulated souls per second. Every loadout is parsed, mapped to simulator
+# bonuses and compiled into reward arrays once, and its simulated results are kept, keyed by
+# the loadout's contents: ranking again after editing one loadout only simulates that one.
+# Every loadout is simulated from the same seed, so they all face the same runs
+class LoadoutEvaluator:
+    def __init__(self, manager, base_bonuses=None, num_runs=PIPELINE_RUNS, seed=0, confidence=CONFIDENCE):
+        self.manager = manager
+        self.base_bonuses = base_bonuses
+        self.num_runs = num_runs
+        self.seed = seed
+        self.confidence = confidence
+        self.cache = {}
+
+    def evaluate(self, loadout):
+        key = json.dumps(loadout, sort_keys=True)
+        if key not in self.cache:
+            bonuses = simulator_bonuses(self.manager.calculate_total_bonuses(loadout), self.base_bonuses)
+            with main_bonuses(bonuses):
+                arrays = {mode: reward_arrays(use_bow, rage_mode) for mode, (_, use_bow, rage_mode) in MODES.items()}
+            self.cache[key] = {
+                "bonuses": bonuses,
+                "arrays": arrays,
+                "modes": {mode: self.simulate(mode, arrays[mode]) for mode in MODES},
+            }
+        return self.cache[key]
+
+    def simulate(self, mode, arrays):
+        rng = np.random.default_rng(self.seed)
+        souls_per_second = simulate_runs(rng, mode, self.num_runs, arrays=arrays)["total_souls"] / main.simulation_duration
+        return {
+            "souls_per_second": float(souls_per_second.mean()),
+            "interval": mean_interval(float(souls_per_second.sum()), float((souls_per_second ** 2).sum()),
+                                      self.num_runs, self.confidence),
+        }
+
+    def rank(self, loadouts, mode):
+        rows = []
+        for loadout_name, loadout in loadouts.items():
+            result = self.evaluate(loadout)["modes"][mode]
+            rows.append(dict(result, loadout=loadout_name))
+        return sorted(rows, key=lambda row: row["souls_per_second"], reverse=True)
+
+
+# Function to display the loadout ranking of every mode
+def display_rankings(evaluator, loadouts):
+    for mode, (mode_name, _, _) in MODES.items():
+        print(f"\n--- {mode_name}: souls per second ({evaluator.confidence:.0%} intervals) ---")
+        rows = evaluator.rank(loadouts, mode)
+        for position, row in enumerate(rows, 1):
+            low, high = row["interval"]
+            relative = row["souls_per_second"] / rows[0]["souls_per_second"]
+            print(f"{position}. {row['loadout']}: {main.human_readable(row['souls_per_second'])} "
+                  f"[{main.human_readable(low)}, {main.human_readable(high)}] ({relative:.1%} of the best)")
+
+
+if __name__ == "__main__":
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    manager.load_loadouts()
+    display_rankings(LoadoutEvaluator(manager), manager.loadouts)
@@ -1,5 +1,13 @@
+import os
 import random
 
+from tracing import TRACE_KILL, TRACE_PATTERN, TRACE_SUMMARY, tracer
+
+# Importing this module only defines its tables and functions: nothing is simulated, the
+# reward table is compiled on first use, and the process pool, argparse and json (the
+# slowest imports by far) are only imported by the code that needs them. benchmark.py checks the
+# import time against a budget, and tests/test_main_imports.py that they stay unimported
+
 # Define enemy types and their respective soul rewards
 enemies = {
     "slime": {"type": "small", "reward": 8, "element": "neutral"},
@@ -8,24 +16,70 @@ enemies = {
     "yeti": {"type": "giant", "reward": 2000, "element": "electric"}
 }
 
-# Define attack patterns as lists of enemies
-patterns = [
-    ["mage"],
-    ["mage", "mage", "slime"],
-    ["mage"] * 4,
-    ["dragon"] * 5
-]
+# Define attack patterns as tuples of enemies, and how often each one comes up (relative
+# weights). Both are frozen: a spawned pattern with extra enemies is a new tuple
+patterns = (
+    ("mage",),
+    ("mage", "mage", "slime"),
+    ("mage",) * 4,
+    ("dragon",) * 5,
+)
+pattern_weights = (1, 1, 1, 1)
 
 # Define mode-specific bonuses and settings
 idle_giant_chance = 0.16  # 16% chance of encountering a giant in idle mode
+idle_spawn_time = 0.05  # 1 enemy every 0.05 seconds in idle mode
+bow_enemy_chance = 0.95  # Each enemy of a bow pattern shows up 95% of the time
+bow_giant_chance = 0.05  # A yeti joins a bow pattern 5% of the time
+rage_giant_gap = (5, 13)  # Patterns between two rage mode yetis
+_spawn_tables = None  # Built by spawn_tables() on first use
 
 # Simulation parameters
 base_crit_rate = 0.27  # 27% base crit chance
 crit_multiplier = 2.1  # Crits multiply the reward by 2.1
 simulation_duration = 120  # Simulate for 120 seconds
+RUN_CHUNK_SIZE = 5  # Runs per seeded chunk in run_multiple_simulations
+
+# A dict that counts its changes, so tables compiled from it can tell when they're stale
+class VersionedDict(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self.version += 1
 
 # Initialize bonuses dictionary
-bonuses = {
+bonuses = VersionedDict({
     "soul_bonus": 1.3765,  # Global soul bonus
     "electric_bonus": 1.0,  # Bonus for electric enemies
     "dark_bonus": 2.51,  # Bonus for dark enemies
@@ -36,7 +90,8 @@ bonuses = {
     "souls_with_bow": 1.73, # Bonus to kills with bow
     "souls_with_boost": 4, # Bonus to kills while boosting
     "rage_mode_bonus": 221
-}
+})
+_reward_table = None  # Built by reward_table() on first use
 
 # Function to initialize statistics
 def initialize_stats():
@@ -62,65 +117,130 @@ def human_readable(num):
         num /= 1000
     return f"{num:.1f}{units[-1]}"
 
+# Draws one of n outcomes with given weights in O(1) with the alias method: the weights are
+# split into n equal columns, each holding part of one outcome and the rest of another (its
+# alias), so one uniform draw picks a column and where in it the draw fell
+class AliasSampler:
+    __slots__ = ("probabilities", "aliases")
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self.probabilities = [1.0] * n
+        self.aliases = list(range(n))
+        small = [i for i, value in enumerate(scaled) if value < 1]
+        large = [i for i, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self):
+        position = random.random() * len(self.probabilities)
+        column = int(position)
+        return column if position - column < self.probabilities[column] else self.aliases[column]
+
+# Function to get the compiled spawn tables: samplers over the patterns (by weight) and over
+# the enemy types (uniform). Rebuilt when the patterns, their weights or the enemies are
+# replaced, and kept alongside them so their ids can't be reused while cached
+def spawn_tables():
+    global _spawn_tables
+    source = (id(patterns), id(pattern_weights), id(enemies), len(enemies))
+    if _spawn_tables is None or _spawn_tables["source"] != source:
+        _spawn_tables = {
+            "source": source,
+            "patterns": patterns,
+            "pattern_weights": pattern_weights,
+            "enemies": enemies,
+            "pattern_sampler": AliasSampler(pattern_weights),
+            "enemy_names": tuple(enemies),
+            "enemy_sampler": AliasSampler([1] * len(enemies)),
+        }
+    return _spawn_tables
+
+# Function to draw a pattern
+def spawn_pattern(tables):
+    return tables["patterns"][tables["pattern_sampler"].sample()]
+
 # Function to simulate Active Play with Bow
 def simulate_active_bow():
     stats = initialize_stats()
+    tables = spawn_tables()
     for _ in range(simulation_duration):  # 1 pattern per second
-        selected_pattern = random.choice(patterns)
-        selected_pattern = [enemy for enemy in selected_pattern if random.random() <= 0.95]  # 95% chance for other enemies
-        selected_pattern.append("yeti") if random.random() <= 0.05 else None
+        selected_pattern = tuple(enemy for enemy in spawn_pattern(tables) if random.random() <= bow_enemy_chance)
+        if random.random() <= bow_giant_chance:
+            selected_pattern += ("yeti",)
         simulate_pattern(selected_pattern, stats, use_bow=True)
+    trace_run("Active Play with Bow", stats)
     return stats
 
 # Function to simulate Active Play in Rage Mode
 def simulate_active_rage(nb_seconds=simulation_duration):
     stats = initialize_stats()
-    next_giant = random.randint(5, 13)
+    tables = spawn_tables()
+    next_giant = random.randint(*rage_giant_gap)
     nb_patterns = (2*nb_seconds)
     
     for _ in range(nb_patterns):  # Rage mode lasts for 34 patterns
-        selected_pattern = random.choice(patterns)
+        selected_pattern = spawn_pattern(tables)
         if next_giant == 0:
-            selected_pattern.append("yeti")
-            next_giant = random.randint(5, 13)
+            selected_pattern += ("yeti",)
+            next_giant = random.randint(*rage_giant_gap)
         next_giant -= 1
         simulate_pattern(selected_pattern, stats, rage_mode=True)
+    trace_run("Active Play in Rage Mode", stats)
     return stats
 
 # Function to simulate Idle Play
 def simulate_idle_play():
     stats = initialize_stats()
-    num_patterns = int(simulation_duration / 0.05)  # 1 enemy every 0.05 seconds
+    tables = spawn_tables()
+    num_patterns = int(simulation_duration / idle_spawn_time)
     for _ in range(num_patterns):
         if random.random() <= idle_giant_chance:  # 16% chance for a giant
-            selected_pattern = ["yeti"]
+            selected_pattern = ("yeti",)
         else:
-            selected_pattern = [random.choice(list(enemies.keys()))]
+            selected_pattern = (tables["enemy_names"][tables["enemy_sampler"].sample()],)
         simulate_pattern(selected_pattern, stats)
+    trace_run("Idle Play", stats)
     return stats
 
+# Function to trace the outcome of one simulated run
+def trace_run(mode, stats):
+    if tracer.level >= TRACE_SUMMARY:
+        tracer.emit(f"{mode} run: {human_readable(stats['total_souls'])} souls, "
+                    f"{sum(stats['kills_per_monster'].values())} kills, {stats['total_patterns']} patterns")
+
 # Function to simulate a pattern and update stats
 def simulate_pattern(pattern, stats, use_bow=False, rage_mode=False):
+    souls_before = stats["total_souls"]
     for enemy_name in pattern:
         reward = calculate_reward(enemy_name, stats, use_bow=use_bow, rage_mode=rage_mode)
         stats["total_souls"] += reward
         stats["souls_per_monster"][enemy_name] += reward
         stats["kills_per_monster"][enemy_name] += 1
     stats["total_patterns"] += 1
+    if tracer.level >= TRACE_PATTERN:
+        tracer.emit(f"Pattern {stats['total_patterns']}: {', '.join(pattern) or 'empty'} "
+                    f"-> {human_readable(stats['total_souls'] - souls_before)} souls")
 
-# Function to calculate rewards, applying bonuses
-def calculate_reward(enemy_name, stats, use_bow=False, rage_mode=False):
+# Function to work out the reward of a kill for one (enemy, bow, rage mode, crit) case:
+# the final soul reward, what each bonus contributed, and the trace of the multiplier chain
+def compute_reward_entry(enemy_name, use_bow, rage_mode, is_crit):
     enemy = enemies[enemy_name]
     base_reward = enemy["reward"]
     soul_reward = base_reward
-    print(f" -> Encountered '{enemy_name}' ({soul_reward})")
+    trace = [f" -> Encountered '{enemy_name}' ({soul_reward})"]
 
     if rage_mode:
         total_bonus_multiplier = bonuses["rage_mode_bonus"]
     else: 
         total_bonus_multiplier = bonuses["souls_with_boost"]
     
-    print(f"    -> Rage Mode? {rage_mode} - Start multiplier: {total_bonus_multiplier}")
+    trace.append(f"    -> Rage Mode? {rage_mode} - Start multiplier: {total_bonus_multiplier}")
 
     # Apply global and specific bonuses
     total_bonus_multiplier *= bonuses["soul_bonus"]
@@ -128,61 +248,104 @@ def calculate_reward(enemy_name, stats, use_bow=False, rage_mode=False):
     # Apply mode-specific bonuses
     if use_bow and enemy["type"] != "giant":
         total_bonus_multiplier *= bonuses["souls_with_bow"]
-        print(f"    -> kill with bow! New multiplier: {total_bonus_multiplier}")
+        trace.append(f"    -> kill with bow! New multiplier: {total_bonus_multiplier}")
     elif enemy["type"] == "giant":
         total_bonus_multiplier *= bonuses["giant_bonus"]
-        print(f"    -> kill via sword! New multiplier: {total_bonus_multiplier}")
+        trace.append(f"    -> kill via sword! New multiplier: {total_bonus_multiplier}")
 
     if enemy["element"] == "electric":
         total_bonus_multiplier *= bonuses["electric_bonus"]
-        print(f"    -> Electric Enemy! New multiplier: {total_bonus_multiplier}")
+        trace.append(f"    -> Electric Enemy! New multiplier: {total_bonus_multiplier}")
     if enemy["element"] == "dark":
         total_bonus_multiplier *= bonuses["dark_bonus"]
-        print(f"    -> Dark Enemy! New multiplier: {total_bonus_multiplier}")
+        trace.append(f"    -> Dark Enemy! New multiplier: {total_bonus_multiplier}")
 
     # Apply level-based bonus
     total_bonus_multiplier *= bonuses["level_soul_bonus"]
-    print(f" -> Zone bonus of {bonuses["level_soul_bonus"]}! New multiplier: {total_bonus_multiplier}")
+    trace.append(f" -> Zone bonus of {bonuses['level_soul_bonus']}! New multiplier: {total_bonus_multiplier}")
 
-    # Calculate and apply critical hit bonuses
-    crit_rate = base_crit_rate + bonuses["crit_rate_bonus"]
-    is_crit = random.random() < crit_rate
+    # Apply critical hit bonuses
     if is_crit:
         total_bonus_multiplier *= bonuses["crit_soul_bonus"]
-        print(f" -> Critical Hit! New multiplier: {total_bonus_multiplier}")
-        stats["total_criticals"] += 1
-        if soul_reward > stats["highest_critical"]:
-            stats["highest_critical"] = soul_reward
-            stats["highest_crit_monster"] = enemy_name
-
+        trace.append(f" -> Critical Hit! New multiplier: {total_bonus_multiplier}")
 
     # Calculate the final soul reward
     soul_reward = base_reward * total_bonus_multiplier
-    print(f"{enemy_name} kill! Reward: {human_readable(soul_reward)} = {base_reward} * {total_bonus_multiplier}")
+    trace.append(f"{enemy_name} kill! Reward: {human_readable(soul_reward)} = {base_reward} * {total_bonus_multiplier}")
 
     # Calculate the contribution of each bonus
+    contributions = []
     if use_bow and enemy["type"] != "giant":
-        stats["bonus_contributions"]["souls_with_bow"] += base_reward * (bonuses["souls_with_bow"] - 1) / (total_bonus_multiplier - 1)
+        contributions.append(("souls_with_bow", base_reward * (bonuses["souls_with_bow"] - 1) / (total_bonus_multiplier - 1)))
 
     if rage_mode:
-        stats["bonus_contributions"]["rage_mode_bonus"] += base_reward * bonuses["rage_mode_bonus"] / (total_bonus_multiplier - 1)
+        contributions.append(("rage_mode_bonus", base_reward * bonuses["rage_mode_bonus"] / (total_bonus_multiplier - 1)))
 
-    stats["bonus_contributions"]["soul_bonus"] += base_reward * (bonuses["soul_bonus"] - 1) / (total_bonus_multiplier - 1)
+    contributions.append(("soul_bonus", base_reward * (bonuses["soul_bonus"] - 1) / (total_bonus_multiplier - 1)))
 
     if enemy["type"] == "giant":
-        stats["bonus_contributions"]["giant_bonus"] += base_reward * (bonuses["giant_bonus"] - 1) / (total_bonus_multiplier - 1)
+        contributions.append(("giant_bonus", base_reward * (bonuses["giant_bonus"] - 1) / (total_bonus_multiplier - 1)))
     if enemy["element"] == "electric":
-        stats["bonus_contributions"]["electric_bonus"] += base_reward * (bonuses["electric_bonus"] - 1) / (total_bonus_multiplier - 1)
+        contributions.append(("electric_bonus", base_reward * (bonuses["electric_bonus"] - 1) / (total_bonus_multiplier - 1)))
     if enemy["element"] == "dark":
-        stats["bonus_contributions"]["dark_bonus"] += base_reward * (bonuses["dark_bonus"] - 1) / (total_bonus_multiplier - 1)
+        contributions.append(("dark_bonus", base_reward * (bonuses["dark_bonus"] - 1) / (total_bonus_multiplier - 1)))
 
-    stats["bonus_contributions"]["level_soul_bonus"] += base_reward * (bonuses["level_soul_bonus"] - 1) / (total_bonus_multiplier - 1)
+    contributions.append(("level_soul_bonus", base_reward * (bonuses["level_soul_bonus"] - 1) / (total_bonus_multiplier - 1)))
 
     if is_crit:
         crit_reward = base_reward * (bonuses["crit_soul_bonus"] - 1)
         crit_bonus = bonuses["crit_rate_bonus"]
-        stats["bonus_contributions"]["crit_soul_bonus"] += crit_reward
-        stats["bonus_contributions"]["crit_rate_bonus"] += crit_reward * (crit_bonus / (base_crit_rate + crit_bonus))
+        contributions.append(("crit_soul_bonus", crit_reward))
+        contributions.append(("crit_rate_bonus", crit_reward * (crit_bonus / (base_crit_rate + crit_bonus))))
+
+    return soul_reward, tuple(contributions), "\n".join(trace)
+
+# Function to get the compiled reward table: every (enemy, bow, rage mode, crit) case worked
+# out once for the current bonuses. It is rebuilt whenever the bonuses, the enemies or the
+# base crit rate change (bonuses is a VersionedDict, so editing it bumps its version).
+# The table keeps the bonuses and enemies it was built from, so their ids can't be reused
+# by new dicts while it is cached
+def reward_table():
+    global _reward_table
+    source = (id(bonuses), getattr(bonuses, "version", None), id(enemies), base_crit_rate)
+    # A plain dict has no version, so its contents are compared instead
+    if not isinstance(bonuses, VersionedDict):
+        source += tuple(bonuses.items())
+    if _reward_table is None or _reward_table["source"] != source:
+        _reward_table = {
+            "source": source,
+            "bonuses": bonuses,
+            "enemies": enemies,
+            "crit_rate": base_crit_rate + bonuses["crit_rate_bonus"],
+            "rewards": {
+                (enemy_name, use_bow, rage_mode, is_crit): compute_reward_entry(enemy_name, use_bow, rage_mode, is_crit)
+                for enemy_name in enemies
+                for use_bow in (False, True)
+                for rage_mode in (False, True)
+                for is_crit in (False, True)
+            },
+        }
+    return _reward_table
+
+# Function to calculate rewards, applying bonuses: a crit draw and a lookup in the reward table.
+# The multiplier chain is traced at the kill level
+def calculate_reward(enemy_name, stats, use_bow=False, rage_mode=False):
+    table = reward_table()
+    is_crit = random.random() < table["crit_rate"]
+    soul_reward, contributions, trace = table["rewards"][(enemy_name, use_bow, rage_mode, is_crit)]
+    if tracer.level >= TRACE_KILL:
+        tracer.emit(trace)
+
+    if is_crit:
+        stats["total_criticals"] += 1
+        base_reward = enemies[enemy_name]["reward"]
+        if base_reward > stats["highest_critical"]:
+            stats["highest_critical"] = base_reward
+            stats["highest_crit_monster"] = enemy_name
+
+    bonus_contributions = stats["bonus_contributions"]
+    for bonus, contribution in contributions:
+        bonus_contributions[bonus] += contribution
 
     return soul_reward
 
@@ -208,45 +371,88 @@ def display_stats(mode, stats):
         percentage = (contribution / total_bonus_contribution) * 100 if total_bonus_contribution > 0 else 0
         print(f"  {bonus}: {human_readable(contribution)} ({percentage:.2f}%)")
 
-# Run simulations for each mode and aggregate results
-def run_multiple_simulations(simulation_func, num_simulations=50):
-    all_stats = []
-
-    for _ in range(num_simulations):
-        stats = simulation_func()
-        all_stats.append(stats)
-
-    # Calculate average, worst, and best stats
-    avg_stats = initialize_stats()
-    best_stats = initialize_stats()
-    worst_stats = all_stats[0]
-
-    for stats in all_stats:
-        # Aggregate for average
-        for key in avg_stats:
-            #print(avg_stats[key])
-            if isinstance(avg_stats[key], dict):
-                for sub_key in avg_stats[key]:
-                
-                    avg_stats[key][sub_key] += stats[key][sub_key]
-            elif isinstance(avg_stats[key], int):
-                avg_stats[key] += stats[key]
-
-        # Determine best and worst stats
-        if stats['total_souls'] > best_stats['total_souls']:
-            best_stats = stats
-        if stats['total_souls'] < worst_stats['total_souls']:
-            worst_stats = stats
-
-    # Average the stats
-    for key in avg_stats:
-        if isinstance(avg_stats[key], dict):
-            for sub_key in avg_stats[key]:
-                avg_stats[key][sub_key] /= num_simulations
-        elif isinstance(avg_stats[key], float):
-            avg_stats[key] /= num_simulations
-
-    return avg_stats, worst_stats, best_stats
+# Running totals of many simulated runs, with the best and worst run. Two of them merge
+# into one (merging is associative), so runs can be added up in any grouping, in worker
+# processes, without keeping every run around
+class StatsAccumulator:
+    __slots__ = ("runs", "totals", "best", "worst")
+
+    def __init__(self):
+        self.runs = 0
+        self.totals = initialize_stats()
+        self.best = None
+        self.worst = None
+
+    def add_run(self, stats):
+        self.runs += 1
+        add_stats(self.totals, stats)
+        self.keep_extremes(stats, stats)
+
+    def merge(self, other):
+        if not other.runs:
+            return self
+        self.runs += other.runs
+        add_stats(self.totals, other.totals)
+        self.keep_extremes(other.best, other.worst)
+        return self
+
+    def keep_extremes(self, best, worst):
+        if self.best is None or best["total_souls"] > self.best["total_souls"]:
+            self.best = best
+        if self.worst is None or worst["total_souls"] < self.worst["total_souls"]:
+            self.worst = worst
+
+    def average(self):
+        avg_stats = initialize_stats()
+        for key, value in self.totals.items():
+            if isinstance(value, dict):
+                for sub_key in value:
+                    avg_stats[key][sub_key] = value[sub_key] / self.runs
+            elif isinstance(value, (int, float)):
+                avg_stats[key] = value / self.runs
+        return avg_stats
+
+# Function to add the numbers of a stats dict (ints and floats alike) to running totals
+def add_stats(totals, stats):
+    for key, value in totals.items():
+        if isinstance(value, dict):
+            for sub_key in value:
+                value[sub_key] += stats[key][sub_key]
+        elif isinstance(value, (int, float)):
+            totals[key] += stats[key]
+
+# Function to simulate a chunk of runs with its own seed, in a worker process or in turn here
+def run_simulation_chunk(simulation_func, num_runs, chunk_seed):
+    random.seed(chunk_seed)
+    accumulator = StatsAccumulator()
+    for _ in range(num_runs):
+        accumulator.add_run(simulation_func())
+    return accumulator
+
+# Run simulations for each mode and aggregate results. With a seed, the runs are split into
+# seeded chunks and the results are the same whatever the number of worker processes
+# (workers=1 runs in this process); chunks are merged as they come back
+def run_multiple_simulations(simulation_func, num_simulations=50, workers=1, seed=None, chunk_size=RUN_CHUNK_SIZE):
+    accumulator = StatsAccumulator()
+    if workers == 1 and seed is None:
+        for _ in range(num_simulations):
+            accumulator.add_run(simulation_func())
+        return accumulator.average(), accumulator.worst, accumulator.best
+
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    chunks = [(simulation_func, min(chunk_size, num_simulations - start), f"{seed}:{simulation_func.__name__}:{index}")
+              for index, start in enumerate(range(0, num_simulations, chunk_size))]
+    arguments = list(zip(*chunks))
+    if workers == 1:
+        for partial in map(run_simulation_chunk, *arguments):
+            accumulator.merge(partial)
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # Imported here to keep `import main` fast, see the top
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial in executor.map(run_simulation_chunk, *arguments):
+                accumulator.merge(partial)
+    return accumulator.average(), accumulator.worst, accumulator.best
 
 # Display results for multiple simulations
 def display_aggregated_stats(mode, avg_stats, worst_stats, best_stats):
@@ -258,13 +464,49 @@ def display_aggregated_stats(mode, avg_stats, worst_stats, best_stats):
     print("\nBest Stats:")
     display_stats("Best", best_stats)
 
-# Run and display the results for 50 simulations
-num_simulations = 50
+# Simulated modes: name -> (display name, simulation function)
+SIMULATIONS = {
+    "active_bow": ("Active Play with Bow", simulate_active_bow),
+    "active_rage": ("Active Play in Rage Mode", simulate_active_rage),
+    "idle_play": ("Idle Play", simulate_idle_play),
+}
 
-avg_bow_stats, worst_bow_stats, best_bow_stats = run_multiple_simulations(simulate_active_bow, num_simulations)
-avg_rage_stats, worst_rage_stats, best_rage_stats = run_multiple_simulations(simulate_active_rage, num_simulations)
-avg_idle_stats, worst_idle_stats, best_idle_stats = run_multiple_simulations(simulate_idle_play, num_simulations)
+# Function to run simulations of several modes. Returns mode name -> (average, worst, best) stats
+def run_soul_simulations(modes=None, num_simulations=50, workers=1, seed=None):
+    return {mode: run_multiple_simulations(SIMULATIONS[mode][1], num_simulations, workers, seed)
+            for mode in modes or SIMULATIONS}
 
-display_aggregated_stats("Active Play with Bow", avg_bow_stats, worst_bow_stats, best_bow_stats)
-display_aggregated_stats("Active Play in Rage Mode", avg_rage_stats, worst_rage_stats, best_rage_stats)
-display_aggregated_stats("Idle Play", avg_idle_stats, worst_idle_stats, best_idle_stats)
\ No newline at end of file
+# Function to summarize the (average, worst, best) stats of a mode as plain numbers
+def summarize_stats(avg_stats, worst_stats, best_stats):
+    return {
+        "avg_souls": avg_stats["total_souls"],
+        "souls_per_second": avg_stats["total_souls"] / simulation_duration,
+        "worst_souls": worst_stats["total_souls"],
+        "best_souls": best_stats["total_souls"],
+        "avg_criticals": avg_stats["total_criticals"],
+        "souls_per_monster": avg_stats["souls_per_monster"],
+        "kills_per_monster": avg_stats["kills_per_monster"],
+        "bonus_contributions": avg_stats["bonus_contributions"],
+    }
+
+# Function to parse the command line of the soul simulator
+def parse_arguments(args=None):
+    import argparse  # Imported here to keep `import main` fast, see the top
+    parser = argparse.ArgumentParser(description="Simulate the souls earned in each play mode")
+    parser.add_argument("--modes", nargs="+", choices=list(SIMULATIONS), help="modes to simulate (all by default)")
+    parser.add_argument("--runs", type=int, default=50, help="simulated runs per mode")
+    parser.add_argument("--seed", help="master seed, for results that don't depend on --workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    return parser.parse_args(args)
+
+# Run and display the results for 50 simulations
+if __name__ == "__main__":
+    import json  # Imported here to keep `import main` fast, see the top
+    args = parse_arguments()
+    results = run_soul_simulations(args.modes, args.runs, args.workers, args.seed)
+    if args.format == "json":
+        print(json.dumps({mode: summarize_stats(*stats) for mode, stats in results.items()}, indent=4))
+    else:
+        for mode, stats in results.items():
+            display_aggregated_stats(SIMULATIONS[mode][0], *stats)
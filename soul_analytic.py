@@ -0,0 +1,180 @@
+import argparse
+import json
+import math
+
+import numpy as np
+
+import main
+from soul_batch import MODES, pattern_slots, reward_arrays
+
+CHECK_RUNS = 1000  # Monte Carlo runs per mode when cross-checking
+CHECK_TOLERANCE = 4  # Standard errors the Monte Carlo mean may stray from the analytic one
+
+
+# Function to get the distribution of how many rage mode yetis show up in num_patterns
+# patterns: the k-th yeti comes after the sum of k gaps of 5-13 patterns (main.rage_giant_gap)
+# and shows up if that is before the last pattern, so P(yetis >= k) = P(k gaps < num_patterns).
+# Returns the mean and variance of the count
+def rage_giant_moments(num_patterns):
+    low, high = main.rage_giant_gap
+    gap = np.zeros(high + 1)
+    gap[low:] = 1 / (high - low + 1)
+    arrival = np.array([1.0])
+    mean = 0.0
+    second_moment = 0.0
+    k = 0
+    while True:
+        k += 1
+        arrival = np.convolve(arrival, gap)[:num_patterns]
+        chance = arrival.sum()
+        if chance <= 0:
+            break
+        mean += chance
+        second_moment += (2 * k - 1) * chance
+    return mean, second_moment - mean * mean
+
+
+# Function to get the mean and covariance of the kills per enemy in a run of a mode
+# (enemies, enemies x enemies). Patterns are independent, so a run is num_patterns times one
+# pattern, plus rage mode's yetis, which come on their own clock
+def kill_moments(mode, duration=None):
+    duration = main.simulation_duration if duration is None else duration
+    enemy_names = list(main.enemies)
+    yeti = enemy_names.index("yeti")
+
+    if mode == "idle_play":
+        num_patterns = int(duration / main.idle_spawn_time)
+        chances = np.full(len(enemy_names), (1 - main.idle_giant_chance) / len(enemy_names))
+        chances[yeti] += main.idle_giant_chance
+        return num_patterns * chances, num_patterns * (np.diag(chances) - np.outer(chances, chances)), num_patterns
+
+    num_patterns = duration if mode == "active_bow" else 2 * duration
+    slots = pattern_slots()
+    weights = np.array(main.pattern_weights, dtype=float)
+    weights /= weights.sum()
+    slot_mean = weights @ slots
+    slot_covariance = slots.T @ (weights[:, None] * slots) - np.outer(slot_mean, slot_mean)
+    if mode == "active_bow":
+        # Each enemy of the pattern shows up with bow_enemy_chance, the yeti on its own
+        survival = main.bow_enemy_chance
+        mean = survival * slot_mean
+        covariance = survival ** 2 * slot_covariance + np.diag(survival * (1 - survival) * slot_mean)
+        mean[yeti] += main.bow_giant_chance
+        covariance[yeti, yeti] += main.bow_giant_chance * (1 - main.bow_giant_chance)
+        return num_patterns * mean, num_patterns * covariance, num_patterns
+
+    mean = num_patterns * slot_mean
+    covariance = num_patterns * slot_covariance
+    giant_mean, giant_variance = rage_giant_moments(num_patterns)
+    mean[yeti] += giant_mean
+    covariance[yeti, yeti] += giant_variance
+    return mean, covariance, num_patterns
+
+
+# Function to work out a run of a mode in closed form: the souls of a run are a sum over
+# random kill counts of independent kill rewards (normal or crit), so
+#   mean = sum of E[kills] * E[reward]
+#   variance = sum of E[kills] * Var(reward) + E[reward]' Cov(kills) E[reward]
+# Returns main's average stats dict (with the expected values) and the variance of the souls
+def expected_stats(mode, duration=None):
+    duration = main.simulation_duration if duration is None else duration
+    _, use_bow, rage_mode = MODES[mode]
+    rewards, contributions, crit_rate = reward_arrays(use_bow, rage_mode)
+    kill_mean, kill_covariance, num_patterns = kill_moments(mode, duration)
+    crit_chances = np.array([1 - crit_rate, crit_rate])
+    reward_mean = rewards @ crit_chances
+    reward_variance = (rewards ** 2) @ crit_chances - reward_mean ** 2
+    souls_per_monster = kill_mean * reward_mean
+    bonus_contributions = kill_mean @ np.einsum("ecb,c->eb", contributions, crit_chances)
+
+    stats = main.initialize_stats()
+    stats["total_souls"] = float(souls_per_monster.sum())
+    stats["total_criticals"] = float(kill_mean.sum() * crit_rate)
+    stats["total_patterns"] = num_patterns
+    for i, enemy_name in enumerate(main.enemies):
+        stats["souls_per_monster"][enemy_name] = float(souls_per_monster[i])
+        stats["kills_per_monster"][enemy_name] = float(kill_mean[i])
+    for i, bonus in enumerate(main.bonuses):
+        stats["bonus_contributions"][bonus] = float(bonus_contributions[i])
+    variance = float(kill_mean @ reward_variance + reward_mean @ kill_covariance @ reward_mean)
+    return stats, variance
+
+
+# Function to summarize the closed form of a mode as plain numbers, like main.summarize_stats
+def summarize_expected(mode, duration=None):
+    duration = main.simulation_duration if duration is None else duration
+    stats, variance = expected_stats(mode, duration)
+    return {
+        "avg_souls": stats["total_souls"],
+        "souls_per_second": stats["total_souls"] / duration,
+        "std_souls": math.sqrt(variance),
+        "variance": variance,
+        "avg_criticals": stats["total_criticals"],
+        "souls_per_monster": stats["souls_per_monster"],
+        "kills_per_monster": stats["kills_per_monster"],
+        "bonus_contributions": stats["bonus_contributions"],
+    }
+
+
+# Function to cross-check the closed form of a mode against main's Monte Carlo runs: how far
+# the simulated average of the souls (and of each monster's kills) is from the expected value,
+# relative and in standard errors of the simulated average
+def cross_check(mode, num_runs=CHECK_RUNS, workers=1, seed=None):
+    stats, variance = expected_stats(mode)
+    avg_stats, _, _ = main.run_multiple_simulations(main.SIMULATIONS[mode][1], num_runs, workers, seed)
+    standard_error = math.sqrt(variance / num_runs)
+    deviation = avg_stats["total_souls"] - stats["total_souls"]
+    return {
+        "runs": num_runs,
+        "analytic_souls": stats["total_souls"],
+        "simulated_souls": avg_stats["total_souls"],
+        "relative_deviation": deviation / stats["total_souls"],
+        "standard_errors": deviation / standard_error,
+        "kill_deviations": {enemy_name: avg_stats["kills_per_monster"][enemy_name] - expected
+                            for enemy_name, expected in stats["kills_per_monster"].items()},
+    }
+
+
+# Function to display the closed form of a mode, and its cross-check when there is one
+def display_expected(mode, summary, check=None):
+    print(f"\n--- {MODES[mode][0]}: expected run of {main.simulation_duration}s ---")
+    print(f"Souls: {main.human_readable(summary['avg_souls'])} (std dev {main.human_readable(summary['std_souls'])}), "
+          f"{main.human_readable(summary['souls_per_second'])} per second")
+    print(f"Criticals: {summary['avg_criticals']:.1f}")
+    for enemy_name, souls in summary["souls_per_monster"].items():
+        print(f"  {enemy_name}: {summary['kills_per_monster'][enemy_name]:.2f} kills, {main.human_readable(souls)} souls")
+    print("Bonus contributions:")
+    for bonus, contribution in sorted(summary["bonus_contributions"].items(), key=lambda item: item[1], reverse=True):
+        print(f"  {bonus}: {main.human_readable(contribution)}")
+    if check:
+        print(f"Monte Carlo ({check['runs']} runs): {main.human_readable(check['simulated_souls'])}, "
+              f"{check['relative_deviation']:+.2%} ({check['standard_errors']:+.2f} standard errors)")
+
+
+# Function to parse the command line of the analytic evaluator
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Work out the expected souls of each play mode in closed form")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), help="modes to evaluate (all by default)")
+    parser.add_argument("--check", action="store_true", help="cross-check against main's Monte Carlo runs")
+    parser.add_argument("--runs", type=int, default=CHECK_RUNS, help="Monte Carlo runs per mode when cross-checking")
+    parser.add_argument("--seed", help="master seed of the Monte Carlo runs")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of the Monte Carlo runs")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    results = {}
+    for mode in args.modes or MODES:
+        results[mode] = {"expected": summarize_expected(mode)}
+        if args.check:
+            results[mode]["check"] = cross_check(mode, args.runs, args.workers, args.seed)
+    if args.format == "json":
+        print(json.dumps(results, indent=4))
+    else:
+        for mode, result in results.items():
+            display_expected(mode, result["expected"], result.get("check"))
+    if args.check and any(abs(result["check"]["standard_errors"]) > CHECK_TOLERANCE for result in results.values()):
+        print(f"The Monte Carlo mean strayed more than {CHECK_TOLERANCE} standard errors from the closed form")
+        raise SystemExit(1)
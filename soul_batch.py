@@ -0,0 +1,173 @@
+import numpy as np
+
+import main
+
+NUM_RUNS = 100000
+BATCH_RUNS = 20000  # Runs per batch, keeps the working set small
+
+# Simulated modes: name -> (display name, bow, rage mode)
+MODES = {
+    "active_bow": ("Active Play with Bow", True, False),
+    "active_rage": ("Active Play in Rage Mode", False, True),
+    "idle_play": ("Idle Play", False, False),
+}
+
+
+# Function to get the reward of every (enemy, crit) case of a mode from main's reward table,
+# as arrays: rewards (enemies x 2) and bonus contributions (enemies x 2 x bonuses)
+def reward_arrays(use_bow, rage_mode):
+    table = main.reward_table()
+    enemy_names = list(main.enemies)
+    bonus_names = list(main.bonuses)
+    rewards = np.zeros((len(enemy_names), 2))
+    contributions = np.zeros((len(enemy_names), 2, len(bonus_names)))
+    for i, enemy_name in enumerate(enemy_names):
+        for is_crit in (False, True):
+            soul_reward, entry_contributions, _ = table["rewards"][(enemy_name, use_bow, rage_mode, is_crit)]
+            rewards[i, int(is_crit)] = soul_reward
+            for bonus, contribution in entry_contributions:
+                contributions[i, int(is_crit), bonus_names.index(bonus)] += contribution
+    return rewards, contributions, table["crit_rate"]
+
+
+# Function to count the enemies of each pattern (patterns x enemies)
+def pattern_slots():
+    enemy_names = list(main.enemies)
+    slots = np.zeros((len(main.patterns), len(enemy_names)), dtype=np.int64)
+    for i, pattern in enumerate(main.patterns):
+        for enemy_name in pattern:
+            slots[i, enemy_names.index(enemy_name)] += 1
+    return slots
+
+
+# Function to count how many rage mode yetis show up in num_patterns patterns: the first
+# after 5-13 patterns (main.rage_giant_gap), then one every 5-13 patterns
+def rage_giants(rng, num_runs, num_patterns):
+    low, high = main.rage_giant_gap
+    num_gaps = num_patterns // low + 1
+    arrivals = np.cumsum(rng.integers(low, high + 1, size=(num_runs, num_gaps), dtype=np.int16), axis=1)
+    return (arrivals < num_patterns).sum(axis=1)
+
+
+# Function to sample the kills per enemy of num_runs stretches of num_patterns patterns of a
+# mode (runs x enemies), without rage mode's yetis, which come on their own clock. Only the
+# counts matter, because every kill of an enemy in a mode is worth the same up to the crit:
+# patterns are drawn as multinomial counts and enemy drop-outs as binomials, which gives the
+# same distribution as playing the patterns one by one
+def pattern_kills(rng, mode, num_runs, num_patterns):
+    enemy_names = list(main.enemies)
+    yeti = enemy_names.index("yeti")
+
+    if mode == "idle_play":
+        chances = np.full(len(enemy_names), (1 - main.idle_giant_chance) / len(enemy_names))
+        chances[yeti] += main.idle_giant_chance
+        return rng.multinomial(num_patterns, chances, size=num_runs)
+
+    slots = pattern_slots()
+    weights = np.array(main.pattern_weights, dtype=float)
+    chosen = rng.multinomial(num_patterns, weights / weights.sum(), size=num_runs)
+    kills = chosen @ slots
+    if mode == "active_bow":
+        kills = rng.binomial(kills, main.bow_enemy_chance)
+        kills[:, yeti] += rng.binomial(num_patterns, main.bow_giant_chance, size=num_runs)
+    return kills
+
+
+# Function to sample the kills per enemy of num_runs runs of a mode (runs x enemies)
+def sample_kills(rng, mode, num_runs, duration=None):
+    duration = main.simulation_duration if duration is None else duration
+    if mode == "idle_play":
+        num_patterns = int(duration / main.idle_spawn_time)
+    else:
+        num_patterns = duration if mode == "active_bow" else 2 * duration
+    kills = pattern_kills(rng, mode, num_runs, num_patterns)
+    if mode == "active_rage":
+        kills[:, list(main.enemies).index("yeti")] += rage_giants(rng, num_runs, num_patterns)
+    return kills, num_patterns
+
+
+# Function to simulate num_runs runs of a mode at once. Returns arrays with one row per run:
+# total souls, kills and souls per monster, criticals, highest critical and bonus contributions.
+# reward arrays (from reward_arrays) can be passed in to simulate other bonuses than main's
+def simulate_runs(rng, mode, num_runs, duration=None, arrays=None):
+    _, use_bow, rage_mode = MODES[mode]
+    rewards, contributions, crit_rate = arrays or reward_arrays(use_bow, rage_mode)
+    kills, num_patterns = sample_kills(rng, mode, num_runs, duration)
+    crits = rng.binomial(kills, crit_rate)
+    normal = kills - crits
+
+    souls_per_monster = normal * rewards[:, 0] + crits * rewards[:, 1]
+    base_rewards = np.array([enemy["reward"] for enemy in main.enemies.values()])
+    critical_rewards = np.where(crits > 0, base_rewards, 0)
+    return {
+        "total_souls": souls_per_monster.sum(axis=1),
+        "souls_per_monster": souls_per_monster,
+        "kills_per_monster": kills,
+        "total_criticals": crits.sum(axis=1),
+        "highest_critical": critical_rewards.max(axis=1),
+        "highest_crit_monster": critical_rewards.argmax(axis=1),
+        "bonus_contributions": normal @ contributions[:, 0] + crits @ contributions[:, 1],
+        "total_patterns": np.full(num_runs, num_patterns),
+    }
+
+
+# Function to turn one run of the arrays back into main's stats dict
+def run_stats(runs, index):
+    stats = main.initialize_stats()
+    enemy_names = list(main.enemies)
+    stats["total_souls"] = float(runs["total_souls"][index])
+    stats["total_criticals"] = int(runs["total_criticals"][index])
+    stats["highest_critical"] = int(runs["highest_critical"][index])
+    if stats["total_criticals"]:
+        stats["highest_crit_monster"] = enemy_names[runs["highest_crit_monster"][index]]
+    stats["total_patterns"] = int(runs["total_patterns"][index])
+    for i, enemy_name in enumerate(enemy_names):
+        stats["souls_per_monster"][enemy_name] = float(runs["souls_per_monster"][index, i])
+        stats["kills_per_monster"][enemy_name] = int(runs["kills_per_monster"][index, i])
+    for i, bonus in enumerate(main.bonuses):
+        stats["bonus_contributions"][bonus] = float(runs["bonus_contributions"][index, i])
+    return stats
+
+
+# Function to simulate num_runs runs of a mode in batches. Returns main's (average, worst,
+# best) stats dicts, like run_multiple_simulations, plus the total souls of every run
+def run_batch_soul_simulations(mode, num_runs=NUM_RUNS, seed=None, batch_runs=BATCH_RUNS, duration=None):
+    rng = np.random.default_rng(seed)
+    batches = []
+    for start in range(0, num_runs, batch_runs):
+        batches.append(simulate_runs(rng, mode, min(batch_runs, num_runs - start), duration))
+    runs = {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+    avg_stats = main.initialize_stats()
+    enemy_names = list(main.enemies)
+    avg_stats["total_souls"] = float(runs["total_souls"].mean())
+    avg_stats["total_criticals"] = float(runs["total_criticals"].mean())
+    avg_stats["highest_critical"] = int(runs["highest_critical"].max())
+    avg_stats["total_patterns"] = float(runs["total_patterns"].mean())
+    for i, enemy_name in enumerate(enemy_names):
+        avg_stats["souls_per_monster"][enemy_name] = float(runs["souls_per_monster"][:, i].mean())
+        avg_stats["kills_per_monster"][enemy_name] = float(runs["kills_per_monster"][:, i].mean())
+    for i, bonus in enumerate(main.bonuses):
+        avg_stats["bonus_contributions"][bonus] = float(runs["bonus_contributions"][:, i].mean())
+
+    worst_stats = run_stats(runs, int(runs["total_souls"].argmin()))
+    best_stats = run_stats(runs, int(runs["total_souls"].argmax()))
+    return avg_stats, worst_stats, best_stats, runs["total_souls"]
+
+
+# Function to display the distribution of souls per run of a mode
+def display_soul_distribution(mode, total_souls, duration=None):
+    duration = main.simulation_duration if duration is None else duration
+    percentiles = np.percentile(total_souls, [5, 25, 50, 75, 95])
+    print(f"\n--- {MODES[mode][0]}: {len(total_souls)} runs ---")
+    print(f"Souls per second: {main.human_readable(total_souls.mean() / duration)} "
+          f"(std dev {main.human_readable(total_souls.std() / duration)})")
+    print("Souls per run percentiles: " + ", ".join(
+        f"p{p} {main.human_readable(value)}" for p, value in zip((5, 25, 50, 75, 95), percentiles)))
+
+
+if __name__ == "__main__":
+    for mode, (mode_name, _, _) in MODES.items():
+        avg_stats, worst_stats, best_stats, total_souls = run_batch_soul_simulations(mode)
+        main.display_aggregated_stats(mode_name, avg_stats, worst_stats, best_stats)
+        display_soul_distribution(mode, total_souls)
@@ -0,0 +1,162 @@
+import argparse
+import json
+
+import numpy as np
+
+import main
+from loadout_pipeline import main_bonuses
+from soul_analytic import expected_stats, kill_moments
+from soul_batch import MODES, reward_arrays
+
+# What one upgrade level adds to each bonus, like an armory bonus (see loadout_pipeline's
+# ARMORY_BONUS_MAP): "percent" scales the multiplier by (1 + amount / 100), "chance" adds
+# amount / 100 to the crit rate and "additive" adds amount to the multiplier. Adjust to the
+# upgrades on offer
+UPGRADE_LEVELS = {
+    "soul_bonus": ("percent", 10),
+    "electric_bonus": ("percent", 10),
+    "dark_bonus": ("percent", 10),
+    "giant_bonus": ("percent", 10),
+    "crit_soul_bonus": ("percent", 10),
+    "level_soul_bonus": ("percent", 10),
+    "crit_rate_bonus": ("chance", 1),
+    "souls_with_bow": ("percent", 10),
+    "souls_with_boost": ("percent", 10),
+    "rage_mode_bonus": ("additive", 10),
+}
+CHECK_TOLERANCE = 1e-9  # Relative error allowed between a one-pass delta and a full re-evaluation
+
+
+# Function to get the rewards of a mode for some bonuses, with the power each named bonus
+# appears with in them. Every reward is a product of bonuses, so doubling a bonus multiplies a
+# reward by 2 ** power. A bonus of 0 zeroes the rewards it is in and would hide its power, so
+# the named bonuses at 0 are probed at 1 instead. Returns the probed rewards (enemies x 2), the
+# crit rate, powers (bonuses x enemies x 2) and the probed values: rewards_at gets the rewards
+# of any values from them
+def reward_powers(mode, bonuses, names):
+    _, use_bow, rage_mode = MODES[mode]
+    probe = dict(bonuses, **{name: 1 for name in names if bonuses[name] == 0})
+    with main_bonuses(probe):
+        rewards, _, crit_rate = reward_arrays(use_bow, rage_mode)
+    powers = np.zeros((len(names),) + rewards.shape)
+    for i, name in enumerate(names):
+        with main_bonuses(dict(probe, **{name: 2 * probe[name]})):
+            doubled, _, _ = reward_arrays(use_bow, rage_mode)
+        powers[i] = np.round(np.log2(np.divide(doubled, rewards, out=np.ones_like(rewards), where=rewards != 0)))
+    return rewards, crit_rate, powers, np.array([probe[name] for name in names], dtype=float)
+
+
+# Function to get the rewards for other values of the bonuses, from reward_powers: values is
+# one value per bonus, or one row of them per case (the rewards then get the same leading axis)
+def rewards_at(rewards, powers, probe_values, values):
+    return rewards * np.prod((values / probe_values)[..., None, None] ** powers, axis=-3)
+
+
+# Function to get the value of a bonus after one upgrade level
+def upgraded_value(value, level):
+    kind, amount = level
+    if kind == "percent":
+        return value * (1 + amount / 100)
+    if kind == "chance":
+        return value + amount / 100
+    return value + amount
+
+
+# Function to work out how souls per second of a mode respond to every bonus at once, from the
+# closed form of soul_analytic: souls per second is a sum over enemies of expected kills times
+# expected reward, and each reward is a product of bonuses (powers from reward_powers), so
+#   d(souls/s)/d(bonus) = sum of kills/s * power * (reward with the bonus at 1) * bonus ** (power - 1)
+# which holds for a bonus of 0 too, and the crit rate bonus moves the crit chance, worth
+# kills/s * (crit reward - normal reward). An upgrade level is priced by re-reading the rewards
+# at the upgraded value, so every "+1 level" delta is exact too. Returns one row per bonus,
+# ranked by the souls per second its level adds
+def bonus_sensitivities(mode, bonuses=None, levels=None, duration=None):
+    bonuses = dict(main.bonuses if bonuses is None else bonuses)
+    levels = dict(UPGRADE_LEVELS, **(levels or {}))
+    duration = main.simulation_duration if duration is None else duration
+    names = [name for name in bonuses if name != "crit_rate_bonus"]
+    probe_rewards, crit_rate, powers, probe_values = reward_powers(mode, bonuses, names)
+    values = np.array([bonuses[name] for name in names], dtype=float)
+    rewards = rewards_at(probe_rewards, powers, probe_values, values)
+    with main_bonuses(bonuses):
+        kill_mean, _, _ = kill_moments(mode, duration)
+    kills_per_second = kill_mean / duration
+    crit_chances = np.array([1 - crit_rate, crit_rate])
+    souls_per_second = float(kills_per_second @ rewards @ crit_chances)
+
+    # Row i of a swap: every bonus at its value but bonus i, at the given one
+    swapped = np.eye(len(names), dtype=bool)
+    unit_rewards = rewards_at(probe_rewards, powers, probe_values, np.where(swapped, 1.0, values))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.where(powers != 0, powers * unit_rewards * values[:, None, None] ** (powers - 1), 0)
+    derivatives = np.einsum("iec,c,e->i", slopes, crit_chances, kills_per_second)
+    new_values = np.array([upgraded_value(bonuses[name], levels.get(name, ("percent", 10))) for name in names])
+    upgraded = rewards_at(probe_rewards, powers, probe_values, np.where(swapped, new_values[:, None], values))
+    deltas = np.einsum("iec,c,e->i", upgraded, crit_chances, kills_per_second) - souls_per_second
+
+    rows = [{"bonus": name, "value": bonuses[name], "new_value": float(new_values[i]),
+             "derivative": float(derivatives[i]), "delta": float(deltas[i])}
+            for i, name in enumerate(names)]
+    if "crit_rate_bonus" in bonuses:
+        crit_gain = float(kills_per_second @ (rewards[:, 1] - rewards[:, 0]))
+        new_value = upgraded_value(bonuses["crit_rate_bonus"], levels.get("crit_rate_bonus", ("chance", 1)))
+        new_rate = min(max(crit_rate + new_value - bonuses["crit_rate_bonus"], 0), 1)
+        rows.append({"bonus": "crit_rate_bonus", "value": bonuses["crit_rate_bonus"], "new_value": new_value,
+                     "derivative": crit_gain, "delta": crit_gain * (new_rate - crit_rate)})
+    for row in rows:
+        row["relative_delta"] = row["delta"] / souls_per_second if souls_per_second else float("nan")
+    return {"souls_per_second": souls_per_second,
+            "upgrades": sorted(rows, key=lambda row: row["delta"], reverse=True)}
+
+
+# Function to check the one-pass deltas of a mode against the closed form re-evaluated with
+# each upgrade applied in turn. Returns the largest relative error
+def check_sensitivities(mode, sensitivities, bonuses=None, duration=None):
+    bonuses = dict(main.bonuses if bonuses is None else bonuses)
+    duration = main.simulation_duration if duration is None else duration
+    worst = 0.0
+    for row in sensitivities["upgrades"]:
+        with main_bonuses(dict(bonuses, **{row["bonus"]: row["new_value"]})):
+            stats, _ = expected_stats(mode, duration)
+        delta = stats["total_souls"] / duration - sensitivities["souls_per_second"]
+        worst = max(worst, abs(delta - row["delta"]) / (sensitivities["souls_per_second"] or 1))
+    return worst
+
+
+# Function to display the ranked upgrade table of a mode
+def display_sensitivities(mode, sensitivities):
+    print(f"\n--- {MODES[mode][0]}: {main.human_readable(sensitivities['souls_per_second'])} souls per second ---")
+    for position, row in enumerate(sensitivities["upgrades"], 1):
+        print(f"{position}. {row['bonus']}: {row['value']:g} -> {row['new_value']:g}, "
+              f"+{main.human_readable(row['delta'])} souls/s ({row['relative_delta']:+.2%}), "
+              f"d(souls/s)/d(bonus) {main.human_readable(row['derivative'])}")
+
+
+# Function to parse the command line of the sensitivity analysis
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Rank the upgrades of main's bonuses by the souls per second they add")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), help="modes to analyze (all by default)")
+    parser.add_argument("--levels", help="JSON file overriding UPGRADE_LEVELS (bonus -> [kind, amount])")
+    parser.add_argument("--check", action="store_true", help="re-evaluate every upgrade to check the deltas")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    levels = None
+    if args.levels:
+        with open(args.levels, "r") as file:
+            levels = {bonus: tuple(level) for bonus, level in json.load(file).items()}
+    results = {mode: bonus_sensitivities(mode, levels=levels) for mode in args.modes or MODES}
+    if args.format == "json":
+        print(json.dumps(results, indent=4))
+    else:
+        for mode, sensitivities in results.items():
+            display_sensitivities(mode, sensitivities)
+    if args.check:
+        errors = {mode: check_sensitivities(mode, sensitivities) for mode, sensitivities in results.items()}
+        print("Largest relative error against re-evaluating each upgrade: " + ", ".join(
+            f"{mode} {error:.1e}" for mode, error in errors.items()))
+        if max(errors.values()) > CHECK_TOLERANCE:
+            raise SystemExit(1)
@@ -0,0 +1,230 @@
+import argparse
+import heapq
+import json
+import random
+
+import numpy as np
+
+import main
+from soul_batch import MODES, pattern_kills, reward_arrays
+
+SESSION_HOURS = 24
+
+# How a session is played: the activities repeat in order for the given seconds, rage mode and
+# boosts are (duration, cooldown) windows started as soon as they are ready and the player is
+# active (not idle). A window of None never opens: rage of None never enters rage mode, and a
+# boost of None leaves the boost on all the time instead, like main's modes assume
+SESSION_WINDOWS = ("rage", "boost")
+SESSION_PLAN = {
+    "activities": (("active_bow", 900), ("idle_play", 2700)),
+    "rage": (17, 300),  # Rage mode lasts 34 patterns
+    "boost": None,
+}
+
+
+# Function to get how many patterns a mode plays per second, like main's modes
+def patterns_per_second(mode):
+    if mode == "idle_play":
+        return 1 / main.idle_spawn_time
+    return 2 if mode == "active_rage" else 1
+
+
+# Simulates a long session as a queue of events (activity changes, rage and boost windows
+# opening and closing, rage mode yetis, hour marks). Between two events nothing changes, so
+# each stretch is played in one go: its kills are drawn as counts with soul_batch and priced
+# with main's reward table, the crits drawn per kill like calculate_reward does. Every event
+# schedules the next of its kind, so the queue never holds more than a handful of events, and
+# only the running totals and one number per hour are kept
+class SessionSimulator:
+    def __init__(self, plan=None, seed=None):
+        self.plan = dict(SESSION_PLAN, **(plan or {}))
+        for window in SESSION_WINDOWS:
+            timing = self.plan[window]
+            if timing is not None and (len(timing) != 2 or timing[0] <= 0 or timing[1] < 0):
+                raise ValueError(f"{window} must be None or (duration, cooldown) with a positive duration, "
+                                 f"not {timing!r}")
+        self.giant_random = random.Random(seed)
+        self.rng = np.random.default_rng(self.giant_random.getrandbits(64))
+        self.arrays = {mode: reward_arrays(use_bow, rage_mode) for mode, (_, use_bow, rage_mode) in MODES.items()}
+        self.crit_rate = main.reward_table()["crit_rate"]
+        self.yeti = list(main.enemies).index("yeti")
+
+    def run(self, hours=SESSION_HOURS):
+        end = hours * 3600
+        self.queue = []
+        self.sequence = 0
+        self.now = 0
+        self.pattern_carry = 0
+        self.activity = None
+        # Disabled windows are never ready, so they never open (or close)
+        self.windows = {"rage": False, "boost": self.plan["boost"] is None}
+        self.ready = {window: self.plan[window] is not None for window in SESSION_WINDOWS}
+        self.rage_count = 0
+        self.totals = {
+            "total_souls": 0.0,
+            "total_criticals": 0,
+            "total_patterns": 0,
+            "kills_per_monster": np.zeros(len(main.enemies), dtype=np.int64),
+            "souls_per_monster": np.zeros(len(main.enemies)),
+            "seconds_per_mode": {mode: 0.0 for mode in MODES},
+            "souls_per_mode": {mode: 0.0 for mode in MODES},
+            "hourly_souls": [],
+            "rage_windows": 0,
+            "boost_windows": 0,
+        }
+        self.hour_souls = 0.0
+
+        self.schedule(0, "activity", 0)
+        self.schedule(3600, "hour", None)
+        self.schedule(end, "end", None)
+        while True:
+            time, _, kind, data = heapq.heappop(self.queue)
+            self.play(time)
+            if kind == "end":
+                break
+            getattr(self, f"on_{kind}")(data)
+        self.totals["hourly_souls"].append(self.hour_souls)
+        return self.summary(hours)
+
+    def schedule(self, time, kind, data):
+        heapq.heappush(self.queue, (time, self.sequence, kind, data))
+        self.sequence += 1
+
+    def mode(self):
+        return "active_rage" if self.windows["rage"] else self.activity
+
+    # Plays the stretch from now to time in the current mode, all its patterns at once
+    def play(self, time):
+        mode = self.mode()
+        seconds = time - self.now
+        self.now = time
+        if seconds <= 0:
+            return
+        patterns = seconds * patterns_per_second(mode) + self.pattern_carry
+        num_patterns = int(patterns)
+        self.pattern_carry = patterns - num_patterns
+        self.totals["seconds_per_mode"][mode] += seconds
+        if num_patterns:
+            self.add_kills(mode, pattern_kills(self.rng, mode, 1, num_patterns)[0])
+            self.totals["total_patterns"] += num_patterns
+
+    def add_kills(self, mode, kills):
+        rewards = self.arrays[mode][0]
+        crits = self.rng.binomial(kills, self.crit_rate)
+        souls_per_monster = (kills - crits) * rewards[:, 0] + crits * rewards[:, 1]
+        # The reward table starts every multiplier chain but rage mode's from the boost
+        if not self.windows["boost"] and mode != "active_rage":
+            souls_per_monster = souls_per_monster / main.bonuses["souls_with_boost"]
+        souls = float(souls_per_monster.sum())
+        self.totals["kills_per_monster"] += kills
+        self.totals["souls_per_monster"] += souls_per_monster
+        self.totals["total_criticals"] += int(crits.sum())
+        self.totals["total_souls"] += souls
+        self.totals["souls_per_mode"][mode] += souls
+        self.hour_souls += souls
+
+    def on_activity(self, index):
+        activities = self.plan["activities"]
+        self.activity, seconds = activities[index % len(activities)]
+        self.schedule(self.now + seconds, "activity", (index + 1) % len(activities))
+        for window in SESSION_WINDOWS:
+            self.open_window(window)
+
+    # A rage or boost window is ready: open it now if the player is active, or when they are
+    def on_ready(self, window):
+        self.ready[window] = True
+        self.open_window(window)
+
+    def open_window(self, window):
+        if not self.ready[window] or self.activity == "idle_play":
+            return
+        self.ready[window] = False
+        self.windows[window] = True
+        self.totals[f"{window}_windows"] += 1
+        self.schedule(self.now + self.plan[window][0], "close", window)
+        if window == "rage":
+            self.rage_count += 1
+            self.schedule_giant()
+
+    def on_close(self, window):
+        self.windows[window] = False
+        self.schedule(self.now + self.plan[window][1], "ready", window)
+
+    # Rage mode yetis come every 5-13 patterns (main.rage_giant_gap) of the window that
+    # scheduled them
+    def schedule_giant(self):
+        gap = self.giant_random.randint(*main.rage_giant_gap)
+        self.schedule(self.now + gap / patterns_per_second("active_rage"), "giant", self.rage_count)
+
+    def on_giant(self, rage_count):
+        if not self.windows["rage"] or rage_count != self.rage_count:
+            return
+        kills = np.zeros(len(main.enemies), dtype=np.int64)
+        kills[self.yeti] = 1
+        self.add_kills("active_rage", kills)
+        self.schedule_giant()
+
+    def on_hour(self, _):
+        self.totals["hourly_souls"].append(self.hour_souls)
+        self.hour_souls = 0.0
+        self.schedule(self.now + 3600, "hour", None)
+
+    def summary(self, hours):
+        totals = self.totals
+        enemy_names = list(main.enemies)
+        return {
+            "hours": hours,
+            "total_souls": totals["total_souls"],
+            "souls_per_second": totals["total_souls"] / (hours * 3600),
+            "total_criticals": totals["total_criticals"],
+            "total_patterns": totals["total_patterns"],
+            "kills_per_monster": dict(zip(enemy_names, totals["kills_per_monster"].tolist())),
+            "souls_per_monster": dict(zip(enemy_names, totals["souls_per_monster"].tolist())),
+            "seconds_per_mode": totals["seconds_per_mode"],
+            "souls_per_mode": totals["souls_per_mode"],
+            "hourly_souls": totals["hourly_souls"],
+            "rage_windows": totals["rage_windows"],
+            "boost_windows": totals["boost_windows"],
+        }
+
+
+# Function to simulate one session of the given hours. Returns its summary
+def run_session(hours=SESSION_HOURS, plan=None, seed=None):
+    return SessionSimulator(plan, seed).run(hours)
+
+
+# Function to display the summary of a session
+def display_session(session):
+    print(f"\n--- {session['hours']} hour session ---")
+    print(f"Total Souls: {main.human_readable(session['total_souls'])} "
+          f"({main.human_readable(session['souls_per_second'])} per second)")
+    print(f"Rage windows: {session['rage_windows']}, patterns: {session['total_patterns']}, "
+          f"criticals: {session['total_criticals']}")
+    print("Time and souls per mode:")
+    for mode, (mode_name, _, _) in MODES.items():
+        print(f"  {mode_name}: {session['seconds_per_mode'][mode] / 3600:.2f} h, "
+              f"{main.human_readable(session['souls_per_mode'][mode])} souls")
+    print("Souls per hour: " + ", ".join(main.human_readable(souls) for souls in session["hourly_souls"]))
+
+
+# Function to parse the command line of the session simulator
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Simulate a long soul farming session")
+    parser.add_argument("--hours", type=float, default=SESSION_HOURS, help="session length in hours")
+    parser.add_argument("--seed", help="seed, for repeatable sessions")
+    parser.add_argument("--plan", help="JSON file overriding parts of SESSION_PLAN")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="output format")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    plan = None
+    if args.plan:
+        with open(args.plan, "r") as file:
+            plan = json.load(file)
+    session = run_session(args.hours, plan, args.seed)
+    if args.format == "json":
+        print(json.dumps(session, indent=4))
+    else:
+        display_session(session)
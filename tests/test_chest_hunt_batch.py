@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+from chest_hunt_batch import run_batch_simulations
+from chest_hunt_exact import solve_strategies
+from chest_hunt_simlator import DEFAULT_RULES, histogram_variance, run_shard, strategies
+
+BATCH_GAMES = 200000
+SCALAR_GAMES = 20000
+Z_BOUND = 4  # Standard errors a seeded estimate may stray from the exact value
+# Every rule away from its default, savers the strategies don't see included
+PERK_RULES = DEFAULT_RULES._replace(num_boxes=24, num_mimics=5, num_savers=2, multiplier=3, safe_picks=3,
+                                    sucker_punch_chance=0.1)
+
+
+def estimates(data, games):
+    return {
+        "win_rate": (data["wins"] / games, data["wins"] / games * (1 - data["wins"] / games)),
+        "avg_boxes_opened": (data["total_boxes_opened"] / games, histogram_variance(data["boxes_histogram"])),
+    }
+
+
+@pytest.fixture(scope="module")
+def engines():
+    batch = run_batch_simulations(BATCH_GAMES, seed=1)
+    scalar = {name: run_shard(strategy_func, SCALAR_GAMES, f"batch-test:{name}")
+              for name, strategy_func in strategies.items()}
+    return batch, scalar, solve_strategies()
+
+
+@pytest.fixture(scope="module")
+def perk_engines():
+    batch = run_batch_simulations(BATCH_GAMES, seed=1, rules=PERK_RULES)
+    scalar = {name: run_shard(strategy_func, SCALAR_GAMES, f"batch-test:{name}", PERK_RULES)
+              for name, strategy_func in strategies.items()}
+    return batch, scalar
+
+
+def assert_engines_agree(batch, scalar, strategy_name):
+    batch_estimates = estimates(batch[strategy_name], BATCH_GAMES)
+    scalar_estimates = estimates(scalar[strategy_name], SCALAR_GAMES)
+    for key, (batch_mean, batch_variance) in batch_estimates.items():
+        scalar_mean, scalar_variance = scalar_estimates[key]
+        standard_error = math.sqrt(batch_variance / BATCH_GAMES + scalar_variance / SCALAR_GAMES)
+        assert abs(batch_mean - scalar_mean) < Z_BOUND * standard_error, key
+
+
+@pytest.mark.parametrize("strategy_name", list(strategies))
+def test_batch_engine_agrees_with_the_scalar_engine(engines, strategy_name):
+    assert_engines_agree(engines[0], engines[1], strategy_name)
+
+
+@pytest.mark.parametrize("strategy_name", list(strategies))
+def test_batch_engine_plays_the_same_rules_as_the_scalar_engine(perk_engines, strategy_name):
+    assert_engines_agree(*perk_engines, strategy_name)
+
+
+@pytest.mark.parametrize("strategy_name", list(strategies))
+def test_both_engines_agree_with_the_exact_solver(engines, strategy_name):
+    batch, scalar, exact = engines
+    if strategy_name not in exact:
+        pytest.skip(f"{strategy_name} is random, it has no exact solution")
+    solution = exact[strategy_name]
+    for results, games in ((batch, BATCH_GAMES), (scalar, SCALAR_GAMES)):
+        for key, (mean, variance) in estimates(results[strategy_name], games).items():
+            assert abs(mean - solution[key]) < Z_BOUND * math.sqrt(variance / games), key
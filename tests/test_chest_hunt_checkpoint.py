@@ -0,0 +1,66 @@
+import pytest
+
+from chest_hunt_checkpoint import merge_checkpoints, read_checkpoints, run_checkpointed_simulations
+from chest_hunt_simlator import DEFAULT_RULES, run_simulations
+
+GAMES = 2000
+SHARD_SIZE = 250
+
+
+def run(filename, num_simulations=GAMES, shard_size=SHARD_SIZE):
+    return run_checkpointed_simulations(num_simulations, seed=7, filename=str(filename), checkpoint_every=2,
+                                        shard_size=shard_size)
+
+
+def test_resume_after_torn_write_recovers_every_game(tmp_path):
+    expected_results, expected_games = run(tmp_path / "clean.jsonl")
+
+    torn = tmp_path / "torn.jsonl"
+    run(torn)
+    # Stop the last write halfway through its line, newline included
+    content = torn.read_bytes()
+    torn.write_bytes(content[:len(content) - len(content.splitlines()[-1]) // 2 - 1])
+    assert len(read_checkpoints(str(torn))) < len(read_checkpoints(str(tmp_path / "clean.jsonl")))
+
+    results, games = run(torn)
+    assert games == expected_games == {strategy: GAMES for strategy in expected_games}
+    assert results == expected_results
+    assert torn.read_bytes().endswith(b"\n")
+
+
+def test_resume_keeps_the_shard_size_of_the_file(tmp_path):
+    filename = tmp_path / "checkpoint.jsonl"
+    run(filename, num_simulations=1000)
+    with pytest.raises(ValueError):
+        run(filename, shard_size=500)
+
+    _, games = run_checkpointed_simulations(GAMES, seed=7, filename=str(filename))
+    assert set(games.values()) == {GAMES}
+    assert {record["shard_size"] for record in read_checkpoints(str(filename))} == {SHARD_SIZE}
+
+
+def test_resume_with_more_games_replays_the_short_shard(tmp_path):
+    expected_results, expected_games = run(tmp_path / "clean.jsonl")
+
+    grown = tmp_path / "grown.jsonl"
+    _, short_games = run(grown, num_simulations=1100)
+    assert set(short_games.values()) == {1100}
+
+    results, games = run(grown)
+    assert games == expected_games == {strategy: GAMES for strategy in expected_games}
+    assert results == expected_results
+
+
+def test_resume_keeps_the_rules_of_the_file(tmp_path):
+    filename = str(tmp_path / "checkpoint.jsonl")
+    more_savers = DEFAULT_RULES._replace(num_savers=2)
+    run_checkpointed_simulations(1000, seed=7, filename=filename, shard_size=SHARD_SIZE, rules=more_savers)
+    with pytest.raises(ValueError):
+        run_checkpointed_simulations(GAMES, seed=7, filename=filename, rules=DEFAULT_RULES)
+
+    results, games = run_checkpointed_simulations(GAMES, seed=7, filename=filename)
+    assert set(games.values()) == {GAMES}
+    assert results == run_simulations(GAMES, seed=7, shard_size=SHARD_SIZE, rules=more_savers)
+    records = read_checkpoints(filename)
+    with pytest.raises(ValueError):
+        merge_checkpoints(records + [dict(records[0], seed="8", rules=list(DEFAULT_RULES))])
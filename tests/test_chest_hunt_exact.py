@@ -0,0 +1,84 @@
+import itertools
+
+import pytest
+
+import chest_hunt_simlator
+from chest_hunt_exact import solve_strategy
+from chest_hunt_simlator import DEFAULT_RULES, rules_strategy, simulate_game, strategies
+
+SMALL_BOARDS = (
+    DEFAULT_RULES._replace(num_boxes=8),
+    DEFAULT_RULES._replace(num_boxes=9),
+    DEFAULT_RULES._replace(num_boxes=9, num_mimics=3, multiplier=3, safe_picks=3, sucker_punch_chance=0.1),
+)
+DETERMINISTIC = ("dynamic_sequential", "dynamic_sequential_reverse", "refined_dynamic_strategy")
+
+
+class RollNeeded(Exception):
+    pass
+
+
+# Stands in for the random module inside simulate_game: the layout is fixed, and the sucker
+# punch rolls are played from a script, so every branch of a game can be walked
+class ScriptedRandom:
+    def __init__(self, saver_position, multiplier_position, mimic_positions, rolls):
+        self.layout = (saver_position, multiplier_position, list(mimic_positions))
+        self.rolls = list(rolls)
+
+    def randint(self, low, high):
+        return self.layout[0]
+
+    def choice(self, options):
+        return self.layout[1]
+
+    def sample(self, population, count):
+        return self.layout[2]
+
+    def random(self):
+        if not self.rolls:
+            raise RollNeeded
+        return self.rolls.pop(0)
+
+
+# Function to brute force the expected outcomes of a strategy over every layout of a small
+# board, branching on every sucker punch roll simulate_game makes
+def enumerate_outcomes(strategy, rules, monkeypatch):
+    totals = [0.0] * 4
+    layouts = 0
+    for saver_position, multiplier_position in itertools.permutations(range(rules.num_boxes), 2):
+        others = [i for i in range(rules.num_boxes) if i not in (saver_position, multiplier_position)]
+        for mimic_positions in itertools.combinations(others, rules.num_mimics):
+            layouts += 1
+            branches = [((), 1.0)]
+            while branches:
+                rolls, probability = branches.pop()
+                monkeypatch.setattr(chest_hunt_simlator, "random",
+                                    ScriptedRandom(saver_position, multiplier_position, mimic_positions, rolls))
+                try:
+                    outcome = simulate_game(strategy, rules)
+                except RollNeeded:
+                    branches.append((rolls + (0.0,), probability * rules.sucker_punch_chance))
+                    branches.append((rolls + (1.0,), probability * (1 - rules.sucker_punch_chance)))
+                    continue
+                for i, value in enumerate(outcome):
+                    totals[i] += probability * value
+    return [total / layouts for total in totals]
+
+
+@pytest.mark.parametrize("rules", SMALL_BOARDS)
+@pytest.mark.parametrize("strategy_name", DETERMINISTIC)
+def test_exact_solution_matches_a_brute_force_enumeration(strategy_name, rules, monkeypatch):
+    strategy = strategies[strategy_name]
+    bound = rules_strategy(strategy, rules)
+    win_rate, boxes, mimics, kills = enumerate_outcomes(bound, rules, monkeypatch)
+    monkeypatch.undo()
+    exact = solve_strategy(strategy, rules)
+    assert exact["win_rate"] == pytest.approx(win_rate, abs=1e-12)
+    assert exact["avg_boxes_opened"] == pytest.approx(boxes, abs=1e-12)
+    assert exact["avg_mimics_encountered"] == pytest.approx(mimics, abs=1e-12)
+    assert exact["avg_sucker_punch_kills"] == pytest.approx(kills, abs=1e-12)
+
+
+def test_exact_solver_refuses_extra_savers():
+    with pytest.raises(ValueError, match="one saver"):
+        solve_strategy(strategies["dynamic_sequential"], DEFAULT_RULES._replace(num_savers=2))
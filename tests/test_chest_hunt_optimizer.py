@@ -0,0 +1,39 @@
+import pytest
+
+from chest_hunt_exact import solve_strategy
+from chest_hunt_optimizer import PolicyStrategy, evaluate_candidates
+from chest_hunt_simlator import DEFAULT_RULES, NUM_BOXES, seed_policy, strategies
+
+
+def sequential_policy(repick):
+    orders, open_at = zip(*(seed_policy(strategies["dynamic_sequential"], saver_position)
+                            for saver_position in range(NUM_BOXES)))
+    return PolicyStrategy([list(order) for order in orders], list(open_at), [repick] * NUM_BOXES)
+
+
+@pytest.mark.parametrize("repick", [False, True])
+def test_policy_scores_match_the_exact_solver(repick):
+    policy = sequential_policy(repick)
+    scores = [evaluate_candidates(saver_position, [(tuple(policy.orders[saver_position]),
+                                                    policy.open_at[saver_position], repick)])[0]
+              for saver_position in range(NUM_BOXES)]
+    exact = solve_strategy(policy)
+    assert exact["win_rate"] == pytest.approx(sum(score[0] for score in scores) / NUM_BOXES, abs=1e-12)
+    assert exact["avg_boxes_opened"] == pytest.approx(sum(score[1] for score in scores) / NUM_BOXES, abs=1e-12)
+
+
+def test_repicking_the_saver_after_the_multiplier_pays():
+    assert solve_strategy(sequential_policy(True))["win_rate"] > solve_strategy(sequential_policy(False))["win_rate"]
+    picks = sequential_policy(True)(NUM_BOXES, 0, 5, [])
+    assert picks.count(0) == 2 and picks[picks.index(5) + 1] == 0
+
+
+def test_policy_takes_the_rules():
+    policy = sequential_policy(False)
+    policy.open_at[0] = 3
+    # A mimic at the third pick is only seen by a third safe pick, which holds the saver back
+    order = policy.orders[0]
+    default_picks = policy(NUM_BOXES, 0, order[-1], [order[2]], rules=DEFAULT_RULES)
+    more_safe = DEFAULT_RULES._replace(safe_picks=3)
+    assert policy(NUM_BOXES, 0, order[-1], [order[2]]) == default_picks
+    assert policy(NUM_BOXES, 0, order[-1], [order[2]], rules=more_safe) != default_picks
@@ -0,0 +1,20 @@
+import math
+
+from chest_hunt_paired import display_paired_results, paired_delta, run_paired_simulations
+
+
+def test_no_games_give_an_unknown_delta(capsys):
+    results = run_paired_simulations(0, seed=1)
+    for data in results.values():
+        delta = paired_delta(data, "win")
+        assert math.isnan(delta["delta"])
+        assert delta["interval"] == (-math.inf, math.inf)
+    display_paired_results(results)
+    assert "no games run" in capsys.readouterr().out
+
+
+def test_paired_deltas_of_a_seeded_run_are_finite():
+    results = run_paired_simulations(2000, seed=1)
+    for data in results.values():
+        assert data["games"] == 2000
+        assert math.isfinite(paired_delta(data, "boxes_opened")["delta"])
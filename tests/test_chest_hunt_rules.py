@@ -0,0 +1,61 @@
+import pytest
+
+from chest_hunt_batch import run_batch_simulations
+from chest_hunt_simlator import (
+    DEFAULT_RULES,
+    check_rules,
+    compile_strategy,
+    dynamic_sequential_strategy,
+    refined_strategy_picks,
+    rules_strategy,
+    run_shard,
+    run_simulations,
+)
+
+GAMES = 4000
+
+
+def test_refined_strategy_makes_one_opening_pick_per_safe_pick():
+    for safe_picks in range(5):
+        rules = DEFAULT_RULES._replace(safe_picks=safe_picks)
+        picks = refined_strategy_picks(30, 10, 25, [], rules=rules)
+        # With nothing special found, the saver comes right after the opening picks
+        assert picks.index(10) == safe_picks
+        assert len(set(picks[:safe_picks])) == safe_picks
+
+
+def test_refined_strategy_keeps_its_default_picks():
+    assert refined_strategy_picks(30, 10, 25, []) == refined_strategy_picks(30, 10, 25, [], rules=DEFAULT_RULES)
+    assert refined_strategy_picks(30, 10, 25, [])[:3] == [12, 8, 10]
+    assert refined_strategy_picks(30, 0, 25, [2])[:3] == [2, 4, 6]
+    assert rules_strategy(refined_strategy_picks, DEFAULT_RULES) is refined_strategy_picks
+
+
+def test_safe_picks_change_the_refined_strategy_results():
+    default = run_shard(refined_strategy_picks, GAMES, "rules")
+    assert run_shard(refined_strategy_picks, GAMES, "rules", DEFAULT_RULES) == default
+    more_safe = DEFAULT_RULES._replace(safe_picks=4)
+    assert compile_strategy(rules_strategy(refined_strategy_picks, more_safe)) is not None
+    assert run_shard(refined_strategy_picks, GAMES, "rules", more_safe)["wins"] > default["wins"]
+
+
+def test_safe_picks_must_leave_room_on_the_board():
+    assert check_rules(DEFAULT_RULES._replace(num_boxes=8, safe_picks=6))
+    with pytest.raises(ValueError, match="safe picks"):
+        check_rules(DEFAULT_RULES._replace(num_boxes=8, safe_picks=7))
+    with pytest.raises(ValueError, match="safe picks"):
+        run_simulations(10, seed=1, rules=DEFAULT_RULES._replace(safe_picks=40))
+    with pytest.raises(ValueError, match="safe picks"):
+        run_batch_simulations(10, seed=1, rules=DEFAULT_RULES._replace(safe_picks=40))
+
+
+def test_compiled_strategy_plays_the_rules_it_is_called_with():
+    more_safe = DEFAULT_RULES._replace(safe_picks=4)
+    compiled = compile_strategy(dynamic_sequential_strategy)
+    bound = compile_strategy(rules_strategy(dynamic_sequential_strategy, more_safe))
+    assert bound.rules == more_safe
+    for strategy in (compiled, bound):
+        for rules in (DEFAULT_RULES, more_safe):
+            assert list(strategy(30, 0, 5, [], rules=rules)) == dynamic_sequential_strategy(30, 0, 5, [], rules=rules)
+    assert list(compiled(30, 0, 5, [])) == dynamic_sequential_strategy(30, 0, 5, [])
+    assert list(bound(30, 0, 5, [])) == dynamic_sequential_strategy(30, 0, 5, [], rules=more_safe)
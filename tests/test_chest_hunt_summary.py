@@ -0,0 +1,43 @@
+from chest_hunt_batch import run_batch_simulations
+from chest_hunt_checkpoint import merge_checkpoints
+from chest_hunt_simlator import DEFAULT_RULES, display_results, run_simulations, summarize_results
+from chest_hunt_sweep import plan_sweep, run_sweep, sweep_table
+
+
+def test_strategies_without_games_summarize_to_none(capsys):
+    results = run_simulations(0, seed=1)
+    for summary in summarize_results(results, 0).values():
+        assert summary["games"] == 0
+        assert summary["win_rate"] is None and summary["expected_souls"] is None
+    display_results(results, 0)
+    assert "no games run" in capsys.readouterr().out
+
+
+def test_a_strategy_missing_from_the_games_summarizes_to_none():
+    results, games, _ = merge_checkpoints([])
+    assert summarize_results(results, games) == {}
+    summary = summarize_results(run_simulations(0, seed=1), {})
+    assert all(strategy_summary["avg_boxes_opened"] is None for strategy_summary in summary.values())
+
+
+def test_sweep_ranks_by_win_rate_unless_asked():
+    results = run_sweep({"safe_picks": (2,)}, 2000, seed=1)
+    table = sweep_table(results, 2000)
+    by_rank = sorted(zip(table["rank"], table["win_rate"]))
+    assert [win_rate for _, win_rate in by_rank] == sorted(table["win_rate"], reverse=True)
+    souls_table = sweep_table(results, 2000, rank_by="expected_souls")
+    by_rank = sorted(zip(souls_table["rank"], souls_table["expected_souls"]))
+    assert [souls for _, souls in by_rank] == sorted(souls_table["expected_souls"], reverse=True)
+
+
+def test_sweep_plays_each_rule_set_on_the_batch_engine():
+    grid = {"num_savers": (1, 2), "safe_picks": (2, 3)}
+    results = run_sweep(grid, 2000, seed=1, strategy_names=["refined_dynamic_strategy"])
+    assert len(results) == 4
+    for (rules, strategy_name, run_seed) in plan_sweep(list({rules for rules, _ in results}), 2000, 1,
+                                                       ["refined_dynamic_strategy"]):
+        expected = run_batch_simulations(2000, run_seed, strategy_names=[strategy_name], rules=rules)
+        assert results[(rules, strategy_name)] == expected[strategy_name]
+    more_savers = DEFAULT_RULES._replace(num_savers=2)
+    assert results[(more_savers, "refined_dynamic_strategy")]["wins"] > results[(DEFAULT_RULES,
+                                                                                  "refined_dynamic_strategy")]["wins"]
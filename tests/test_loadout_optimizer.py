@@ -0,0 +1,31 @@
+import numpy as np
+
+from armory_manager import LoadoutManager, load_bonuses_data, load_items_data
+from loadout_optimizer import SoulsObjective, WeightedObjective, optimize_loadouts, prune_dominated
+
+
+def test_souls_objective_is_deterministic():
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    keys = manager.model.bonus_keys
+    vectors = np.random.default_rng(0).random((8, len(keys)))
+    first = SoulsObjective("active_rage", keys).score(vectors)
+    second = SoulsObjective("active_rage", keys).score(vectors)
+    assert np.array_equal(first, second)
+
+
+def test_tied_candidates_are_reported_not_dropped():
+    candidates = ["a", "b", "c"]
+    # b only differs from a on a bonus the objective ignores
+    vectors = np.array([[2.0, 0.0], [2.0, 5.0], [1.0, 0.0]])
+    kept, kept_vectors, ties = prune_dominated(candidates, vectors, np.array([1.0, 0.0]), top_k=2)
+    assert kept == ["a", "c"]
+    assert ties == [["b"], []]
+
+
+def test_optimized_loadouts_list_their_ties():
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    objective = WeightedObjective({"souls_bonus": 1}, manager.model.bonus_keys)
+    results = optimize_loadouts(manager, objective, top_k=1)
+    score, loadout, ties = results[0]
+    # Optional bonuses that aren't souls_bonus don't change the score
+    assert any(candidate[0] == loadout["Swords"]["name"] for candidate in ties["Swords"])
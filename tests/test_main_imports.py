@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+from benchmark import measure_import
+
+DEFERRED_MODULES = ("numpy", "argparse", "concurrent.futures", "json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_main_defers_the_slow_imports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    check = ("import sys, main; "
+             f"print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", check], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_import_time_is_measured_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert measure_import("main", repeats=0)["import_time"] > 0
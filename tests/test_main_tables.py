@@ -0,0 +1,58 @@
+import copy
+import random
+
+import main
+
+SIMULATION_RUNS = 20  # Runs of each mode when checking that simulating leaves the tables alone
+SAMPLER_DRAWS = 200000
+SAMPLER_TOLERANCE = 0.01  # Largest difference allowed between a drawn and an expected frequency
+
+
+def draw_frequencies(sample, outcomes, draws=SAMPLER_DRAWS, seed=0):
+    random.seed(seed)
+    counts = [0] * outcomes
+    for _ in range(draws):
+        counts[sample()] += 1
+    return [count / draws for count in counts]
+
+
+def test_tables_hold_the_expected_contents():
+    assert main.patterns == (
+        ("mage",),
+        ("mage", "mage", "slime"),
+        ("mage", "mage", "mage", "mage"),
+        ("dragon", "dragon", "dragon", "dragon", "dragon"),
+    )
+    assert all(isinstance(pattern, tuple) for pattern in main.patterns)
+    assert main.pattern_weights == (1, 1, 1, 1)
+    assert main.enemies == {
+        "slime": {"type": "small", "reward": 8, "element": "neutral"},
+        "mage": {"type": "small", "reward": 16, "element": "electric"},
+        "dragon": {"type": "small", "reward": 30, "element": "dark"},
+        "yeti": {"type": "giant", "reward": 2000, "element": "electric"},
+    }
+
+
+def test_simulating_leaves_the_tables_alone():
+    tables = ("enemies", "patterns", "pattern_weights", "bonuses")
+    before = {name: copy.deepcopy(getattr(main, name)) for name in tables}
+    random.seed(0)
+    for simulation_func in (main.simulate_active_bow, main.simulate_active_rage, main.simulate_idle_play):
+        for _ in range(SIMULATION_RUNS):
+            simulation_func()
+    assert [name for name in tables if getattr(main, name) != before[name]] == []
+
+
+def test_alias_sampler_draws_by_weight():
+    weights = (5, 1, 3, 0, 1)
+    frequencies = draw_frequencies(main.AliasSampler(weights).sample, len(weights))
+    for frequency, weight in zip(frequencies, weights):
+        assert abs(frequency - weight / sum(weights)) < SAMPLER_TOLERANCE
+
+
+def test_pattern_sampler_follows_the_pattern_weights():
+    tables = main.spawn_tables()
+    frequencies = draw_frequencies(tables["pattern_sampler"].sample, len(main.patterns))
+    for frequency, weight in zip(frequencies, main.pattern_weights):
+        assert abs(frequency - weight / sum(main.pattern_weights)) < SAMPLER_TOLERANCE
+    assert tables["enemy_names"] == tuple(main.enemies)
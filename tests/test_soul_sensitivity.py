@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pytest
+
+import main
+from armory_manager import LoadoutManager, load_bonuses_data, load_items_data
+from loadout_optimizer import SoulsObjective
+from loadout_pipeline import main_bonuses
+from soul_analytic import expected_stats
+from soul_batch import MODES
+from soul_sensitivity import bonus_sensitivities, check_sensitivities
+
+STEP = 1e-3  # Finite difference step from a bonus of 0
+
+
+def souls_per_second(mode, bonuses):
+    with main_bonuses(bonuses):
+        stats, _ = expected_stats(mode, main.simulation_duration)
+    return stats["total_souls"] / main.simulation_duration
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+@pytest.mark.parametrize("zeroed", ["electric_bonus", "dark_bonus"])
+def test_a_bonus_of_zero_gets_finite_sensitivities(mode, zeroed):
+    bonuses = dict(main.bonuses, **{zeroed: 0})
+    sensitivities = bonus_sensitivities(mode, bonuses)
+    for row in sensitivities["upgrades"]:
+        assert all(math.isfinite(row[key]) for key in ("derivative", "delta", "relative_delta"))
+    assert check_sensitivities(mode, sensitivities, bonuses) < 1e-9
+
+    row = next(row for row in sensitivities["upgrades"] if row["bonus"] == zeroed)
+    slope = (souls_per_second(mode, dict(bonuses, **{zeroed: STEP})) - sensitivities["souls_per_second"]) / STEP
+    assert row["derivative"] == pytest.approx(slope, rel=1e-6, abs=1e-9)
+
+
+def test_souls_objective_scores_a_base_bonus_of_zero():
+    manager = LoadoutManager(load_items_data(), load_bonuses_data())
+    keys = manager.model.bonus_keys
+    bonuses = dict(main.bonuses, electric_bonus=0)
+    objective = SoulsObjective("active_bow", keys, bonuses)
+    vectors = np.zeros((2, len(keys)))
+    vectors[1, keys.index("electric_type_souls")] = 10
+    scores = objective.score(vectors)
+    assert np.isfinite(scores).all()
+    assert scores[0] == pytest.approx(souls_per_second("active_bow", bonuses), rel=1e-12)
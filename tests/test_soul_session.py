@@ -0,0 +1,18 @@
+import pytest
+
+from soul_session import SessionSimulator, run_session
+
+
+@pytest.mark.parametrize("window", ["rage", "boost"])
+def test_a_window_of_none_never_opens(window):
+    session = run_session(2, {window: None}, seed=1)
+    assert session[f"{window}_windows"] == 0
+    if window == "rage":
+        assert session["seconds_per_mode"]["active_rage"] == 0
+    else:
+        assert session["rage_windows"] > 0
+
+
+def test_an_invalid_window_is_rejected():
+    with pytest.raises(ValueError):
+        SessionSimulator({"rage": (0, 300)})
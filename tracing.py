@@ -0,0 +1,53 @@
+import collections
+import os
+
+# Trace levels, from nothing to the detail of every kill
+TRACE_OFF = 0
+TRACE_SUMMARY = 1  # One line per simulated run
+TRACE_PATTERN = 2  # One line per pattern
+TRACE_KILL = 3  # The multiplier chain of every kill (and every bonus in the armory)
+TRACE_LEVELS = {"off": TRACE_OFF, "summary": TRACE_SUMMARY, "pattern": TRACE_PATTERN, "kill": TRACE_KILL}
+RING_BUFFER_SIZE = 1000  # Traces kept by a RingBufferSink
+
+
+# Function to turn a level name ("off", "summary", "pattern", "kill") or number into a level
+def parse_trace_level(level):
+    if isinstance(level, str):
+        if level.lower() not in TRACE_LEVELS:
+            raise ValueError(f"unknown trace level {level!r}, expected one of {', '.join(TRACE_LEVELS)}")
+        return TRACE_LEVELS[level.lower()]
+    return level
+
+
+# A trace sink that keeps only the last traces in memory, to look at the end of one run
+# without printing a million lines
+class RingBufferSink:
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        self.traces = collections.deque(maxlen=capacity)
+
+    def __call__(self, message):
+        self.traces.append(message)
+
+    def dump(self):
+        for message in self.traces:
+            print(message)
+
+
+# Where traces go and how many of them. Call sites check the level before formatting
+# anything, so a disabled level costs one comparison:
+#     if tracer.level >= TRACE_KILL:
+#         tracer.emit(f"...")
+class Tracer:
+    def __init__(self, level=TRACE_OFF, sink=print):
+        self.level = parse_trace_level(level)
+        self.sink = sink
+
+    def set_level(self, level):
+        self.level = parse_trace_level(level)
+
+    def emit(self, message):
+        self.sink(message)
+
+
+# The tracer shared by the simulators, set from the TRACE_LEVEL environment variable
+tracer = Tracer(os.environ.get("TRACE_LEVEL", "off"))